@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib import rcParams
+from grid import Grid
 rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei']  # 设置中文字体
 rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
 
@@ -10,9 +11,9 @@ class SimplePathFinder:
         初始化路径规划器
         :param grid: 二维数组，0表示可通行，1表示障碍
         """
-        self.grid = grid
-        self.rows = len(grid)
-        self.cols = len(grid[0]) if self.rows > 0 else 0
+        self.grid = Grid.wrap(grid)
+        self.rows = self.grid.height
+        self.cols = self.grid.width
         self.visited = set()
         self.max_steps = 500  # 防止无限递归
 
@@ -1,17 +1,176 @@
 # -*- coding: utf-8 -*-
 import heapq
+import math
 import time
+from array import array
+from search_state import FlatSearchState, INF_COST, flat_steps
+from grid import Grid
+from batch import run_batch
+from components import reachable
+from resumable import AStarSearch
+from open_list import make_open_list
+import metrics
+
+class FlatAStarRun:
+    """flat 模式 A* 的一次查询，全部循环状态保存在对象里：step(limit) 最多弹出 limit 次，结束时返回 True
+
+    AStar 的 flat 模式一次跑完，resumable.AStarSearch 分时间片推进，两者共用这一个主循环，
+    扩展顺序、nodes_explored 和路径完全相同。结束后 path 为路径（不可达为 None），path_cost 为其代价。
+    """
+
+    def __init__(self, grid, start, end, state, bound=None, keyed=None):
+        self.pw = pw = grid.pwidth
+        self.blocked = grid.padded
+        self.steps = flat_steps(pw)
+        self.state = state
+        self.generation = gen = state.reset()
+        # 带边框坐标：下标 = (x+1)*pw + (y+1)
+        s = (start[0] + 1) * pw + start[1] + 1
+        self.goal = (end[0] + 1) * pw + end[1] + 1
+        self.target = (end[0] + 1, end[1] + 1)
+        self.bound = bound
+        state.g[s] = 0
+        state.parent[s] = -1
+        state.stamp[s] = gen
+        self.keyed = keyed
+        if keyed is None:
+            # (f, h, 压入序号, 下标)：同 f 先扩展 h 小的，再按压入顺序，与 Node 模式一致
+            self.open_list = [(0, 0, 0, s)]
+        else:
+            self.open_list = keyed
+            keyed.clear()
+            keyed.push(s, 0)
+        self.pushes = 0
+        self.stale = 0
+        self.nodes_explored = 0
+        self.done = False
+        self.path = None
+        self.path_cost = 0
+
+    def step(self, limit=INF_COST):
+        if self.done:
+            return True
+        pw = self.pw
+        blocked = self.blocked
+        steps = self.steps
+        state = self.state
+        gen = self.generation
+        g = state.g
+        parent = state.parent
+        stamp = state.stamp
+        closed = state.closed
+        t = self.goal
+        tx, ty = self.target
+        bound = self.bound
+        keyed = self.keyed
+        open_list = self.open_list
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        stale = self.stale
+        pushes = self.pushes
+        popped = 0
+
+        while open_list and popped < limit:
+            if keyed is None:
+                current = heappop(open_list)[3]
+            else:
+                current = keyed.pop()
+            popped += 1
+
+            if current == t:
+                with metrics.phase('reconstruct'):
+                    self.path = [(i // pw - 1, i % pw - 1) for i in state.trace(current)]
+                self.path_cost = g[t]
+                self.done = True
+                break
+
+            if closed[current] == gen:
+                stale += 1
+                continue
+            closed[current] = gen
+
+            cx, cy = divmod(current, pw)
+            current_g = g[current]
+            for offset, dx, dy, move_cost, corner1, corner2 in steps:
+                n = current + offset
+                if blocked[n] or closed[n] == gen:
+                    continue
+                # 对角线移动的障碍物检查
+                if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                    continue
+
+                new_g = current_g + move_cost
+                if stamp[n] != gen or new_g < g[n]:
+                    g[n] = new_g
+                    parent[n] = current
+                    stamp[n] = gen
+                    if bound is not None:
+                        h = bound(n)
+                    else:
+                        hx = abs(cx + dx - tx)
+                        hy = abs(cy + dy - ty)
+                        h = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                    if keyed is None:
+                        pushes += 1
+                        heappush(open_list, (new_g + h, h, pushes, n))
+                    else:
+                        keyed.push(n, new_g + h)
+
+        self.nodes_explored += popped
+        self.stale = stale
+        self.pushes = pushes
+        if not open_list:
+            self.done = True
+        return self.done
+
 
 class AStar:
-    def __init__(self, grid):
-        self.grid = grid
-        self.height = len(grid)
-        self.width = len(grid[0])
+    def __init__(self, grid, flat=False, heuristic=None, any_angle=None, open_list=None):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
         self.movements = [(0, 1), (1, 0), (0, -1), (-1, 0),
                          (1, 1), (1, -1), (-1, 1), (-1, -1)]
         self.nodes_explored = 0
         self.execution_time = 0
         self.path_length = 0
+        self.path_cost = 0
+        self.heap_pushes = 0
+        self.stale_pops = 0  # 弹出时已关闭、被跳过的堆条目
+        self.duplicates_suppressed = 0  # 开放表丢弃的不更优的重复压入
+        # 可替换的启发函数（如 landmarks.LandmarkHeuristic），需提供 bind(goal) -> h(带边框下标)
+        self.custom_heuristic = heuristic
+        self._bound = {}
+        # any_angle='theta' / 'lazy' 使用 Theta* / Lazy Theta* 直接搜索任意角度路径，
+        # 返回拐点序列，代价为欧氏距离x10；los_checks 统计视线检查次数
+        if any_angle not in (None, 'theta', 'lazy'):
+            raise ValueError(f"未知的任意角度模式: {any_angle}")
+        self.any_angle = any_angle
+        self.los_checks = 0
+        # find_path_anytime 的统计：最终膨胀系数、可证明的次优上界和每轮改进记录
+        self.epsilon = 1.0
+        self.suboptimality_bound = 1.0
+        self.improvements = []
+        # open_list='heap' / 'bucket'（或返回开放表的工厂）时改用 open_list 模块的带索引开放表，
+        # 同一格子在表中只保留一个条目，隐含 flat=True
+        if open_list is not None and any_angle is not None:
+            raise ValueError("任意角度模式的代价是浮点数，不支持 open_list")
+        self.open_list = open_list
+        self._open = make_open_list(open_list) if open_list is not None else None
+        # flat=True 时使用平铺数组保存搜索状态，堆中存 (f, h, 压入序号, 下标)；
+        # 与 Node 模式的排序键和压入条件相同，两种模式返回相同的路径和 nodes_explored
+        self.flat = flat or any_angle is not None or open_list is not None
+        self._state = None
+        if self.flat:
+            self._init_flat()
+        if any_angle is not None:
+            self._g_float = array('d', [0.0]) * len(self._blocked)
+
+    def _init_flat(self):
+        self._pwidth = self.grid.pwidth
+        self._blocked = self.grid.padded
+        self._steps = flat_steps(self._pwidth)
+        self._state = FlatSearchState(len(self._blocked))
 
     class Node:
         def __init__(self, x, y, parent=None):
@@ -26,36 +185,61 @@ class AStar:
             return self.f < other.f
 
     def heuristic(self, node, goal):
+        bound = self._bound.get((goal.x, goal.y))
+        if bound is not None:
+            return bound((node.x + 1) * self.grid.pwidth + node.y + 1)
         dx = abs(node.x - goal.x)
         dy = abs(node.y - goal.y)
         return 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
 
+    @metrics.instrumented('astar')
     def find_path(self, start, end):
-        start_time = time.time()
+        if not reachable(self.grid, start, end):
+            # 不在同一连通分量，不必搜索
+            self.nodes_explored = 0
+            self.heap_pushes = 0
+            self.stale_pops = 0
+            self.duplicates_suppressed = 0
+            self.execution_time = 0
+            return None
+        if self.any_angle is not None:
+            return self._find_path_any_angle(start, end)
+        if self.custom_heuristic is not None:
+            self._bound = {tuple(end): self.custom_heuristic.bind(end, start)}
+        if self.flat:
+            return self._find_path_flat(start, end)
+        start_time = time.perf_counter()
         self.nodes_explored = 0
-        
-        open_list = []
-        start_node = self.Node(*start)
+        self.stale_pops = 0
+        self.duplicates_suppressed = 0
+
+        # 堆条目 (f, h, 压入序号, 节点)：与 flat 模式的排序键相同，两种模式的路径和统计完全一致
+        open_list = [(0, 0, 0, self.Node(*start))]
         end_node = self.Node(*end)
-        heapq.heappush(open_list, start_node)
-        
+        pushes = 0
+
         closed_dict = dict()
-        
+        g_values = {tuple(start): 0}
+
         while open_list:
-            current = heapq.heappop(open_list)
+            current = heapq.heappop(open_list)[3]
             self.nodes_explored += 1
 
             if current.x == end_node.x and current.y == end_node.y:
-                path = []
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                self.execution_time = time.time() - start_time
+                self.path_cost = current.g
+                self.heap_pushes = self.nodes_explored + len(open_list)
+                with metrics.phase('reconstruct'):
+                    path = []
+                    while current:
+                        path.append((current.x, current.y))
+                        current = current.parent
+                self.execution_time = time.perf_counter() - start_time
                 if path:
                     self.path_length = len(path)
                 return path[::-1]
 
             if (current.x, current.y) in closed_dict:
+                self.stale_pops += 1
                 continue
             closed_dict[(current.x, current.y)] = current
 
@@ -79,12 +263,327 @@ class AStar:
                     else:
                         move_cost = 10
                         
+                    # 只压入更优的 g 值
+                    new_g = current.g + move_cost
+                    if new_g >= g_values.get((nx, ny), new_g + 1):
+                        continue
+                    g_values[(nx, ny)] = new_g
                     new_node = self.Node(nx, ny, current)
-                    new_node.g = current.g + move_cost
+                    new_node.g = new_g
                     new_node.h = self.heuristic(new_node, end_node)
                     new_node.f = new_node.g + new_node.h
-                    
-                    heapq.heappush(open_list, new_node)
 
-        self.execution_time = time.time() - start_time
-        return None 
\ No newline at end of file
+                    pushes += 1
+                    heapq.heappush(open_list, (new_node.f, new_node.h, pushes, new_node))
+
+        self.heap_pushes = self.nodes_explored
+        self.execution_time = time.perf_counter() - start_time
+        return None
+
+    def start_search(self, start, end):
+        """返回可分步推进、可暂停恢复的搜索对象（resumable.AStarSearch），配合 scheduler 使用"""
+        return AStarSearch(self, start, end)
+
+    def find_paths(self, queries):
+        """批量查询 [(start, end), ...]，返回 batch.BatchResult
+
+        不论构造时是否 flat，批量查询都使用平铺数组，搜索缓冲区在查询间复用（靠代数戳重置，不清空数组）；
+        两种模式结果相同。分块地图（grid.dense 为 False）没有稠密缓冲区，逐个用 Node 模式查询。
+        """
+        if self.flat or not self.grid.dense:
+            return run_batch(self, queries)
+        if self._state is None:
+            self._init_flat()
+        self.flat = True
+        try:
+            return run_batch(self, queries)
+        finally:
+            self.flat = False
+
+    def flat_run(self, start, end, state, bound=None, keyed=None):
+        """创建一次 flat 模式查询（FlatAStarRun），state 可以是本引擎共享的缓冲区，也可以是独立的 SparseSearchState"""
+        return FlatAStarRun(self.grid, start, end, state, bound, keyed)
+
+    def _find_path_flat(self, start, end):
+        start_time = time.perf_counter()
+        bound = self._bound.get(tuple(end)) if self.custom_heuristic is not None else None
+        run = FlatAStarRun(self.grid, start, end, self._state, bound, self._open)
+        run.step()
+        self.nodes_explored = run.nodes_explored
+        self._open_list_stats(run.open_list, run.stale)
+        self.execution_time = time.perf_counter() - start_time
+        if run.path is not None:
+            self.path_length = len(run.path)
+            self.path_cost = run.path_cost
+        return run.path
+
+    def _open_list_stats(self, open_list, stale):
+        if self._open is None:
+            # 每次弹出对应一次压入，剩余的堆条目也都压入过
+            self.heap_pushes = self.nodes_explored + len(open_list)
+            self.stale_pops = stale
+            self.duplicates_suppressed = 0
+        else:
+            self.heap_pushes = self._open.pushes
+            self.stale_pops = stale + self._open.stale_pops
+            self.duplicates_suppressed = self._open.duplicates
+
+    def _line_of_sight(self, a, b):
+        """带边框下标 a、b 两格中心的连线所经过的格子是否都可通行
+
+        连线恰好穿过格点时要求两侧格子都可通行，与对角线移动不能切角的规则一致。
+        """
+        self.los_checks += 1
+        pw = self._pwidth
+        blocked = self._blocked
+        x0, y0 = divmod(a, pw)
+        x1, y1 = divmod(b, pw)
+        nx = abs(x1 - x0)
+        ny = abs(y1 - y0)
+        step_x = pw if x1 > x0 else -pw
+        step_y = 1 if y1 > y0 else -1
+        idx = a
+        ix = iy = 0
+        while ix < nx or iy < ny:
+            # 比较下一次穿过水平格线和竖直格线的位置
+            t = (1 + 2 * ix) * ny - (1 + 2 * iy) * nx
+            if t == 0:
+                if blocked[idx + step_x] or blocked[idx + step_y]:
+                    return False
+                idx += step_x + step_y
+                ix += 1
+                iy += 1
+            elif t < 0:
+                idx += step_x
+                ix += 1
+            else:
+                idx += step_y
+                iy += 1
+            if blocked[idx]:
+                return False
+        return True
+
+    def _find_path_any_angle(self, start, end):
+        """Theta*：扩展时若父节点能直接看到邻居，就把邻居直接挂到父节点上
+
+        Lazy Theta* 生成邻居时先假设能看到，等节点出堆时才检查视线，不成立再从已关闭的邻居中选父节点，
+        视线检查次数大约减少到每个扩展节点一次。启发函数为欧氏距离（自定义启发函数在此模式下不使用）。
+        """
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+        self.los_checks = 0
+        lazy = self.any_angle == 'lazy'
+
+        pw = self._pwidth
+        blocked = self._blocked
+        state = self._state
+        gen = state.reset()
+        g = self._g_float
+        parent = state.parent
+        stamp = state.stamp
+        closed = state.closed
+        line_of_sight = self._line_of_sight
+        hypot = math.hypot
+        diagonal = 10 * math.sqrt(2)
+
+        s = (start[0] + 1) * pw + start[1] + 1
+        t = (end[0] + 1) * pw + end[1] + 1
+        tx, ty = end[0] + 1, end[1] + 1
+        g[s] = 0.0
+        parent[s] = -1
+        stamp[s] = gen
+        open_list = [(0.0, s)]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+
+        while open_list:
+            _, current = heappop(open_list)
+            if closed[current] == gen:
+                continue
+            p = parent[current]
+            if lazy and p != -1 and not line_of_sight(p, current):
+                # 假设不成立：改为经由代价最小的已关闭邻居到达
+                best = None
+                for offset, dx, dy, move_cost, corner1, corner2 in self._steps:
+                    n = current + offset
+                    if blocked[n] or closed[n] != gen:
+                        continue
+                    if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                        continue
+                    candidate = g[n] + (diagonal if corner1 else 10.0)
+                    if best is None or candidate < g[current]:
+                        g[current] = candidate
+                        best = n
+                parent[current] = best
+                p = best
+            closed[current] = gen
+            self.nodes_explored += 1
+
+            if current == t:
+                path = [(i // pw - 1, i % pw - 1) for i in state.trace(current)]
+                self.execution_time = time.perf_counter() - start_time
+                self.path_length = len(path)
+                self.path_cost = g[t]
+                return path
+
+            cx, cy = divmod(current, pw)
+            if p != -1:
+                px, py = divmod(p, pw)
+            for offset, dx, dy, move_cost, corner1, corner2 in self._steps:
+                n = current + offset
+                if blocked[n] or closed[n] == gen:
+                    continue
+                if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                    continue
+                nx = cx + dx
+                ny = cy + dy
+                if p != -1 and (lazy or line_of_sight(p, n)):
+                    # 路径2：从父节点直线到达邻居
+                    new_parent = p
+                    new_g = g[p] + 10 * hypot(nx - px, ny - py)
+                else:
+                    new_parent = current
+                    new_g = g[current] + (diagonal if corner1 else 10.0)
+                if stamp[n] != gen or new_g < g[n]:
+                    g[n] = new_g
+                    parent[n] = new_parent
+                    stamp[n] = gen
+                    heappush(open_list, (new_g + 10 * hypot(nx - tx, ny - ty), n))
+
+        self.execution_time = time.perf_counter() - start_time
+        return None
+
+    @metrics.instrumented('astar_anytime')
+    def find_path_anytime(self, start, end, deadline=None, epsilon=3.0, epsilon_step=0.5):
+        """ARA*：先用膨胀系数 epsilon 的加权 A* 快速给出路径，再逐轮减小 epsilon 改进
+
+        每轮复用上一轮的 g 值，只重新处理"不一致"的格子。deadline 是 time.perf_counter()
+        的绝对时间，到点后返回已完成轮次中最好的路径；第一轮总会完成。
+        suboptimality_bound 是可证明的上界：路径代价 <= bound x 最优代价。
+        """
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+        self.heap_pushes = 0
+        self.stale_pops = 0
+        self.duplicates_suppressed = 0
+        self.los_checks = 0
+        self.path_length = 0
+        self.path_cost = 0
+        self.improvements = []
+        self.epsilon = epsilon
+        self.suboptimality_bound = float('inf')
+        if not reachable(self.grid, start, end):
+            self.execution_time = 0
+            return None
+        if self._state is None:
+            self._init_flat()
+
+        pw = self._pwidth
+        blocked = self._blocked
+        steps = self._steps
+        state = self._state
+        gen = state.reset()
+        g = state.g
+        parent = state.parent
+        stamp = state.stamp
+        s = (start[0] + 1) * pw + start[1] + 1
+        t = (end[0] + 1) * pw + end[1] + 1
+        tx, ty = end[0] + 1, end[1] + 1
+        bound = self.custom_heuristic.bind(end, start) if self.custom_heuristic is not None else None
+        h_cache = {}
+
+        def h(n):
+            value = h_cache.get(n)
+            if value is None:
+                if bound is not None:
+                    value = bound(n)
+                else:
+                    hx = abs(n // pw - tx)
+                    hy = abs(n % pw - ty)
+                    value = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                h_cache[n] = value
+            return value
+
+        g[s] = 0
+        parent[s] = -1
+        stamp[s] = gen
+        open_set = {s}
+        incons = set()
+        closed = set()
+        best_path = None
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        pushes = 0
+        stale = 0
+
+        while True:
+            # 新一轮：不一致的格子并回开放表，按新的 epsilon 重建堆，关闭表清空
+            open_set |= incons
+            incons = set()
+            closed = set()
+            eps = self.epsilon
+            heap = [(g[n] + eps * h(n), n) for n in open_set]
+            heapq.heapify(heap)
+            pushes += len(heap)
+            interrupted = False
+            expansions = 0
+            while heap:
+                key, current = heappop(heap)
+                if current not in open_set or key != g[current] + eps * h(current):
+                    stale += 1
+                    continue
+                goal_g = g[t] if stamp[t] == gen else INF_COST
+                if goal_g <= key:
+                    heappush(heap, (key, current))
+                    pushes += 1
+                    break
+                if best_path is not None and deadline is not None and expansions & 63 == 0 \
+                        and time.perf_counter() >= deadline:
+                    interrupted = True
+                    break
+                open_set.discard(current)
+                closed.add(current)
+                expansions += 1
+                current_g = g[current]
+                for offset, dx, dy, move_cost, corner1, corner2 in steps:
+                    n = current + offset
+                    if blocked[n]:
+                        continue
+                    if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                        continue
+                    new_g = current_g + move_cost
+                    if stamp[n] != gen or new_g < g[n]:
+                        g[n] = new_g
+                        parent[n] = current
+                        stamp[n] = gen
+                        if n in closed:
+                            incons.add(n)
+                        else:
+                            open_set.add(n)
+                            heappush(heap, (new_g + eps * h(n), n))
+                            pushes += 1
+            self.nodes_explored += expansions
+            if interrupted or stamp[t] != gen:
+                break
+
+            # 本轮完成：记录路径和上界 g(goal) / min(g + h)（开放表和不一致表中）
+            lower = min((g[n] + h(n) for n in open_set | incons), default=g[t])
+            trace = state.trace(t)
+            best_path = [(i // pw - 1, i % pw - 1) for i in trace]
+            # 父指针链上的格子可能已被改进（改进留在不一致表里），路径实际代价可能小于 g(goal)
+            cost = 0
+            for a, b in zip(trace, trace[1:]):
+                cost += 10 if abs(b - a) in (1, pw) else 14
+            self.path_cost = cost
+            self.suboptimality_bound = min(eps, cost / lower) if lower > 0 else 1.0
+            self.improvements.append((eps, cost, self.suboptimality_bound, time.perf_counter() - start_time))
+            if self.suboptimality_bound <= 1.0 or (deadline is not None and time.perf_counter() >= deadline):
+                break
+            self.epsilon = max(1.0, eps - epsilon_step)
+
+        self.heap_pushes = pushes
+        self.stale_pops = stale
+        self.execution_time = time.perf_counter() - start_time
+        if best_path is not None:
+            self.path_length = len(best_path)
+        return best_path
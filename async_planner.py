@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from astar import AStar
+from grid import Grid
+from metrics import percentile
+
+# 进程池工作进程中的引擎实例（由 _init_process 创建）
+_worker_engine = None
+
+
+def _init_process(factory, data, height, width):
+    global _worker_engine
+    _worker_engine = factory(Grid(bytearray(data), height, width))
+
+
+def _init_process_from_map(factory, path):
+    # 映射地图文件：格子解压一次，连通分量等派生数据直接共享页缓存，不重新计算
+    global _worker_engine
+    from map_format import load_map
+    _worker_engine = factory(load_map(path).grid())
+
+
+def _solve_in_process(start, end):
+    path = _worker_engine.find_path(start, end)
+    return path, _worker_engine.path_cost, _worker_engine.nodes_explored
+
+
+class AsyncPlanner:
+    """asyncio 前端：await planner.find_path(start, end)，寻路在线程池或进程池中执行，不阻塞事件循环
+
+    同一地图版本上相同的 (起点, 终点) 请求在执行期间只计算一次，后来的调用方直接等待同一个结果。
+    支持超时（timeout 秒）和取消：某个调用方放弃等待不影响其他调用方，所有调用方都放弃时
+    撤销尚未开始执行的任务。
+
+    executor='thread' 时每个线程持有自己的引擎实例（引擎内部缓冲区不是线程安全的），共享同一个 Grid；
+    executor='process' 时每个工作进程持有一份地图副本，地图版本变化后重建进程池。
+    进程模式下 engine_factory 必须可以 pickle（例如 functools.partial(AStar, flat=True)）。
+    给出 map_path（map_format 保存的地图文件）时 grid 可以为 None；地图未被修改时，
+    工作进程直接映射该文件启动，不再传输和重建整张地图。
+    """
+
+    def __init__(self, grid, engine_factory=None, executor='thread', max_workers=None, latency_window=1024,
+                 map_path=None):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"未知的执行器类型: {executor}")
+        if grid is None:
+            from map_format import load_map
+            grid = load_map(map_path).grid()
+        self.grid = Grid.wrap(grid)
+        self.map_path = map_path
+        self._map_version = self.grid.version
+        self.engine_factory = engine_factory or partial(AStar, flat=True)
+        self.executor = executor
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._pool = None
+        self._pool_version = None
+        self._inflight = {}  # (版本, 起点, 终点) -> [asyncio.Future, 等待者数量]
+        self._latencies = deque(maxlen=latency_window)
+        self.queue_depth = 0  # 已提交到执行器但尚未完成的任务数
+        self.max_queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _thread_engine(self):
+        engine = getattr(self._local, 'engine', None)
+        if engine is None:
+            engine = self._local.engine = self.engine_factory(self.grid)
+        return engine
+
+    def _solve_in_thread(self, start, end):
+        engine = self._thread_engine()
+        path = engine.find_path(start, end)
+        return path, engine.path_cost, engine.nodes_explored
+
+    def _get_pool(self):
+        if self.executor == 'thread':
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix='planner')
+            return self._pool
+        if self._pool is None or self._pool_version != self.grid.version:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            if self.map_path is not None and self.grid.version == self._map_version:
+                initializer = _init_process_from_map
+                initargs = (self.engine_factory, self.map_path)
+            else:
+                initializer = _init_process
+                initargs = (self.engine_factory, bytes(self.grid.cells), self.grid.height, self.grid.width)
+            self._pool = ProcessPoolExecutor(self.max_workers, initializer=initializer, initargs=initargs)
+            self._pool_version = self.grid.version
+        return self._pool
+
+    def _submit(self, key, start, end):
+        pool = self._get_pool()
+        if self.executor == 'thread':
+            concurrent_future = pool.submit(self._solve_in_thread, start, end)
+        else:
+            concurrent_future = pool.submit(_solve_in_process, start, end)
+        future = asyncio.wrap_future(concurrent_future)
+        entry = [future, 0]
+        self._inflight[key] = entry
+        self.submitted += 1
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        future.add_done_callback(partial(self._on_done, key, entry, time.perf_counter()))
+        return entry
+
+    def _on_done(self, key, entry, submitted_at, future):
+        self.queue_depth -= 1
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self.errors += 1
+            return
+        self.completed += 1
+        self._latencies.append(time.perf_counter() - submitted_at)
+
+    async def find_path(self, start, end, timeout=None):
+        """异步寻路，返回路径（不可达时为 None）；超时抛出 asyncio.TimeoutError"""
+        start = tuple(start)
+        end = tuple(end)
+        key = (self.grid.version, start, end)
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = self._submit(key, start, end)
+        else:
+            self.coalesced += 1
+        future = entry[0]
+        entry[1] += 1
+        try:
+            # shield：单个调用方超时或被取消时不取消共享的计算
+            path, _, _ = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not future.done():
+                # 已经没有调用方在等：撤销任务（已开始执行的任务无法中断，结果被丢弃）
+                future.cancel()
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+        # 合并的调用方各自拿到一份拷贝
+        return list(path) if path is not None else None
+
+    def get_stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'inflight': len(self._inflight),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'coalesced': self.coalesced,
+            'cancelled': self.cancelled,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'latency_p50': percentile(latencies, 50),
+            'latency_p95': percentile(latencies, 95),
+            'latency_p99': percentile(latencies, 99),
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
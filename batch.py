@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from array import array
+import time
+
+
+class BatchResult:
+    """批量查询结果：所有路径依次拼接在同一个数组里
+
+    第 i 条查询的路径是 points[offsets[i] : offsets[i] + lengths[i]]，
+    points 中存放格子下标 x*width + y；未找到路径时 costs[i] 为 -1、lengths[i] 为 0。
+    costs 为浮点数组，任意角度模式（欧氏距离x10）的代价也能原样保存。
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.costs = array('d')
+        self.lengths = array('i')
+        self.offsets = array('i')
+        self.points = array('i')
+        self.nodes_explored = 0
+        self.elapsed = 0.0
+        self.queries_per_second = 0.0
+
+    def __len__(self):
+        return len(self.costs)
+
+    def append(self, path, cost):
+        self.offsets.append(len(self.points))
+        if path is None:
+            self.costs.append(-1)
+            self.lengths.append(0)
+            return
+        w = self.width
+        self.costs.append(cost)
+        self.lengths.append(len(path))
+        self.points.extend([x * w + y for x, y in path])
+
+    def path(self, i):
+        """取出第 i 条路径，未找到时返回 None"""
+        if self.costs[i] < 0:
+            return None
+        start = self.offsets[i]
+        w = self.width
+        return [divmod(p, w) for p in self.points[start:start + self.lengths[i]]]
+
+    def found(self):
+        return sum(1 for c in self.costs if c >= 0)
+
+
+def run_batch(engine, queries):
+    """用同一个引擎实例依次回答所有查询，引擎内部的搜索缓冲区在查询间复用"""
+    result = BatchResult(engine.width)
+    start_time = time.perf_counter()
+    for start, end in queries:
+        path = engine.find_path(start, end)
+        result.append(path, engine.path_cost)
+        result.nodes_explored += engine.nodes_explored
+    result.elapsed = time.perf_counter() - start_time
+    if result.elapsed > 0:
+        result.queries_per_second = len(result) / result.elapsed
+    return result
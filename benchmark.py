@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""可复现的寻路性能基准
+
+固定随机种子生成场景和查询，先预热再重复测量（perf_counter_ns），统计每个引擎的
+p50/p95/p99 延迟、扩展节点数和峰值内存，结果写成 JSON，并可与保存的基线对比找出回退。
+
+用法:
+    python benchmark.py run --out results.json [--seed 0] [--repeat 5] [--warmup 1]
+    python benchmark.py compare baseline.json results.json [--threshold 0.1]
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from common import TEST_CONFIG, generate_random_grid
+from grid import Grid
+from jps import JPS
+from jps_plus import JPSPlusTables
+from landmarks import LandmarkHeuristic
+from map_generators import create_large_sparse_map
+from metrics import percentile
+from visibility_graph import VisibilityGraph
+
+# 场景集：TEST_CONFIG 的随机地图 + map_generators 的大型稀疏地图
+SCENARIOS = {
+    name: {'kind': 'random', 'size': config[:2], 'density': config[2]}
+    for name, config in TEST_CONFIG.items()
+}
+SCENARIOS.update({
+    'sparse_100_5': {'kind': 'sparse', 'size': 100, 'obstacles': 5},
+    'sparse_100_20': {'kind': 'sparse', 'size': 100, 'obstacles': 20},
+    'sparse_200_10': {'kind': 'sparse', 'size': 200, 'obstacles': 10},
+})
+
+
+
+def landmark_heuristic(grid, options):
+    return LandmarkHeuristic(grid, k=options.landmarks, selection=options.landmark_selection,
+                             active=options.active_landmarks, seed=options.seed)
+
+
+# 引擎注册表：名字 -> 用 Grid 和命令行选项构造引擎的函数（构造时间计入预处理）
+ENGINES = {
+    'astar': lambda grid, options: AStar(grid),
+    'astar_flat': lambda grid, options: AStar(grid, flat=True),
+    'astar_alt': lambda grid, options: AStar(grid, flat=True, heuristic=landmark_heuristic(grid, options)),
+    'theta': lambda grid, options: AStar(grid, any_angle='theta'),
+    'lazy_theta': lambda grid, options: AStar(grid, any_angle='lazy'),
+    'bidirectional': lambda grid, options: BidirectionalAStar(grid, flat=True),
+    'bidirectional_balanced': lambda grid, options: BidirectionalAStar(grid, balanced=True),
+    'bidirectional_alt': lambda grid, options: BidirectionalAStar(
+        grid, balanced=True, heuristic=landmark_heuristic(grid, options)),
+    'jps': lambda grid, options: JPS(grid),
+    'jps_plus': lambda grid, options: JPS(grid, tables=JPSPlusTables.build(grid)),
+    'visibility': lambda grid, options: VisibilityGraph(grid),
+}
+DEFAULT_ENGINES = ['astar', 'astar_flat', 'bidirectional', 'bidirectional_balanced', 'jps', 'jps_plus']
+
+
+def build_scenario(name, seed, num_queries):
+    """按种子生成地图和查询对，同一种子每次结果相同"""
+    spec = SCENARIOS[name]
+    if spec['kind'] == 'random':
+        random.seed(seed)
+        grid = Grid.wrap(generate_random_grid(spec['size'], spec['density']))
+    else:
+        np.random.seed(seed)
+        grid = Grid.wrap(create_large_sparse_map(spec['size'], spec['obstacles']))
+
+    rng = random.Random(seed)
+    free = [i for i in range(grid.size) if grid.passable(i)]
+    queries = []
+    for _ in range(num_queries):
+        start = divmod(rng.choice(free), grid.width)
+        end = divmod(rng.choice(free), grid.width)
+        queries.append((start, end))
+    return grid, queries
+
+
+def measure(engine_name, grid, queries, options):
+    repeat = options.repeat
+    warmup = options.warmup
+    factory = ENGINES[engine_name]
+    t0 = time.perf_counter_ns()
+    engine = factory(grid, options)
+    preprocess_ns = time.perf_counter_ns() - t0
+
+    for _ in range(warmup):
+        for start, end in queries:
+            engine.find_path(start, end)
+
+    latencies = []
+    expansions = []
+    los_checks = []
+    found = 0
+    for r in range(repeat):
+        for start, end in queries:
+            t0 = time.perf_counter_ns()
+            path = engine.find_path(start, end)
+            latencies.append(time.perf_counter_ns() - t0)
+            if r == 0:
+                expansions.append(engine.nodes_explored)
+                los_checks.append(getattr(engine, 'los_checks', 0))
+                found += path is not None
+
+    # 峰值内存单独测一遍（tracemalloc 会拖慢计时）
+    tracemalloc.start()
+    engine = factory(grid, options)
+    for start, end in queries:
+        engine.find_path(start, end)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    stats = {
+        'queries': len(queries),
+        'repeat': repeat,
+        'preprocess_ms': preprocess_ns / 1e6,
+        'p50_ms': percentile(latencies, 50) / 1e6,
+        'p95_ms': percentile(latencies, 95) / 1e6,
+        'p99_ms': percentile(latencies, 99) / 1e6,
+        'mean_ms': total / len(latencies) / 1e6 if latencies else 0,
+        'queries_per_second': len(latencies) / (total / 1e9) if total else 0,
+        'mean_expansions': sum(expansions) / len(expansions) if expansions else 0,
+        'success_rate': found / len(queries) if queries else 0,
+        'peak_memory_bytes': peak,
+    }
+    if any(los_checks):
+        stats['mean_los_checks'] = sum(los_checks) / len(los_checks)
+    heuristic = getattr(engine, 'custom_heuristic', None)
+    if heuristic is not None:
+        # 预处理换扩展数：记录地标数量和距离表占用
+        stats['landmarks'] = len(heuristic.landmarks)
+        stats['heuristic_memory_bytes'] = heuristic.memory_bytes
+    return stats
+
+
+def run(args):
+    scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    engines = args.engines.split(',') if args.engines else DEFAULT_ENGINES
+    results = {}
+    order = list(SCENARIOS)
+    for name in scenarios:
+        # 种子只取决于场景在注册表中的位置，与本次选中哪些场景无关
+        grid, queries = build_scenario(name, args.seed + order.index(name), args.queries)
+        results[name] = {}
+        for engine_name in engines:
+            stats = measure(engine_name, grid, queries, args)
+            results[name][engine_name] = stats
+            print(f"{name:<16} {engine_name:<24} p50={stats['p50_ms']:9.3f}ms "
+                  f"p95={stats['p95_ms']:9.3f}ms p99={stats['p99_ms']:9.3f}ms "
+                  f"exp={stats['mean_expansions']:10.1f} mem={stats['peak_memory_bytes'] / 1e6:8.2f}MB")
+
+    report = {
+        'meta': {
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'queries': args.queries,
+            'landmarks': args.landmarks,
+            'landmark_selection': args.landmark_selection,
+            'active_landmarks': args.active_landmarks,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+def compare(args):
+    """逐个 (场景, 引擎) 对比延迟和扩展数，超过阈值视为回退，存在回退时返回非零"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    for name, engines in current.items():
+        for engine_name, stats in engines.items():
+            base = baseline.get(name, {}).get(engine_name)
+            if base is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms', 'mean_expansions', 'peak_memory_bytes'):
+                if base[metric] <= 0:
+                    continue
+                ratio = stats[metric] / base[metric]
+                flag = ratio > 1 + args.threshold
+                regressions += flag
+                if flag or args.verbose:
+                    print(f"{'REGRESSION' if flag else 'ok':<10} {name:<16} {engine_name:<24} "
+                          f"{metric:<18} {base[metric]:12.3f} -> {stats[metric]:12.3f} ({ratio:6.2f}x)")
+    print(f"{regressions} regression(s), threshold {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='运行基准并输出 JSON')
+    run_parser.add_argument('--out', default='bench_results.json')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--warmup', type=int, default=1)
+    run_parser.add_argument('--queries', type=int, default=20)
+    run_parser.add_argument('--scenarios', help='逗号分隔，默认全部: ' + ','.join(SCENARIOS))
+    run_parser.add_argument('--engines', help='逗号分隔，可选: ' + ','.join(ENGINES))
+    run_parser.add_argument('--landmarks', type=int, default=8, help='ALT 引擎的地标数量')
+    run_parser.add_argument('--landmark-selection', choices=['farthest', 'random'], default='farthest')
+    run_parser.add_argument('--active-landmarks', type=int, help='每次查询使用的地标数，默认全部')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser('compare', help='与基线 JSON 对比')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+    compare_parser.add_argument('--verbose', action='store_true')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,57 @@
 # -*- coding: utf-8 -*-
 import heapq
 import time
+from search_state import FlatSearchState, flat_steps
+from grid import Grid
+from batch import run_batch
+from components import reachable
+from resumable import BidirectionalSearch
+from open_list import make_open_list
+import metrics
 
 class BidirectionalAStar:
-    def __init__(self, grid):
-        self.grid = grid
-        self.height = len(grid)
-        self.width = len(grid[0])
+    def __init__(self, grid, flat=False, balanced=False, heuristic=None, open_list=None):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
         self.movements = [(0, 1), (1, 0), (0, -1), (-1, 0),
                          (1, 1), (1, -1), (-1, 1), (-1, -1)]
         self.nodes_explored = 0
         self.execution_time = 0
         self.path_length = 0
+        self.path_cost = 0
+        self.nodes_explored_forward = 0
+        self.nodes_explored_backward = 0
+        self.heap_pushes = 0
+        self.stale_pops = 0  # 弹出时已关闭、被跳过的堆条目
+        self.duplicates_suppressed = 0  # 开放表丢弃的不更优的重复压入
+        # 可替换的启发函数（如 landmarks.LandmarkHeuristic），需提供 bind(goal) -> h(带边框下标)
+        self.custom_heuristic = heuristic
+        self._bound = {}
+        # flat=True 时两个方向的搜索状态都存放在预分配的平铺数组里
+        # balanced=True 使用带正确终止条件的平衡双向搜索（同样基于平铺数组）
+        # open_list='heap' / 'bucket'（或返回开放表的工厂）时两个方向各用一个 open_list 模块的带索引开放表，
+        # 隐含 flat=True；balanced 模式按 (b, -g) 双键排序，仍使用自己的堆
+        if open_list is not None and balanced:
+            raise ValueError("balanced 模式不支持 open_list")
+        self.open_list = open_list
+        self._open = None
+        if open_list is not None:
+            self._open = (make_open_list(open_list), make_open_list(open_list))
+        # 交替模式的堆条目为 (f, h, 压入序号, 节点/下标)，Node 模式与 flat 模式的路径和统计完全一致
+        self.flat = flat or balanced or open_list is not None
+        self.balanced = balanced
+        self._forward = None
+        self._pushes = 0
+        if self.flat:
+            self._init_flat()
+
+    def _init_flat(self):
+        self._pwidth = self.grid.pwidth
+        self._blocked = self.grid.padded
+        self._steps = flat_steps(self._pwidth)
+        self._forward = FlatSearchState(len(self._blocked))
+        self._backward = FlatSearchState(len(self._blocked))
 
     class Node:
         def __init__(self, x, y, parent=None, is_forward=True):
@@ -27,32 +67,61 @@ class BidirectionalAStar:
             return self.f < other.f
 
     def heuristic(self, node, goal):
+        bound = self._bound.get((goal.x, goal.y))
+        if bound is not None:
+            return bound((node.x + 1) * self.grid.pwidth + node.y + 1)
         dx = abs(node.x - goal.x)
         dy = abs(node.y - goal.y)
         return 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
 
+    @metrics.instrumented('bidirectional')
     def find_path(self, start, end):
-        start_time = time.time()
+        if not reachable(self.grid, start, end):
+            # 不在同一连通分量，不必搜索
+            self.nodes_explored = 0
+            self.heap_pushes = 0
+            self.stale_pops = 0
+            self.duplicates_suppressed = 0
+            self.nodes_explored_forward = 0
+            self.nodes_explored_backward = 0
+            self.execution_time = 0
+            return None
+        if self.custom_heuristic is not None:
+            # 正向搜索以终点为目标，反向搜索以起点为目标
+            self._bound = {tuple(end): self.custom_heuristic.bind(end, start),
+                           tuple(start): self.custom_heuristic.bind(start, end)}
+        # 三种模式都统计两侧各自的扩展数
+        self.nodes_explored_forward = 0
+        self.nodes_explored_backward = 0
+        if self.balanced:
+            return self._find_path_balanced(start, end)
+        if self.flat:
+            return self._find_path_flat(start, end)
+        start_time = time.perf_counter()
         self.nodes_explored = 0
+        self._pushes = 0
         
         # 初始化正向和反向搜索
-        forward_open = []
-        backward_open = []
         start_node = self.Node(*start, is_forward=True)
         end_node = self.Node(*end, is_forward=False)
-        heapq.heappush(forward_open, start_node)
-        heapq.heappush(backward_open, end_node)
+        forward_open = [(0, 0, 0, start_node)]
+        backward_open = [(0, 0, 0, end_node)]
         
         forward_closed = dict()
         backward_closed = dict()
+        forward_g = {tuple(start): 0}
+        backward_g = {tuple(end): 0}
+        stale = 0
 
         while forward_open and backward_open:
             # 处理正向搜索
-            current_forward = heapq.heappop(forward_open)
+            current_forward = heapq.heappop(forward_open)[3]
             self.nodes_explored += 1
+            self.nodes_explored_forward += 1
 
             # 检查相遇条件
             if (current_forward.x, current_forward.y) in backward_closed:
+                self._open_list_stats(forward_open, backward_open, stale)
                 meeting_node = backward_closed[(current_forward.x, current_forward.y)]
                 path = self._merge_paths(current_forward, meeting_node)
                 self._finalize_stats(start_time, path)
@@ -60,14 +129,18 @@ class BidirectionalAStar:
 
             if (current_forward.x, current_forward.y) not in forward_closed:
                 forward_closed[(current_forward.x, current_forward.y)] = current_forward
-                self._expand_node(current_forward, forward_open, forward_closed, backward_closed, is_forward=True, goal=end_node)
+                self._expand_node(current_forward, forward_open, forward_closed, forward_g, is_forward=True, goal=end_node)
+            else:
+                stale += 1
 
             # 处理反向搜索
-            current_backward = heapq.heappop(backward_open)
+            current_backward = heapq.heappop(backward_open)[3]
             self.nodes_explored += 1
+            self.nodes_explored_backward += 1
 
             # 检查相遇条件
             if (current_backward.x, current_backward.y) in forward_closed:
+                self._open_list_stats(forward_open, backward_open, stale)
                 meeting_node = forward_closed[(current_backward.x, current_backward.y)]
                 path = self._merge_paths(meeting_node, current_backward)
                 self._finalize_stats(start_time, path)
@@ -75,12 +148,15 @@ class BidirectionalAStar:
 
             if (current_backward.x, current_backward.y) not in backward_closed:
                 backward_closed[(current_backward.x, current_backward.y)] = current_backward
-                self._expand_node(current_backward, backward_open, backward_closed, forward_closed, is_forward=False, goal=start_node)
+                self._expand_node(current_backward, backward_open, backward_closed, backward_g, is_forward=False, goal=start_node)
+            else:
+                stale += 1
 
-        self.execution_time = time.time() - start_time
+        self._open_list_stats(forward_open, backward_open, stale)
+        self.execution_time = time.perf_counter() - start_time
         return None
 
-    def _expand_node(self, current, open_list, closed_dict, other_closed, is_forward, goal):
+    def _expand_node(self, current, open_list, closed_dict, g_values, is_forward, goal):
         for dx, dy in self.movements:
             nx = current.x + dx
             ny = current.y + dy
@@ -94,33 +170,313 @@ class BidirectionalAStar:
                 if self.grid[nx][ny] == 1 or (nx, ny) in closed_dict:
                     continue
 
-                # 计算移动成本
+                # 计算移动成本，只压入更优的 g 值
                 move_cost = 14 if dx != 0 and dy != 0 else 10
+                new_g = current.g + move_cost
+                if new_g >= g_values.get((nx, ny), new_g + 1):
+                    continue
+                g_values[(nx, ny)] = new_g
                 new_node = self.Node(nx, ny, current, is_forward)
-                new_node.g = current.g + move_cost
+                new_node.g = new_g
                 new_node.h = self.heuristic(new_node, goal)
                 new_node.f = new_node.g + new_node.h
 
-                heapq.heappush(open_list, new_node)
+                self._pushes += 1
+                heapq.heappush(open_list, (new_node.f, new_node.h, self._pushes, new_node))
+
+    def start_search(self, start, end):
+        """返回可分步推进、可暂停恢复的搜索对象（平衡双向搜索，resumable.BidirectionalSearch）"""
+        return BidirectionalSearch(self, start, end)
+
+    def find_paths(self, queries):
+        """批量查询 [(start, end), ...]，返回 batch.BatchResult
+
+        不论构造时是否 flat，批量查询都使用平铺数组，搜索缓冲区在查询间复用（靠代数戳重置，不清空数组）；
+        两种模式结果相同。分块地图（grid.dense 为 False）没有稠密缓冲区，逐个用 Node 模式查询。
+        """
+        if self.flat or not self.grid.dense:
+            return run_batch(self, queries)
+        if self._forward is None:
+            self._init_flat()
+        self.flat = True
+        try:
+            return run_batch(self, queries)
+        finally:
+            self.flat = False
+
+    def _find_path_flat(self, start, end):
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+        self._pushes = 0
+
+        pw = self._pwidth
+        forward = self._forward
+        backward = self._backward
+        forward_gen = forward.reset()
+        backward_gen = backward.reset()
+
+        s = (start[0] + 1) * pw + start[1] + 1
+        t = (end[0] + 1) * pw + end[1] + 1
+        forward.g[s] = 0
+        forward.parent[s] = -1
+        forward.stamp[s] = forward_gen
+        backward.g[t] = 0
+        backward.parent[t] = -1
+        backward.stamp[t] = backward_gen
+        keyed = self._open is not None
+        if keyed:
+            forward_open, backward_open = self._open
+            forward_open.clear()
+            backward_open.clear()
+            forward_open.push(s, 0)
+            backward_open.push(t, 0)
+        else:
+            forward_open = [(0, 0, 0, s)]
+            backward_open = [(0, 0, 0, t)]
+        forward_closed = forward.closed
+        backward_closed = backward.closed
+        heappop = heapq.heappop
+        stale = 0
+
+        while forward_open and backward_open:
+            # 处理正向搜索
+            current = forward_open.pop() if keyed else heappop(forward_open)[3]
+            self.nodes_explored += 1
+            self.nodes_explored_forward += 1
+
+            # 检查相遇条件
+            if backward_closed[current] == backward_gen:
+                self._open_list_stats(forward_open, backward_open, stale)
+                path = self._merge_flat(current)
+                self._finalize_stats(start_time, path)
+                return path
+
+            if forward_closed[current] != forward_gen:
+                forward_closed[current] = forward_gen
+                self._expand_flat(current, forward, forward_open, end)
+            else:
+                stale += 1
+
+            # 处理反向搜索
+            current = backward_open.pop() if keyed else heappop(backward_open)[3]
+            self.nodes_explored += 1
+            self.nodes_explored_backward += 1
+
+            if forward_closed[current] == forward_gen:
+                self._open_list_stats(forward_open, backward_open, stale)
+                path = self._merge_flat(current)
+                self._finalize_stats(start_time, path)
+                return path
+
+            if backward_closed[current] != backward_gen:
+                backward_closed[current] = backward_gen
+                self._expand_flat(current, backward, backward_open, start)
+            else:
+                stale += 1
+
+        self._open_list_stats(forward_open, backward_open, stale)
+        self.execution_time = time.perf_counter() - start_time
+        return None
+
+    def _find_path_balanced(self, start, end):
+        """平衡双向A*（BAE* 风格）：两侧按 b(n) = 2g(n) + h(n) - h'(n) 排序，记录最佳相遇代价 mu
+
+        h 是到本侧目标的启发值，h' 是到本侧起点（对侧目标）的启发值。任何更优的路径必然在两侧各有一个
+        开放节点，其代价不小于两侧 b 最小值的平均，因此 mu 不大于 (bF + bB) / 2 时停止；
+        启发函数一致时返回最优路径。每次扩展开放表较小的一侧，同 b 值优先扩展 g 较大的节点；
+        g + h 或 b 已不可能改进 mu 的节点不入堆。
+        """
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+
+        pw = self._pwidth
+        forward = self._forward
+        backward = self._backward
+        forward.reset()
+        backward.reset()
+
+        s = (start[0] + 1) * pw + start[1] + 1
+        t = (end[0] + 1) * pw + end[1] + 1
+        for state, origin in ((forward, s), (backward, t)):
+            state.g[origin] = 0
+            state.parent[origin] = -1
+            state.stamp[origin] = state.generation
+        # 每侧：(搜索状态, 开放表 [(b, -g, 下标)], 对侧状态, 启发目标, 本侧起点)
+        sides = [
+            (forward, [(0, 0, s)], backward, tuple(end), tuple(start)),
+            (backward, [(0, 0, t)], forward, tuple(start), tuple(end)),
+        ]
+        best = [0 if s == t else float('inf'), s if s == t else -1]  # [mu, 相遇点]
+        heappop = heapq.heappop
+        stale = 0
+
+        while True:
+            # 丢弃堆顶已关闭的过期条目
+            for state, open_list, _, _, _ in sides:
+                closed = state.closed
+                gen = state.generation
+                while open_list and closed[open_list[0][2]] == gen:
+                    heappop(open_list)
+                    stale += 1
+            forward_open = sides[0][1]
+            backward_open = sides[1][1]
+            if not forward_open or not backward_open:
+                break
+            if 2 * best[0] <= forward_open[0][0] + backward_open[0][0]:
+                break
+
+            side = 0 if len(forward_open) <= len(backward_open) else 1
+            state, open_list, other, goal, origin = sides[side]
+            current = heappop(open_list)[2]
+            state.closed[current] = state.generation
+            self.nodes_explored += 1
+            if side == 0:
+                self.nodes_explored_forward += 1
+            else:
+                self.nodes_explored_backward += 1
+            self._expand_balanced(current, state, open_list, goal, origin, other,
+                                  sides[1 - side][1][0][0], best)
+
+        self.heap_pushes = self.nodes_explored + stale + len(sides[0][1]) + len(sides[1][1])
+        self.stale_pops = stale
+        if best[1] == -1:
+            self.execution_time = time.perf_counter() - start_time
+            return None
+        path = self._merge_flat(best[1])
+        self._finalize_stats(start_time, path)
+        return path
+
+    def _expand_balanced(self, current, state, open_list, goal, origin, other, other_min, best):
+        blocked = self._blocked
+        g = state.g
+        parent = state.parent
+        stamp = state.stamp
+        closed = state.closed
+        gen = state.generation
+        other_g = other.g
+        other_stamp = other.stamp
+        other_gen = other.generation
+        heappush = heapq.heappush
+        if self.custom_heuristic is not None:
+            to_goal = self._bound.get(tuple(goal))
+            to_origin = self._bound.get(tuple(origin))
+        else:
+            to_goal = to_origin = None
+        tx, ty = goal[0] + 1, goal[1] + 1
+        sx, sy = origin[0] + 1, origin[1] + 1
+        cx, cy = divmod(current, self._pwidth)
+        current_g = g[current]
+        for offset, dx, dy, move_cost, corner1, corner2 in self._steps:
+            n = current + offset
+            if blocked[n] or closed[n] == gen:
+                continue
+            if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                continue
+
+            new_g = current_g + move_cost
+            if stamp[n] != gen or new_g < g[n]:
+                g[n] = new_g
+                parent[n] = current
+                stamp[n] = gen
+                # 对侧已到达过该格子：更新最佳相遇代价
+                if other_stamp[n] == other_gen and new_g + other_g[n] < best[0]:
+                    best[0] = new_g + other_g[n]
+                    best[1] = n
+                if to_goal is not None:
+                    h = to_goal(n)
+                    h_origin = to_origin(n)
+                else:
+                    nx = cx + dx
+                    ny = cy + dy
+                    hx = abs(nx - tx)
+                    hy = abs(ny - ty)
+                    h = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                    hx = abs(nx - sx)
+                    hy = abs(ny - sy)
+                    h_origin = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                b = 2 * new_g + h - h_origin
+                # 经过该格子的路径不可能比 mu 更短
+                if new_g + h >= best[0] or b + other_min >= 2 * best[0]:
+                    continue
+                heappush(open_list, (b, -new_g, n))
+
+    def _expand_flat(self, current, state, open_list, goal):
+        blocked = self._blocked
+        g = state.g
+        parent = state.parent
+        stamp = state.stamp
+        closed = state.closed
+        gen = state.generation
+        bound = self._bound.get(tuple(goal)) if self.custom_heuristic is not None else None
+        keyed = self._open is not None
+        tx, ty = goal[0] + 1, goal[1] + 1
+        cx, cy = divmod(current, self._pwidth)
+        current_g = g[current]
+        for offset, dx, dy, move_cost, corner1, corner2 in self._steps:
+            n = current + offset
+            if blocked[n] or closed[n] == gen:
+                continue
+            # 对角线移动障碍检查
+            if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                continue
+
+            new_g = current_g + move_cost
+            if stamp[n] != gen or new_g < g[n]:
+                g[n] = new_g
+                parent[n] = current
+                stamp[n] = gen
+                if bound is not None:
+                    h = bound(n)
+                else:
+                    hx = abs(cx + dx - tx)
+                    hy = abs(cy + dy - ty)
+                    h = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                if keyed:
+                    open_list.push(n, new_g + h)
+                else:
+                    self._pushes += 1
+                    heapq.heappush(open_list, (new_g + h, h, self._pushes, n))
+
+    def _open_list_stats(self, forward_open, backward_open, stale):
+        if self._open is None:
+            # 每次弹出对应一次压入，剩余的堆条目也都压入过
+            self.heap_pushes = self.nodes_explored + len(forward_open) + len(backward_open)
+            self.stale_pops = stale
+            self.duplicates_suppressed = 0
+        else:
+            self.heap_pushes = forward_open.pushes + backward_open.pushes
+            self.stale_pops = stale + forward_open.stale_pops + backward_open.stale_pops
+            self.duplicates_suppressed = forward_open.duplicates + backward_open.duplicates
+
+    def _merge_flat(self, meeting):
+        # 相遇点两侧分别沿父节点数组回溯后拼接
+        pw = self._pwidth
+        self.path_cost = self._forward.g[meeting] + self._backward.g[meeting]
+        with metrics.phase('reconstruct'):
+            forward_path = self._forward.trace(meeting)
+            backward_path = self._backward.trace(meeting)[::-1]
+            return [(i // pw - 1, i % pw - 1) for i in forward_path + backward_path[1:]]
 
     def _merge_paths(self, forward_node, backward_node):
         # 合并正向和反向路径
-        forward_path = []
-        current = forward_node
-        while current:
-            forward_path.append((current.x, current.y))
-            current = current.parent
+        self.path_cost = forward_node.g + backward_node.g
+        with metrics.phase('reconstruct'):
+            forward_path = []
+            current = forward_node
+            while current:
+                forward_path.append((current.x, current.y))
+                current = current.parent
 
-        backward_path = []
-        current = backward_node
-        while current:
-            backward_path.append((current.x, current.y))
-            current = current.parent
+            backward_path = []
+            current = backward_node
+            while current:
+                backward_path.append((current.x, current.y))
+                current = current.parent
 
-        # 合并并去除重复点
-        return forward_path[::-1] + backward_path[1:]
+            # 合并并去除重复点
+            return forward_path[::-1] + backward_path[1:]
 
     def _finalize_stats(self, start_time, path):
-        self.execution_time = time.time() - start_time
+        self.execution_time = time.perf_counter() - start_time
         if path:
             self.path_length = len(path) 
\ No newline at end of file
@@ -3,6 +3,9 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 from matplotlib import colors
 import random
+from collections import deque
+
+import map_generators
 
 # 配置matplotlib中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei']  # 简体中文默认字体
@@ -36,20 +39,22 @@ def visualize(grid, path, title="", stats=None, obstacles=False, ax=None):
         ax.text(0.05, 0.95, textstr, transform=ax.transAxes, 
                 verticalalignment='top', bbox=dict(facecolor='white', alpha=0.5))
 
-def generate_random_grid(size, obstacle_prob=0.2):
-    """生成保证起点终点连通的随机网格"""
-    while True:
-        grid = [[1 if random.random() < obstacle_prob and (i,j) not in [(0,0),(size[1]-1,size[0]-1)] else 0 
-                for j in range(size[0])] for i in range(size[1])]
-        if bfs((0,0), (size[1]-1, size[0]-1), grid):
-            return grid
+def generate_random_grid(size, obstacle_prob=0.2, seed=None):
+    """生成保证起点终点连通的随机网格（size 为 (宽, 高)，返回 0/1 列表的列表）
+
+    不传 seed 时从 random 模块取种子，random.seed() 可以复现结果。
+    需要 uint8 数组时直接使用 map_generators.random_grid。
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    return map_generators.random_grid(size[1], size[0], obstacle_prob, seed=seed).tolist()
 
 def bfs(start, end, grid):
     """广度优先搜索验证连通性"""
-    queue = [start]
+    queue = deque([start])
     visited = set()
     while queue:
-        x, y = queue.pop(0)
+        x, y = queue.popleft()
         if (x, y) == end:
             return True
         for dx, dy in [(0,1),(1,0),(0,-1),(-1,0)]:
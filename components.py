@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+from array import array
+from collections import deque
+
+try:
+    import numpy as np
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+
+def _neighbor_offsets(pw, diagonal):
+    if diagonal:
+        return (1, -1, pw, -pw, pw + 1, pw - 1, -pw + 1, -pw - 1)
+    return (1, -1, pw, -pw)
+
+
+class ComponentIndex:
+    """连通分量索引：给每个可通行格子一个分量标号，连通性判断变成 O(1) 查表
+
+    diagonal=False 时按四邻域连通。对角线移动要求两个相邻格都可通行的引擎
+    （AStar、BidirectionalAStar、JPS+ 等）的可达性与四连通完全一致；
+    允许穿过对角缝隙的引擎使用 diagonal=True（八邻域）。
+
+    标号按带边框下标 (x+1)*pwidth + (y+1) 存放，边框和障碍为 0。修改格子时增量更新：
+    打通格子用并查集合并相邻分量，堵住格子时从各邻居同步向外搜索，只给分裂出来的部分重新编号。
+    """
+
+    def __init__(self, grid, diagonal=False):
+        self.grid = grid
+        self.diagonal = diagonal
+        self._offsets = _neighbor_offsets(grid.pwidth, diagonal)
+        self._blocked = grid.padded
+        if ndimage is not None:
+            self._label_scipy()
+        else:
+            self._label_bfs()
+        # 并查集：合并后的标号指向代表标号
+        self._parent = list(range(self.count + 1))
+        self._next_label = self.count + 1
+
+    @classmethod
+    def from_labels(cls, grid, diagonal, labels, count, next_label):
+        """直接使用已有的标号数组（如 map_format 映射的文件内容），不重新标记"""
+        index = cls.__new__(cls)
+        index.grid = grid
+        index.diagonal = diagonal
+        index._offsets = _neighbor_offsets(grid.pwidth, diagonal)
+        index._blocked = grid.padded
+        index.labels = labels
+        index.count = count
+        index._parent = list(range(next_label))
+        index._next_label = next_label
+        return index
+
+    def _label_scipy(self):
+        cells = self.grid.to_numpy()
+        structure = np.ones((3, 3), dtype=bool) if self.diagonal else None
+        labels, count = ndimage.label(cells == 0, structure)
+        padded = np.zeros((self.grid.height + 2, self.grid.width + 2), dtype=np.int32)
+        padded[1:-1, 1:-1] = labels
+        self.labels = array('i')
+        self.labels.frombytes(padded.tobytes())
+        self.count = int(count)
+
+    def _label_bfs(self):
+        blocked = self._blocked
+        offsets = self._offsets
+        labels = array('i', [0]) * len(blocked)
+        count = 0
+        for seed in range(len(blocked)):
+            if blocked[seed] or labels[seed]:
+                continue
+            count += 1
+            labels[seed] = count
+            queue = deque([seed])
+            while queue:
+                current = queue.popleft()
+                for offset in offsets:
+                    n = current + offset
+                    if not blocked[n] and not labels[n]:
+                        labels[n] = count
+                        queue.append(n)
+        self.labels = labels
+        self.count = count
+
+    def _find(self, label):
+        parent = self._parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def label(self, pos):
+        """格子所在分量的标号，障碍或越界为 0"""
+        x, y = pos
+        if not (0 <= x < self.grid.height and 0 <= y < self.grid.width):
+            return 0
+        return self._find(self.labels[(x + 1) * self.grid.pwidth + y + 1])
+
+    def connected(self, start, end):
+        """两个格子都可通行且位于同一分量"""
+        a = self.label(start)
+        return a != 0 and a == self.label(end)
+
+    def update(self, x, y, value):
+        """格子 (x, y) 已被改为 value 后调用（Grid.set_cell 会自动调用）"""
+        idx = (x + 1) * self.grid.pwidth + y + 1
+        if value:
+            if self.labels[idx]:
+                self._block(idx)
+        elif not self.labels[idx]:
+            self._open(idx)
+
+    def _open(self, idx):
+        roots = []
+        for offset in self._offsets:
+            label = self.labels[idx + offset]
+            if label:
+                root = self._find(label)
+                if root not in roots:
+                    roots.append(root)
+        if not roots:
+            self.labels[idx] = self._new_label()
+            return
+        for root in roots[1:]:
+            self._parent[root] = roots[0]
+            self.count -= 1
+        self.labels[idx] = roots[0]
+
+    def _new_label(self):
+        label = self._next_label
+        self._next_label += 1
+        self._parent.append(label)
+        self.count += 1
+        return label
+
+    def _block(self, idx):
+        self.labels[idx] = 0
+        blocked = self._blocked
+        offsets = self._offsets
+        seeds = [idx + offset for offset in offsets if not blocked[idx + offset]]
+        if not seeds:
+            self.count -= 1
+            return
+        if len(seeds) == 1:
+            return
+
+        # 从每个邻居同步做 BFS：两个搜索相遇就合并为一组；某组先耗尽说明它是分裂出来的新分量。
+        # 轮流推进保证较小的部分先被完整枚举，大分量不必整体重扫。
+        owner = {}
+        group = list(range(len(seeds)))
+        queues = []
+        for k, seed in enumerate(seeds):
+            owner[seed] = k
+            queues.append(deque([seed]))
+
+        def find(k):
+            while group[k] != k:
+                group[k] = group[group[k]]
+                k = group[k]
+            return k
+
+        active = list(range(len(seeds)))
+        groups = len(seeds)
+        while groups > 1:
+            for k in list(active):
+                queue = queues[k]
+                if not queue:
+                    active.remove(k)
+                    root = find(k)
+                    if any(find(j) == root for j in active):
+                        continue
+                    # 这一组已穷尽且没有遇到其他组：给它一个新标号
+                    label = self._new_label()
+                    for cell, owner_k in owner.items():
+                        if find(owner_k) == root:
+                            self.labels[cell] = label
+                    groups -= 1
+                    if groups == 1:
+                        break
+                    continue
+                current = queue.popleft()
+                for offset in offsets:
+                    n = current + offset
+                    if blocked[n]:
+                        continue
+                    other = owner.get(n)
+                    if other is None:
+                        owner[n] = k
+                        queue.append(n)
+                    else:
+                        a, b = find(other), find(k)
+                        if a != b:
+                            group[a] = b
+                            groups -= 1
+                if groups == 1:
+                    break
+
+
+def reachable(grid, start, end, diagonal=False):
+    """起点或终点是障碍（或越界）、或两者分属不同分量时返回 False（一定不可达）
+
+    网格不提供分量索引（components() 返回 None）时只检查端点，连通性交给搜索本身判断；
+    tiled_grid.TiledGrid 提供按分块汇总的索引，同样在这里拒绝不可达的查询。
+    """
+    if grid.is_blocked(*start) or grid.is_blocked(*end):
+        return False
+    index = grid.components(diagonal)
+    if index is None:
+        return True
+    return index.connected(start, end)
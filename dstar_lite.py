@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+import heapq
+import time
+
+from grid import Grid
+from search_state import flat_steps
+
+INF = float('inf')
+
+
+class DStarLite:
+    """D* Lite 增量重规划：障碍物变化后只修复受影响的那部分搜索树
+
+    搜索从终点反向进行，g/rhs 按带边框下标存放在平铺数组中；移动代价与 AStar 相同
+    （直线10、对角14，对角线移动要求两个相邻格都可通行）。
+    """
+
+    def __init__(self, grid, start, goal):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
+        self._pwidth = self.grid.pwidth
+        self._blocked = self.grid.padded
+        self._steps = flat_steps(self._pwidth)
+        size = len(self._blocked)
+        self.g = [INF] * size
+        self.rhs = [INF] * size
+        self._key = [None] * size  # 当前在开放表中的键，None 表示不在表中
+        self._open = []
+        self.km = 0
+        self.start = self._index(start)
+        self.goal = self._index(goal)
+        self._last = self.start
+        self.rhs[self.goal] = 0
+        self._push(self.goal)
+
+        self.nodes_explored = 0  # 最近一次 compute_shortest_path 的扩展数
+        self.total_expansions = 0
+        self.update_history = []  # 每次 update_cells 的 (变化格子数, 重新扩展的顶点数)
+        self.execution_time = 0
+        self.path_length = 0
+        self.path_cost = 0
+
+    def _index(self, pos):
+        return (pos[0] + 1) * self._pwidth + pos[1] + 1
+
+    def _pos(self, idx):
+        x, y = divmod(idx, self._pwidth)
+        return (x - 1, y - 1)
+
+    def heuristic(self, a, b):
+        ax, ay = divmod(a, self._pwidth)
+        bx, by = divmod(b, self._pwidth)
+        dx = abs(ax - bx)
+        dy = abs(ay - by)
+        return 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
+
+    def _calculate_key(self, idx):
+        m = min(self.g[idx], self.rhs[idx])
+        return (m + self.heuristic(self.start, idx) + self.km, m)
+
+    def _push(self, idx):
+        key = self._calculate_key(idx)
+        self._key[idx] = key
+        heapq.heappush(self._open, (key[0], key[1], idx))
+
+    def _neighbors(self, idx):
+        """可通行的邻居及移动代价（代价对称，前驱与后继相同）"""
+        blocked = self._blocked
+        if blocked[idx]:
+            return
+        for offset, _, _, cost, corner1, corner2 in self._steps:
+            n = idx + offset
+            if blocked[n]:
+                continue
+            if corner1 and (blocked[idx + corner1] or blocked[idx + corner2]):
+                continue
+            yield n, cost
+
+    def _update_vertex(self, idx):
+        g = self.g
+        if idx != self.goal:
+            best = INF
+            for n, cost in self._neighbors(idx):
+                if cost + g[n] < best:
+                    best = cost + g[n]
+            self.rhs[idx] = best
+        self._update_membership(idx)
+
+    def _update_membership(self, idx):
+        # 不一致(g != rhs)的顶点在开放表中，一致的顶点不在
+        if self.g[idx] != self.rhs[idx]:
+            self._push(idx)
+        else:
+            self._key[idx] = None
+
+    def _top_key(self):
+        """弹出过期条目后返回开放表中最小的键"""
+        open_list = self._open
+        while open_list:
+            k1, k2, idx = open_list[0]
+            if self._key[idx] == (k1, k2):
+                return (k1, k2)
+            heapq.heappop(open_list)
+        return (INF, INF)
+
+    def compute_shortest_path(self):
+        g = self.g
+        rhs = self.rhs
+        start = self.start
+        expansions = 0
+        while self._top_key() < self._calculate_key(start) or rhs[start] != g[start]:
+            k1, k2, u = heapq.heappop(self._open)
+            if self._key[u] != (k1, k2):
+                continue
+            expansions += 1
+            k_new = self._calculate_key(u)
+            if (k1, k2) < k_new:
+                self._push(u)
+            elif g[u] > rhs[u]:
+                # 过一致：g 下降，只可能让邻居的 rhs 变小
+                g[u] = rhs[u]
+                self._key[u] = None
+                for n, cost in self._neighbors(u):
+                    if n != self.goal and cost + g[u] < rhs[n]:
+                        rhs[n] = cost + g[u]
+                        self._update_membership(n)
+            else:
+                # 欠一致：依赖 u 的邻居需要重新计算 rhs
+                g_old = g[u]
+                g[u] = INF
+                self._update_vertex(u)
+                for n, cost in self._neighbors(u):
+                    if rhs[n] == cost + g_old:
+                        self._update_vertex(n)
+        self.nodes_explored = expansions
+        self.total_expansions += expansions
+        return expansions
+
+    def move_start(self, start):
+        """机器人前进到新位置，键值修正量 km 累加起点移动的启发距离"""
+        idx = self._index(start)
+        self.km += self.heuristic(self._last, idx)
+        self._last = idx
+        self.start = idx
+
+    def update_cells(self, changes):
+        """批量应用格子变化 [(x, y, value), ...]，只修复受影响的顶点
+
+        返回本次重规划重新扩展的顶点数。
+        """
+        start_time = time.perf_counter()
+        blocked = self._blocked
+        touched = set()
+        count = 0
+        for x, y, value in changes:
+            idx = self._index((x, y))
+            if blocked[idx] == value:
+                continue
+            self.grid.set_cell(x, y, value)
+            count += 1
+            touched.add(idx)
+            # 格子变化会影响以它为端点的边，以及以它为拐角的对角线边，
+            # 这些边的端点都在它的8邻域内（边框格子永远是障碍，重算也无妨）
+            for offset, _, _, _, _, _ in self._steps:
+                touched.add(idx + offset)
+        for idx in touched:
+            self._update_vertex(idx)
+        expansions = self.compute_shortest_path()
+        self.update_history.append((count, expansions))
+        self.execution_time = time.perf_counter() - start_time
+        return expansions
+
+    def find_path(self, start=None):
+        """从当前起点（或移动到 start 后）沿 g 值下降方向提取路径"""
+        start_time = time.perf_counter()
+        if start is not None and self._index(start) != self.start:
+            self.move_start(start)
+        # 已一致时 compute_shortest_path 立即返回，起点移动到未扩展区域时会补齐
+        self.compute_shortest_path()
+        self.execution_time = time.perf_counter() - start_time
+        self.path_length = 0
+        self.path_cost = 0
+        current = self.start
+        # 起点或终点是障碍时不可达（终点的 rhs 固定为0，需要单独判断）
+        if self.g[current] == INF or self._blocked[current] or self._blocked[self.goal]:
+            return None
+        path = [self._pos(current)]
+        while current != self.goal:
+            best = None
+            best_cost = INF
+            for n, cost in self._neighbors(current):
+                if cost + self.g[n] < best_cost:
+                    best_cost = cost + self.g[n]
+                    best = n
+            if best is None:
+                return None
+            current = best
+            path.append(self._pos(current))
+        self.path_length = len(path)
+        self.path_cost = self.g[self.start]
+        return path
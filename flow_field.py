@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import heapq
+import time
+from collections import OrderedDict
+
+import metrics
+from batch import run_batch
+from grid import Grid
+from search_state import MOVES, flat_steps
+
+# 方向字节的特殊取值：终点本身、不可达
+AT_GOAL = 8
+NO_PATH = 255
+
+
+class FlowField:
+    """以终点为中心的流场：从终点做一次反向 Dijkstra，每个格子记录一个字节的下一步方向
+
+    方向是 search_state.MOVES 的下标（0-7），终点为 AT_GOAL，不可达为 NO_PATH。
+    代价和移动规则与 AStar 相同（直线10、对角14，不能切角），沿流场走出的路径是最优路径。
+    任意多个智能体共享同一个流场，每一步查询都是 O(1)。
+    """
+
+    def __init__(self, grid, goal):
+        self.grid = Grid.wrap(grid)
+        self.goal = tuple(goal)
+        self.version = self.grid.version
+        self._pwidth = self.grid.pwidth
+        self.nodes_explored = 0
+        start_time = time.perf_counter()
+        with metrics.phase('preprocess', 'flow_field'):
+            self.directions = self._build()
+        self.build_time = time.perf_counter() - start_time
+
+    def _build(self):
+        pw = self._pwidth
+        blocked = self.grid.padded
+        steps = flat_steps(pw)
+        directions = bytearray([NO_PATH]) * len(blocked)
+        goal = (self.goal[0] + 1) * pw + self.goal[1] + 1
+        if blocked[goal]:
+            return directions
+        dist = {goal: 0}
+        directions[goal] = AT_GOAL
+        heap = [(0, goal)]
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        explored = 0
+        while heap:
+            d, current = heappop(heap)
+            if d > dist[current]:
+                continue
+            explored += 1
+            # 代价对称：从 current 扩展到 n，等价于 n 沿相反方向走到 current
+            for direction, (offset, _, _, cost, corner1, corner2) in enumerate(steps):
+                n = current - offset
+                if blocked[n]:
+                    continue
+                if corner1 and (blocked[n + corner1] or blocked[n + corner2]):
+                    continue
+                nd = d + cost
+                if nd < dist.get(n, nd + 1):
+                    dist[n] = nd
+                    directions[n] = direction
+                    heappush(heap, (nd, n))
+        self.nodes_explored = explored
+        return directions
+
+    @property
+    def memory_bytes(self):
+        return len(self.directions)
+
+    def direction(self, pos):
+        """(x, y) 处的方向字节"""
+        return self.directions[(pos[0] + 1) * self._pwidth + pos[1] + 1]
+
+    def next_step(self, pos):
+        """下一步要走到的格子；已在终点时返回终点，不可达时返回 None"""
+        d = self.directions[(pos[0] + 1) * self._pwidth + pos[1] + 1]
+        if d == NO_PATH:
+            return None
+        if d == AT_GOAL:
+            return tuple(pos)
+        dx, dy, _ = MOVES[d]
+        return (pos[0] + dx, pos[1] + dy)
+
+    def path(self, start):
+        """沿流场从 start 走到终点，不可达时返回 None"""
+        pos = tuple(start)
+        if not (0 <= pos[0] < self.grid.height and 0 <= pos[1] < self.grid.width):
+            return None
+        if self.direction(pos) == NO_PATH:
+            # 包括终点本身是障碍的情况
+            return None
+        path = [pos]
+        while pos != self.goal:
+            pos = self.next_step(pos)
+            if pos is None:
+                return None
+            path.append(pos)
+        return path
+
+
+class FlowFieldCache:
+    """按终点缓存流场（LRU），地图版本变化时重新计算
+
+    提供 find_path(start, end) 接口，可以像普通引擎一样使用或交给 batch.run_batch；
+    共享同一终点的 N 个智能体只需要一次反向搜索。
+    """
+
+    def __init__(self, grid, max_fields=16):
+        self.grid = Grid.wrap(grid)
+        self.width = self.grid.width
+        self.max_fields = max_fields
+        self._fields = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nodes_explored = 0
+        self.execution_time = 0
+        self.path_length = 0
+        self.path_cost = 0
+
+    def field(self, goal):
+        """取得（必要时计算）终点为 goal 的流场"""
+        goal = tuple(goal)
+        field = self._fields.get(goal)
+        if field is not None and field.version == self.grid.version:
+            self._fields.move_to_end(goal)
+            self.hits += 1
+            return field
+        self.misses += 1
+        field = FlowField(self.grid, goal)
+        self._fields[goal] = field
+        self._fields.move_to_end(goal)
+        while len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+            self.evictions += 1
+        return field
+
+    def next_step(self, pos, goal):
+        return self.field(goal).next_step(pos)
+
+    @metrics.instrumented('flow_field')
+    def find_path(self, start, end):
+        start_time = time.perf_counter()
+        misses = self.misses
+        field = self.field(end)
+        self.nodes_explored = field.nodes_explored if self.misses != misses else 0
+        path = field.path(start)
+        self.execution_time = time.perf_counter() - start_time
+        if path is None:
+            self.path_length = 0
+            self.path_cost = 0
+            return None
+        self.path_length = len(path)
+        self.path_cost = sum(14 if a[0] != b[0] and a[1] != b[1] else 10 for a, b in zip(path, path[1:]))
+        return path
+
+    def find_paths(self, queries):
+        """批量查询 [(start, end), ...]，返回 batch.BatchResult"""
+        return run_batch(self, queries)
+
+    def get_stats(self):
+        return {
+            'fields': len(self._fields),
+            'memory_bytes': sum(f.memory_bytes for f in self._fields.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import mmap
+
+
+class Grid:
+    """紧凑网格：底层是一块连续的 uint8 缓冲区，按 grid[x][y] 行优先存放（0可通行，1障碍）
+
+    可以零拷贝地包装 numpy 数组(uint8/bool)、bytes/bytearray 和内存映射文件，
+    同时保留 grid[x][y] / len(grid) 的访问方式，各寻路引擎可以直接使用。
+    """
+
+    # 有整块的格子缓冲区（cells / padded / to_numpy 可用）；tiled_grid.TiledGrid 为 False
+    dense = True
+
+    def __init__(self, buffer, height, width):
+        cells = memoryview(buffer)
+        if cells.ndim != 1 or cells.format != 'B':
+            cells = cells.cast('B')
+        if len(cells) < height * width:
+            raise ValueError(f"缓冲区太小: {len(cells)} < {height}x{width}")
+        self.cells = cells[:height * width]
+        self.height = height
+        self.width = width
+        self.size = height * width
+        self.version = 0  # 每次修改格子后递增，派生数据据此判断是否失效
+        self._rows = None
+        self._padded = None
+        self._components = {}
+
+    @classmethod
+    def wrap(cls, grid):
+        """把各种网格表示转换为 Grid，能零拷贝时不复制数据"""
+        if isinstance(grid, Grid):
+            return grid
+        if hasattr(grid, '__array_interface__'):
+            import numpy as np
+            array = np.asarray(grid)
+            height, width = array.shape
+            if array.dtype not in (np.uint8, np.bool_) or not array.flags.c_contiguous:
+                array = np.ascontiguousarray(array != 0, dtype=np.uint8)
+            return cls(array, height, width)
+        # list of lists：逐行拷贝一次
+        height = len(grid)
+        width = len(grid[0]) if height > 0 else 0
+        buffer = bytearray(height * width)
+        for x, row in enumerate(grid):
+            buffer[x * width:(x + 1) * width] = bytes(row)
+        return cls(buffer, height, width)
+
+    @classmethod
+    def from_file(cls, path, height, width, offset=0, writable=False):
+        """内存映射地图文件（height*width 字节的原始 uint8 数据）"""
+        with open(path, 'r+b' if writable else 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        return cls(memoryview(mapped)[offset:offset + height * width], height, width)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, x):
+        # 每行是底层缓冲区的一个切片视图，grid[x][y] 不产生拷贝
+        if self._rows is None:
+            w = self.width
+            self._rows = [self.cells[i * w:(i + 1) * w] for i in range(self.height)]
+        return self._rows[x]
+
+    def __iter__(self):
+        for x in range(self.height):
+            yield self[x]
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.to_numpy()
+        return array if dtype is None else array.astype(dtype)
+
+    def to_numpy(self):
+        """返回共享底层缓冲区的 (height, width) uint8 数组"""
+        import numpy as np
+        return np.frombuffer(self.cells, dtype=np.uint8).reshape(self.height, self.width)
+
+    def tolist(self):
+        w = self.width
+        return [list(self.cells[x * w:(x + 1) * w]) for x in range(self.height)]
+
+    def index(self, x, y):
+        return x * self.width + y
+
+    def passable(self, idx):
+        return self.cells[idx] == 0
+
+    def is_blocked(self, x, y):
+        """越界视为障碍"""
+        return not (0 <= x < self.height and 0 <= y < self.width) or self.cells[x * self.width + y] == 1
+
+    def obstacle_count(self):
+        return bytes(self.cells).count(1)
+
+    @property
+    def pwidth(self):
+        """带边框网格的行宽"""
+        return self.width + 2
+
+    @property
+    def padded(self):
+        """带一圈障碍边框的副本，下标 (x+1)*pwidth + (y+1)，邻居访问无需越界判断
+
+        第一次访问时构建并缓存，所有引擎共享。
+        """
+        if self._padded is None:
+            w = self.width
+            pw = w + 2
+            padded = bytearray(b'\x01') * (pw * (self.height + 2))
+            for x in range(self.height):
+                base = (x + 1) * pw + 1
+                padded[base:base + w] = self.cells[x * w:(x + 1) * w]
+            self._padded = padded
+        return self._padded
+
+    def components(self, diagonal=False):
+        """连通分量索引（components.ComponentIndex），第一次调用时构建并缓存"""
+        index = self._components.get(diagonal)
+        if index is None:
+            from components import ComponentIndex
+            index = self._components[diagonal] = ComponentIndex(self, diagonal)
+        return index
+
+    def set_cell(self, x, y, value):
+        """修改一个格子（要求底层缓冲区可写），同步更新边框副本、连通分量索引并递增版本号"""
+        self.cells[x * self.width + y] = value
+        if self._padded is not None:
+            self._padded[(x + 1) * (self.width + 2) + y + 1] = value
+        for index in self._components.values():
+            index.update(x, y, value)
+        self.version += 1
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+import heapq
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+from astar import AStar
+from components import reachable
+from grid import Grid
+from map_format import fingerprint
+from search_state import flat_steps
+
+INF = float('inf')
+# save() 写出的 JSON 格式版本
+GRAPH_FORMAT_VERSION = 1
+
+
+def _octile(ax, ay, bx, by):
+    dx = abs(ax - bx)
+    dy = abs(ay - by)
+    return 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
+
+
+def _local_distances(cells, ch, cw, source, targets):
+    """在 ch x cw 的簇内做 Dijkstra（不离开簇），返回 source 到各 target 的距离"""
+    # 加一圈障碍边框，邻居访问不必判断越界；下标换算为带边框坐标
+    pw = cw + 2
+    blocked = bytearray(b'\x01') * (pw * (ch + 2))
+    for x in range(ch):
+        blocked[(x + 1) * pw + 1:(x + 1) * pw + 1 + cw] = cells[x * cw:(x + 1) * cw]
+    steps = flat_steps(pw)
+
+    def padded(i):
+        return (i // cw + 1) * pw + i % cw + 1
+
+    dist = [INF] * len(blocked)
+    start = padded(source)
+    dist[start] = 0
+    heap = [(0, start)]
+    remaining = set(padded(t) for t in targets)
+    remaining.discard(start)
+    while heap and remaining:
+        d, current = heapq.heappop(heap)
+        if d > dist[current]:
+            continue
+        remaining.discard(current)
+        for offset, _, _, cost, corner1, corner2 in steps:
+            n = current + offset
+            if blocked[n]:
+                continue
+            # 对角线移动要求两个相邻格都可通行
+            if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                continue
+            nd = d + cost
+            if nd < dist[n]:
+                dist[n] = nd
+                heapq.heappush(heap, (nd, n))
+    return [dist[padded(t)] for t in targets]
+
+
+def _cluster_edges(task):
+    """单个簇的预处理任务：计算簇内各入口两两之间的距离（可在子进程中执行）"""
+    cells, ch, cw, entrances = task
+    edges = []
+    for i, source in enumerate(entrances[:-1]):
+        rest = entrances[i + 1:]
+        for target, d in zip(rest, _local_distances(cells, ch, cw, source, rest)):
+            if d != INF:
+                edges.append((source, target, d))
+    return edges
+
+
+class HierarchicalPathfinder:
+    """HPA*：把网格切分成簇，预计算簇间入口和簇内距离，查询时先在抽象图上搜索再用 AStar 细化
+
+    抽象图只依赖地图本身，可以用 save()/load() 序列化后在多次运行之间复用；
+    grid.set_cell 修改地图后，下一次查询前按 grid.version 重建抽象图。
+    """
+
+    def __init__(self, grid, cluster_size=16, workers=None, graph=None):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
+        self.cluster_size = cluster_size
+        self.astar = AStar(self.grid, flat=True)  # 细化用，缓冲区在各段之间复用
+        self.nodes_explored = 0
+        self.execution_time = 0
+        self.preprocess_time = 0
+        self.path_length = 0
+        self.path_cost = 0
+        self.abstract_path = None
+        # 路径代价 / 八方向距离：八方向距离不考虑障碍，这只是相对直线距离的绕行比，不是次优上界
+        self.cost_over_octile = 1.0
+        self.workers = workers
+        if graph is None:
+            graph = self._preprocess()
+        self._set_graph(graph)
+
+    def _preprocess(self):
+        start_time = time.perf_counter()
+        with metrics.phase('preprocess', 'hpa'):
+            graph = self._build(self.workers)
+        self.preprocess_time = time.perf_counter() - start_time
+        return graph
+
+    def _set_graph(self, graph):
+        self.edges = graph
+        self._version = self.grid.version
+        self._cluster_nodes = {}
+        for node in graph:
+            self._cluster_nodes.setdefault(self._cluster_of(node), []).append(node)
+
+    def _cluster_of(self, idx):
+        x, y = divmod(idx, self.width)
+        return (x // self.cluster_size, y // self.cluster_size)
+
+    def _cluster_bounds(self, cluster):
+        cs = self.cluster_size
+        x0, y0 = cluster[0] * cs, cluster[1] * cs
+        return x0, y0, min(x0 + cs, self.height), min(y0 + cs, self.width)
+
+    def _cluster_cells(self, cluster):
+        x0, y0, x1, y1 = self._cluster_bounds(cluster)
+        w = self.width
+        cells = self.grid.cells
+        return b''.join(cells[x * w + y0:x * w + y1] for x in range(x0, x1)), x1 - x0, y1 - y0
+
+    def _find_entrances(self):
+        """扫描簇边界，每段连续的双侧可通行区间放1个（短）或2个（长）入口"""
+        grid = self.grid
+        cs = self.cluster_size
+        w = self.width
+        transitions = []
+
+        def scan(pairs):
+            segment = []
+            for pair in pairs + [None]:
+                if pair is not None and grid.cells[pair[0]] == 0 and grid.cells[pair[1]] == 0:
+                    segment.append(pair)
+                    continue
+                if segment:
+                    if len(segment) < 6:
+                        transitions.append(segment[len(segment) // 2])
+                    else:
+                        transitions.append(segment[0])
+                        transitions.append(segment[-1])
+                    segment = []
+
+        # 上下相邻簇之间的水平边界
+        for x in range(cs - 1, self.height - 1, cs):
+            for y0 in range(0, w, cs):
+                scan([(x * w + y, (x + 1) * w + y) for y in range(y0, min(y0 + cs, w))])
+        # 左右相邻簇之间的垂直边界
+        for y in range(cs - 1, w - 1, cs):
+            for x0 in range(0, self.height, cs):
+                scan([(x * w + y, x * w + y + 1) for x in range(x0, min(x0 + cs, self.height))])
+        return transitions
+
+    def _build(self, workers):
+        edges = {}
+        members = {}
+        for a, b in self._find_entrances():
+            edges.setdefault(a, {})[b] = 10
+            edges.setdefault(b, {})[a] = 10
+            members.setdefault(self._cluster_of(a), set()).add(a)
+            members.setdefault(self._cluster_of(b), set()).add(b)
+
+        # 每个簇独立计算，互不依赖，可以并行
+        tasks = []
+        offsets = []
+        for cluster, nodes in members.items():
+            x0, y0, _, _ = self._cluster_bounds(cluster)
+            cells, ch, cw = self._cluster_cells(cluster)
+            local = sorted((n // self.width - x0) * cw + (n % self.width - y0) for n in nodes)
+            tasks.append((cells, ch, cw, local))
+            offsets.append((x0, y0, cw))
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_cluster_edges, tasks, chunksize=16))
+        else:
+            results = [_cluster_edges(task) for task in tasks]
+
+        w = self.width
+        for (x0, y0, cw), cluster_edges in zip(offsets, results):
+            for a, b, d in cluster_edges:
+                a = (x0 + a // cw) * w + y0 + a % cw
+                b = (x0 + b // cw) * w + y0 + b % cw
+                if d < edges[a].get(b, INF):
+                    edges[a][b] = d
+                    edges[b][a] = d
+        return edges
+
+    def _connect(self, idx):
+        """把查询点接入所在簇的入口，返回 {入口: 簇内距离}"""
+        cluster = self._cluster_of(idx)
+        nodes = self._cluster_nodes.get(cluster, [])
+        if not nodes:
+            return {}
+        x0, y0, _, _ = self._cluster_bounds(cluster)
+        cells, ch, cw = self._cluster_cells(cluster)
+        w = self.width
+
+        def local(n):
+            return (n // w - x0) * cw + n % w - y0
+        dists = _local_distances(cells, ch, cw, local(idx), [local(n) for n in nodes])
+        return {n: d for n, d in zip(nodes, dists) if d != INF}
+
+    def find_abstract_path(self, start, end):
+        """在抽象图上搜索入口序列（含起点和终点）"""
+        w = self.width
+        s = start[0] * w + start[1]
+        t = end[0] * w + end[1]
+        gx, gy = end
+        from_start = self._connect(s)
+        to_goal = self._connect(t)
+
+        g = {s: 0}
+        parent = {s: None}
+        heap = [(_octile(start[0], start[1], gx, gy), s)]
+        closed = set()
+        while heap:
+            _, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            closed.add(current)
+            self.nodes_explored += 1
+            if current == t:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                return [divmod(n, w) for n in reversed(path)], g[t]
+
+            neighbors = list(self.edges.get(current, {}).items())
+            if current == s:
+                neighbors.extend(from_start.items())
+            if current in to_goal:
+                neighbors.append((t, to_goal[current]))
+            for n, cost in neighbors:
+                new_g = g[current] + cost
+                if new_g < g.get(n, INF):
+                    g[n] = new_g
+                    parent[n] = current
+                    nx, ny = divmod(n, w)
+                    heapq.heappush(heap, (new_g + _octile(nx, ny, gx, gy), n))
+        return None, INF
+
+    def refine(self, abstract_path):
+        """惰性细化：逐段用 AStar 展开抽象路径，每次产出一段格子路径"""
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            if abs(a[0] - b[0]) + abs(a[1] - b[1]) == 1:
+                # 跨簇边本身就是相邻格
+                self.path_cost += 10
+                yield [a, b]
+                continue
+            segment = self.astar.find_path(a, b)
+            self.nodes_explored += self.astar.nodes_explored
+            if segment is None:
+                raise RuntimeError(f"抽象边无法细化: {a} -> {b}")
+            self.path_cost += self.astar.path_cost
+            yield segment
+
+    def _refresh(self):
+        if self.grid.version != self._version:
+            # 地图改过，入口和簇内距离都可能失效
+            self._set_graph(self._preprocess())
+
+    @metrics.instrumented('hpa')
+    def find_path(self, start, end):
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+        self.path_length = 0
+        self.path_cost = 0
+        self.abstract_path = None
+        self.cost_over_octile = 0
+        self._refresh()
+        if not reachable(self.grid, start, end):
+            self.execution_time = time.perf_counter() - start_time
+            return None
+
+        if self._cluster_of(start[0] * self.width + start[1]) == self._cluster_of(end[0] * self.width + end[1]):
+            # 同一簇内直接搜索
+            path = self.astar.find_path(start, end)
+            self.nodes_explored = self.astar.nodes_explored
+            self.path_cost = self.astar.path_cost if path else 0
+        else:
+            self.abstract_path, _ = self.find_abstract_path(start, end)
+            path = None
+            if self.abstract_path is not None:
+                path = [tuple(start)]
+                for segment in self.refine(self.abstract_path):
+                    path.extend(segment[1:])
+
+        self.execution_time = time.perf_counter() - start_time
+        if path is None:
+            return None
+        self.path_length = len(path)
+        octile = _octile(start[0], start[1], end[0], end[1])
+        self.cost_over_octile = self.path_cost / octile if octile else 1.0
+        return path
+
+    def get_stats(self):
+        return {
+            'clusters': len(self._cluster_nodes),
+            'abstract_nodes': len(self.edges),
+            'abstract_edges': sum(len(v) for v in self.edges.values()) // 2,
+            'preprocess_time': self.preprocess_time,
+            'nodes_explored': self.nodes_explored,
+            'execution_time': self.execution_time,
+            'path_length': self.path_length,
+            'path_cost': self.path_cost,
+            'cost_over_octile': self.cost_over_octile,
+        }
+
+    def save(self, path):
+        """序列化抽象图（JSON），带格式版本和地图指纹（map_format.fingerprint）"""
+        self._refresh()
+        data = {
+            'version': GRAPH_FORMAT_VERSION,
+            'fingerprint': fingerprint(self.grid),
+            'height': self.height,
+            'width': self.width,
+            'cluster_size': self.cluster_size,
+            'edges': [[a, b, d] for a, nbrs in self.edges.items() for b, d in nbrs.items() if a < b],
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, path, grid):
+        """加载 save() 写出的抽象图；格式版本不符或地图内容（指纹）不同时抛出 ValueError"""
+        with open(path) as f:
+            data = json.load(f)
+        grid = Grid.wrap(grid)
+        if data.get('version') != GRAPH_FORMAT_VERSION:
+            raise ValueError(f"不支持的抽象图格式版本: {data.get('version')}")
+        if (data['height'], data['width']) != (grid.height, grid.width):
+            raise ValueError("抽象图与地图尺寸不匹配")
+        if data.get('fingerprint') != fingerprint(grid):
+            raise ValueError("抽象图与地图内容不匹配")
+        edges = {}
+        for a, b, d in data['edges']:
+            edges.setdefault(a, {})[b] = d
+            edges.setdefault(b, {})[a] = d
+        return cls(grid, data['cluster_size'], graph=edges)
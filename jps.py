@@ -1,197 +1,232 @@
 # -*- coding: utf-8 -*-
 import heapq
 import time
+from search_state import FlatSearchState, SparseSearchState
+from grid import Grid
+from batch import run_batch
+from components import reachable
+from resumable import JPSSearch
+from jps_blocks import BlockScanner, CellJumper
+from open_list import make_open_list
+import metrics
 
 class JPS:
-    def __init__(self, grid):
-        self.grid = grid
-        self.height = len(grid)
-        self.width = len(grid[0])
+    def __init__(self, grid, tables=None, open_list=None):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
         self.movements = [(0, 1), (1, 0), (0, -1), (-1, 0),
                          (1, 1), (1, -1), (-1, 1), (-1, -1)]
         self.nodes_explored = 0
         self.jump_calls = 0
         self.execution_time = 0
-        self.jump_cache = {}  # 跳跃点缓存
         self.path_length = 0  # 路径长度统计
+        self.path_cost = 0  # 路径代价（10/14 计价）
         self.avg_jump_distance = 0  # 平均跳跃距离
+        self.heap_pushes = 0
+        self.stale_pops = 0  # 弹出时已关闭、被跳过的堆条目
+        self.duplicates_suppressed = 0  # 开放表丢弃的不更优的重复压入
+        self.los_checks = 0  # 路径平滑时的视线检查次数
+        # 跳点查询器：JPS+ 预处理表（jps_plus.JPSPlusTables）、位扫描器（jps_blocks.BlockScanner）
+        # 或逐格跳跃（jps_blocks.CellJumper），只需提供 jump(x, y, direction, gx, gy)，可在多个实例间共享；
+        # 不给出时稠密网格构建位扫描器，没有整块缓冲区的网格（grid.dense 为 False，如分块地图）逐格跳跃。
+        # 都是迭代实现，没有递归深度和迭代次数限制
+        if tables is None:
+            tables = self._default_jumper()
+        self.tables = tables
+        self._tables_version = self.grid.version
+        # 分块地图的搜索状态按需存放在字典里，内存不随世界大小增长
+        if self.grid.dense:
+            self._state = FlatSearchState(self.height * self.width)
+        else:
+            self._state = SparseSearchState()
+        # open_list='heap' / 'bucket'（或返回开放表的工厂）时改用 open_list 模块的带索引开放表
+        self.open_list = open_list
+        self._open = make_open_list(open_list) if open_list is not None else None
 
-    class Node:
-        def __init__(self, x, y, parent=None):
-            self.x = x
-            self.y = y
-            self.parent = parent
-            self.g = 0
-            self.h = 0
-            self.f = 0
-
-        def __lt__(self, other):
-            # 应该优先比较f值，再比较h值
-            return (self.f, self.h) < (other.f, other.h)  # 添加次级比较条件
-
-    def heuristic(self, node, goal):
-        dx = abs(node.x - goal.x)
-        dy = abs(node.y - goal.y)
-        return 10 * (dx + dy) + (14 - 20) * min(dx, dy)  # 修正后的Octile距离
-
-    def jump(self, x, y, dx, dy, goal):
-        cache_key = (x, y, dx, dy)
-        if cache_key in self.jump_cache:
-            return self.jump_cache[cache_key]
-            
-        self.jump_calls += 1
-        nx, ny = x + dx, y + dy
-        
-        # 越界或障碍物检查
-        if not (0 <= nx < self.height and 0 <= ny < self.width) or self.grid[nx][ny] == 1:
-            self.jump_cache[cache_key] = None
+    @metrics.instrumented('jps')
+    def find_path(self, start, end):
+        self.heap_pushes = 0
+        self.stale_pops = 0
+        self.duplicates_suppressed = 0
+        self.los_checks = 0
+        if not reachable(self.grid, start, end):
+            self.nodes_explored = 0
+            self.execution_time = 0
             return None
-            
-        # 到达终点检查
-        if (nx, ny) == (goal.x, goal.y):
-            self.jump_cache[cache_key] = (nx, ny)
-            return (nx, ny)
-            
-        # 强制邻居检测
-        if self.has_forced_neighbor(nx, ny, dx, dy):
-            self.jump_cache[cache_key] = (nx, ny)
-            return (nx, ny)
-            
-        # 对角线移动时的优化检查
-        if dx != 0 and dy != 0:
-            # 只在必要时检查水平和垂直方向
-            if (self.is_blocked(nx-dx, ny) and not self.is_blocked(nx, ny+dy)) or \
-               (self.is_blocked(nx, ny-dy) and not self.is_blocked(nx+dx, ny)):
-                self.jump_cache[cache_key] = (nx, ny)
-                return (nx, ny)
-                
-        # 继续跳点搜索
-        next_point = self.jump(nx, ny, dx, dy, goal)
-        self.jump_cache[cache_key] = next_point
-        return next_point
+        self._refresh_tables()
+        return self._find_path_plus(start, end)
 
-    def find_path(self, start, end):
-        start_time = time.time()
+    def start_search(self, start, end):
+        """返回可分步推进、可暂停恢复的搜索对象（resumable.JPSSearch），跳点来自 tables"""
+        self._refresh_tables()
+        return JPSSearch(self, start, end, self.tables)
+
+    def _default_jumper(self):
+        return BlockScanner(self.grid) if self.grid.dense else CellJumper(self.grid)
+
+    def _refresh_tables(self):
+        """grid.set_cell 之后跳点表已过期：换成按新地图构建的默认查询器（位打包或不需要预处理）"""
+        if self.grid.version != self._tables_version:
+            self.tables = self._default_jumper()
+            self._tables_version = self.grid.version
+
+    def find_paths(self, queries):
+        """批量查询 [(start, end), ...]，返回 batch.BatchResult
+
+        同一实例的搜索缓冲区在查询间复用（flat 模式下靠代数戳重置，不清空数组）。
+        """
+        return run_batch(self, queries)
+
+    # 按父节点方向裁剪后需要尝试的方向下标（与 movements 顺序一致）
+    PRUNED_DIRECTIONS = {
+        (0, 1): (0, 4, 6, 1, 3), (0, -1): (2, 5, 7, 1, 3),
+        (1, 0): (1, 4, 5, 0, 2), (-1, 0): (3, 6, 7, 0, 2),
+        (1, 1): (0, 1, 4), (1, -1): (2, 1, 5),
+        (-1, 1): (0, 3, 6), (-1, -1): (2, 3, 7),
+    }
+
+    def _find_path_plus(self, start, end):
+        """后继跳点直接查 tables（JPS+ 预处理表或位扫描器），不再逐格递归跳跃"""
+        start_time = time.perf_counter()
         self.nodes_explored = 0
         self.jump_calls = 0
-        
-        open_list = []
-        start_node = self.Node(*start)
-        end_node = self.Node(*end)
-        start_node.h = self.heuristic(start_node, end_node)
-        start_node.f = start_node.h
-        heapq.heappush(open_list, start_node)
-        
-        closed_dict = {}
-        g_values = {start: 0}
-        
-        # 动态调整最大迭代次数
-        max_iterations = min(self.height * self.width // 2, 10000)
-        iterations = 0
-        
-        # 计算主要方向
-        dx_main = 1 if end_node.x > start_node.x else -1 if end_node.x < start_node.x else 0
-        dy_main = 1 if end_node.y > start_node.y else -1 if end_node.y < start_node.y else 0
-        
-        # 优化移动方向顺序
-        primary_moves = []
-        if dx_main != 0 and dy_main != 0:
-            primary_moves.append((dx_main, dy_main))
-        if dx_main != 0:
-            primary_moves.append((dx_main, 0))
-        if dy_main != 0:
-            primary_moves.append((0, dy_main))
-            
-        # 添加次要方向
-        secondary_moves = [(dx, dy) for dx, dy in self.movements if (dx, dy) not in primary_moves]
-        optimized_movements = primary_moves + secondary_moves
-        
-        while open_list and iterations < max_iterations:
-            iterations += 1
-            current = heapq.heappop(open_list)
-            current_pos = (current.x, current.y)
-            
-            if current_pos == (end_node.x, end_node.y):
-                path = []
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
-                self.execution_time = time.time() - start_time
-                if path:
-                    self.path_length = len(path)
-                    total_jumps = sum(max(abs(path[i][0]-path[i-1][0]), abs(path[i][1]-path[i-1][1])) 
-                                   for i in range(1, len(path)))
-                    self.avg_jump_distance = total_jumps / (len(path)-1) if len(path)>1 else 0
-                    return self.smooth_path(path[::-1])
-                return None
-
-            if current_pos in closed_dict:
+
+        w = self.width
+        tables = self.tables
+        state = self._state
+        gen = state.reset()
+        g = state.g
+        parent = state.parent
+        stamp = state.stamp
+        closed = state.closed
+        gx, gy = end
+        all_directions = tuple(range(8))
+
+        s = start[0] * w + start[1]
+        t = gx * w + gy
+        g[s] = 0
+        parent[s] = -1
+        stamp[s] = gen
+        keyed = self._open
+        if keyed is None:
+            open_list = [(0, 0, s)]
+        else:
+            # 带索引开放表只按 f 排序，不再用 h 打破平局
+            open_list = keyed
+            keyed.clear()
+            keyed.push(s, 0)
+        stale = 0
+
+        while open_list:
+            if keyed is None:
+                _, _, current = heapq.heappop(open_list)
+            else:
+                current = keyed.pop()
+            if current == t:
+                if keyed is None:
+                    self.heap_pushes = self.nodes_explored + stale + 1 + len(open_list)
+                    self.stale_pops = stale
+                else:
+                    self.heap_pushes = keyed.pushes
+                    self.stale_pops = stale + keyed.stale_pops
+                    self.duplicates_suppressed = keyed.duplicates
+                with metrics.phase('reconstruct'):
+                    path = [divmod(i, w) for i in state.trace(current)]
+                total_jumps = sum(max(abs(path[i][0]-path[i-1][0]), abs(path[i][1]-path[i-1][1]))
+                               for i in range(1, len(path)))
+                self.avg_jump_distance = total_jumps / (len(path)-1) if len(path)>1 else 0
+                # 统计的是实际返回的平滑路径
+                path = self.smooth_path(path)
+                self.execution_time = time.perf_counter() - start_time
+                self.path_length = len(path)
+                self.path_cost = self.polyline_cost(path)
+                return path
+
+            if closed[current] == gen:
+                stale += 1
                 continue
-                
+            closed[current] = gen
             self.nodes_explored += 1
-            closed_dict[current_pos] = current
-
-            # 使用优化后的移动方向
-            successors = []
-            for dx, dy in optimized_movements:
-                jump_point = self.jump(current.x, current.y, dx, dy, end_node)
-                if jump_point:
-                    nx, ny = jump_point
-                    if (nx, ny) not in closed_dict:
-                        dx_total = nx - current.x
-                        dy_total = ny - current.y
-                        
-                        # 优化代价计算
-                        if dx_total != 0 and dy_total != 0:
-                            diagonal_steps = min(abs(dx_total), abs(dy_total))
-                            straight_steps = max(abs(dx_total), abs(dy_total)) - diagonal_steps
-                            cost = 14 * diagonal_steps + 10 * straight_steps
-                        else:
-                            cost = 10 * (abs(dx_total) + abs(dy_total))
-                            
-                        # 计算到目标的启发值
-                        h_value = self.heuristic(self.Node(nx, ny), end_node)
-                        successors.append((jump_point, cost, h_value))
-
-            # 按照f值（g+h）对后继节点进行排序
-            successors.sort(key=lambda x: current.g + x[1] + x[2])
-            
-            for (nx, ny), cost, _ in successors:
-                new_g = current.g + cost
-                if new_g < g_values.get((nx, ny), float('inf')):
-                    new_node = self.Node(nx, ny, current)
-                    new_node.g = new_g
-                    new_node.h = self.heuristic(new_node, end_node)
-                    new_node.f = new_node.g + new_node.h
-                    g_values[(nx, ny)] = new_g
-                    heapq.heappush(open_list, new_node)
-
-        self.execution_time = time.time() - start_time
+
+            x, y = divmod(current, w)
+            p = parent[current]
+            if p == -1:
+                directions = all_directions
+            else:
+                px, py = divmod(p, w)
+                directions = self.PRUNED_DIRECTIONS[((x > px) - (x < px), (y > py) - (y < py))]
+
+            current_g = g[current]
+            for direction in directions:
+                self.jump_calls += 1
+                jump_point = tables.jump(x, y, direction, gx, gy)
+                if jump_point is None:
+                    continue
+                nx, ny = jump_point
+                n = nx * w + ny
+                if closed[n] == gen:
+                    continue
+                dx = abs(nx - x)
+                dy = abs(ny - y)
+                new_g = current_g + 10 * (dx + dy) + (14 - 20) * min(dx, dy)
+                if stamp[n] != gen or new_g < g[n]:
+                    g[n] = new_g
+                    parent[n] = current
+                    stamp[n] = gen
+                    hx = abs(nx - gx)
+                    hy = abs(ny - gy)
+                    h = 10 * (hx + hy) + (14 - 20) * min(hx, hy)
+                    if keyed is None:
+                        heapq.heappush(open_list, (new_g + h, h, n))
+                    else:
+                        keyed.push(n, new_g + h)
+
+        if keyed is None:
+            self.heap_pushes = self.nodes_explored + stale
+            self.stale_pops = stale
+        else:
+            self.heap_pushes = keyed.pushes
+            self.stale_pops = stale + keyed.stale_pops
+            self.duplicates_suppressed = keyed.duplicates
+        self.execution_time = time.perf_counter() - start_time
         return None
 
     def smooth_path(self, path):
         if len(path) <= 2:
             return path
-            
-        smoothed = [path[0]]
-        current = 0
-        
-        while current < len(path) - 1:
-            # 尝试找到最远的可直接到达的点
-            for i in range(len(path)-1, current, -1):
-                if not self.has_obstacle(path[current], path[i]):
-                    smoothed.append(path[i])
-                    current = i
-                    break
-            else:
-                current += 1
-                if current < len(path):
-                    smoothed.append(path[current])
-                    
+
+        with metrics.phase('smooth'):
+            smoothed = [path[0]]
+            current = 0
+
+            while current < len(path) - 1:
+                # 尝试找到最远的可直接到达的点
+                for i in range(len(path)-1, current, -1):
+                    if not self.has_obstacle(path[current], path[i]):
+                        smoothed.append(path[i])
+                        current = i
+                        break
+                else:
+                    current += 1
+                    if current < len(path):
+                        smoothed.append(path[current])
+
         return smoothed
 
+    @staticmethod
+    def polyline_cost(path):
+        """拐点序列的 10/14 代价：每段沿 Bresenham 直线逐格行走，代价等于两端点的八方向距离"""
+        cost = 0
+        for (x0, y0), (x1, y1) in zip(path, path[1:]):
+            dx = abs(x1 - x0)
+            dy = abs(y1 - y0)
+            cost += 10 * (dx + dy) + (14 - 20) * min(dx, dy)
+        return cost
+
     def has_obstacle(self, start, end):
         # Bresenham直线算法检查障碍物
+        self.los_checks += 1
         x0, y0 = start
         x1, y1 = end
         dx = abs(x1 - x0)
@@ -206,28 +241,18 @@ class JPS:
             if x0 == x1 and y0 == y1:
                 break
             e2 = 2 * err
-            if e2 > -dy:
+            step_x = e2 > -dy
+            step_y = e2 < dx
+            # 对角线一步与寻路规则相同，不能切角
+            if step_x and step_y and (self.grid[x0 + sx][y0] == 1 or self.grid[x0][y0 + sy] == 1):
+                return True
+            if step_x:
                 err -= dy
                 x0 += sx
-            if e2 < dx:
+            if step_y:
                 err += dx
                 y0 += sy
         return False
 
-    def has_forced_neighbor(self, x, y, dx, dy):
-        # 水平/垂直移动
-        if dx == 0 or dy == 0:
-            # 垂直移动时检查两侧
-            if dx == 0:
-                if (self.is_blocked(x+1, y) and not self.is_blocked(x, y+dy)) or \
-                   (self.is_blocked(x-1, y) and not self.is_blocked(x, y+dy)):
-                    return True
-            # 水平移动同理
-        else:  # 对角线移动
-            if (self.is_blocked(x-dx, y) and not self.is_blocked(x, y+dy)) or \
-               (self.is_blocked(x, y-dy) and not self.is_blocked(x+dx, y)):
-                return True
-        return False
-
     def is_blocked(self, x, y):
         return not (0 <= x < self.height and 0 <= y < self.width) or self.grid[x][y] == 1
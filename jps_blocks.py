@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import metrics
+from grid import Grid
+from jps_plus import DIRECTIONS, DIRECTION_INDEX
+
+
+def _pack_lines(event):
+    """每行打包成一个 Python 整数：第 i+1 位对应第 i 个格子，两端各留一位边界（置1，视为墙）"""
+    h, w = event.shape
+    bits = np.ones((h, w + 2), dtype=bool)
+    bits[:, 1:w + 1] = event
+    packed = np.packbits(bits, axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+def _straight_events(free):
+    """沿行向 y 增大方向移动时的事件格：障碍或强制邻居（侧边格可通行而其后方一格是障碍）"""
+    h, w = free.shape
+    padded = np.zeros((h + 2, w + 1), dtype=bool)
+    padded[1:h + 1, 1:] = free
+    up = padded[0:h]
+    down = padded[2:h + 2]
+    forced = (up[:, 1:] & ~up[:, :-1]) | (down[:, 1:] & ~down[:, :-1])
+    return ~free | forced
+
+
+class BlockScanner:
+    """块扫描 JPS：把每行/每列的事件格（障碍或强制邻居）打包成位串，用位运算一次跨越多个格子
+
+    直线跳跃只需一次移位和"最低位/最高位"运算（(m & -m).bit_length() 即 count trailing zeros），
+    代价是 O(行宽/字长)，与距离无关；对角线逐格前进，每格做两次直线位扫描。全部迭代实现，
+    没有递归深度和迭代次数限制。
+
+    与 jps_plus.JPSPlusTables 提供相同的 jump(x, y, direction, gx, gy) 接口和相同的跳点规则，
+    可以作为 JPS(grid, tables=BlockScanner(grid)) 使用；预处理只是位打包，内存约为每格 4 位。
+    """
+
+    def __init__(self, grid):
+        self.grid = Grid.wrap(grid)
+        if not self.grid.dense:
+            raise TypeError("位扫描器需要有整块格子缓冲区的网格，分块地图请使用 CellJumper")
+        self.height = self.grid.height
+        self.width = self.grid.width
+        self._cells = self.grid.cells
+        self._pwidth = self.grid.pwidth
+        self._blocked = self.grid.padded
+        with metrics.phase('preprocess', 'jps_blocks'):
+            free = self.grid.to_numpy() == 0
+            # 按方向下标存放位串：东/西按行，南/北按列；西、北方向在翻转后的数组上计算再翻回
+            self._events = [None] * 4
+            self._events[DIRECTION_INDEX[(0, 1)]] = _pack_lines(_straight_events(free))
+            self._events[DIRECTION_INDEX[(0, -1)]] = _pack_lines(_straight_events(free[:, ::-1])[:, ::-1])
+            self._events[DIRECTION_INDEX[(1, 0)]] = _pack_lines(_straight_events(free.T))
+            self._events[DIRECTION_INDEX[(-1, 0)]] = _pack_lines(_straight_events(free.T[:, ::-1])[:, ::-1])
+        self.scans = 0  # 位扫描次数
+
+    def _straight(self, x, y, direction, gx, gy):
+        dx, dy = DIRECTIONS[direction]
+        self.scans += 1
+        if dx == 0:
+            line, a, length, step = x, y, self.width, dy
+        else:
+            line, a, length, step = y, x, self.height, dx
+        events = self._events[direction][line]
+        if step > 0:
+            m = events >> (a + 2)
+            c = a + 1 + (m & -m).bit_length() - 1
+        else:
+            m = events & ((1 << (a + 1)) - 1)
+            c = m.bit_length() - 2
+        # 事件格在地图内且可通行时是强制邻居（跳点），否则是墙
+        if 0 <= c < length:
+            cell = line * self.width + c if dx == 0 else c * self.width + line
+            jump = self._cells[cell] == 0
+        else:
+            jump = False
+        steps = (c - a) * step
+        if not jump:
+            steps -= 1
+
+        # 终点位于射线上且不超过跳点/墙时直接跳到终点
+        if dx == 0:
+            k = (gy - y) * dy if gx == x else 0
+        else:
+            k = (gx - x) * dx if gy == y else 0
+        if 1 <= k <= steps:
+            return (gx, gy)
+        if jump:
+            return (x + steps * dx, y + steps * dy)
+        return None
+
+    def jump(self, x, y, direction, gx, gy):
+        """从 (x, y) 沿 direction 的后继跳点，没有则返回 None"""
+        if direction < 4:
+            return self._straight(x, y, direction, gx, gy)
+        dx, dy = DIRECTIONS[direction]
+        horizontal = DIRECTION_INDEX[(0, dy)]
+        vertical = DIRECTION_INDEX[(dx, 0)]
+        blocked = self._blocked
+        pw = self._pwidth
+        step = dx * pw + dy
+        idx = (x + 1) * pw + y + 1
+        while True:
+            # 对角线一步要求目标格以及水平、垂直两个相邻格都可通行
+            if blocked[idx + step] or blocked[idx + dx * pw] or blocked[idx + dy]:
+                return None
+            idx += step
+            x += dx
+            y += dy
+            if x == gx and y == gy:
+                return (x, y)
+            if self._straight(x, y, vertical, gx, gy) is not None or \
+               self._straight(x, y, horizontal, gx, gy) is not None:
+                return (x, y)
+
+
+class CellJumper:
+    """逐格跳跃：与 BlockScanner / JPSPlusTables 相同的 jump 接口和跳点规则，只通过 grid.is_blocked 访问格子
+
+    不需要稠密缓冲区和预处理，用于 tiled_grid.TiledGrid 等只支持按格访问的网格；
+    迭代实现，没有递归深度限制。每次 jump 的代价与跳跃距离成正比，steps 统计逐格前进的次数。
+    """
+
+    def __init__(self, grid):
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
+        self.steps = 0
+
+    def _straight(self, x, y, dx, dy, gx, gy):
+        blocked = self.grid.is_blocked
+        # 与移动方向垂直的两侧
+        sx, sy = dy, dx
+        while True:
+            x += dx
+            y += dy
+            self.steps += 1
+            if blocked(x, y):
+                return None
+            if x == gx and y == gy:
+                return (x, y)
+            # 强制邻居：侧边格可通行而其后方一格是障碍
+            if (not blocked(x + sx, y + sy) and blocked(x + sx - dx, y + sy - dy)) or \
+               (not blocked(x - sx, y - sy) and blocked(x - sx - dx, y - sy - dy)):
+                return (x, y)
+
+    def jump(self, x, y, direction, gx, gy):
+        """从 (x, y) 沿 direction 的后继跳点，没有则返回 None"""
+        dx, dy = DIRECTIONS[direction]
+        if dx == 0 or dy == 0:
+            return self._straight(x, y, dx, dy, gx, gy)
+        blocked = self.grid.is_blocked
+        while True:
+            # 对角线一步要求目标格以及水平、垂直两个相邻格都可通行
+            if blocked(x + dx, y + dy) or blocked(x + dx, y) or blocked(x, y + dy):
+                return None
+            x += dx
+            y += dy
+            self.steps += 1
+            if x == gx and y == gy:
+                return (x, y)
+            if self._straight(x, y, dx, 0, gx, gy) is not None or \
+               self._straight(x, y, 0, dy, gx, gy) is not None:
+                return (x, y)
@@ -1,6 +1,9 @@
 import heapq
 from math import sqrt
 import time
+import metrics
+from grid import Grid
+from components import reachable
 
 class JPS:
     class Node:
@@ -16,7 +19,7 @@ class JPS:
             return self.f < other.f
 
     def __init__(self, grid):
-        self.grid = grid
+        self.grid = Grid.wrap(grid)
         self.execution_time = 0
         self.nodes_explored = 0
         self.path_length = 0
@@ -30,17 +33,22 @@ class JPS:
         # 修改启发式函数的权重，使其更倾向于对角线移动
         return max(dx, dy) * 10 + min(dx, dy) * 4  # 对角线移动的权重降低
 
+    @metrics.instrumented('jps_pathfinding')
     def find_path(self, start, end):
-        start_time = time.time()
+        start_time = time.perf_counter()
+        self.nodes_explored = 0
+        # 起点处的对角线移动不检查拐角，可达性按八连通判断
+        if not reachable(self.grid, start, end, diagonal=True):
+            self.execution_time = time.perf_counter() - start_time
+            return None
         path = self._jps_search(start, end)
-        self.execution_time = time.time() - start_time
+        self.execution_time = time.perf_counter() - start_time
         
         if path:
             self.path_length = len(path)
             jump_distances = [sqrt((x1-x0)**2 + (y1-y0)**2) 
                             for (x0,y0),(x1,y1) in zip(path[:-1], path[1:])]
             self.avg_jump_distance = sum(jump_distances)/len(jump_distances) if jump_distances else 0
-            self.nodes_explored = len(set((x, y) for x, y in path))
         return path
 
     def _jps_search(self, start, end):
@@ -56,12 +64,14 @@ class JPS:
         
         while open_list:
             current = heapq.heappop(open_list)
-            
+            self.nodes_explored += 1
+
             if (current.x, current.y) == (end_node.x, end_node.y):
-                path = []
-                while current:
-                    path.append((current.x, current.y))
-                    current = current.parent
+                with metrics.phase('reconstruct'):
+                    path = []
+                    while current:
+                        path.append((current.x, current.y))
+                        current = current.parent
                 return path[::-1]
 
             closed_set.add((current.x, current.y))
@@ -103,7 +113,6 @@ class JPS:
 
     def _get_neighbors(self, current, end_node):
         if not current.parent:  # 起点检查所有方向
-            print("处理起点")
             neighbors = []
             # 优先检查对角线方向
             directions = [(1, 1), (1, -1), (-1, 1), (-1, -1), (0, 1), (0, -1), (1, 0), (-1, 0)]
@@ -112,10 +121,6 @@ class JPS:
                 if 0 <= nx < len(self.grid) and 0 <= ny < len(self.grid[0]):
                     # 对于所有方向，只要目标格可通行就允许移动
                     if self.grid[nx][ny] == 0:
-                        if dx != 0 and dy != 0:
-                            print(f"添加起点对角线邻居: ({nx}, {ny})")
-                        else:
-                            print(f"添加起点直线邻居: ({nx}, {ny})")
                         neighbors.append((nx, ny, (dx, dy)))
             return neighbors
 
@@ -123,9 +128,6 @@ class JPS:
         neighbors = []
         x, y = current.x, current.y
 
-        # 调试信息
-        print(f"检查节点 ({x}, {y}) 的邻居")
-
         # 检查是否可以直接到达目标点
         if abs(end_node.x - x) <= 1 and abs(end_node.y - y) <= 1:
             if self.grid[end_node.x][end_node.y] == 0:
@@ -133,10 +135,8 @@ class JPS:
                 dy = end_node.y - y
                 if dx != 0 and dy != 0:  # 对角线移动到目标
                     if self.grid[x][end_node.y] == 0 and self.grid[end_node.x][y] == 0:
-                        print(f"添加目标点邻居: ({end_node.x}, {end_node.y})")
                         neighbors.append((end_node.x, end_node.y, (dx, dy)))
                 else:  # 直线移动到目标
-                    print(f"添加目标点邻居: ({end_node.x}, {end_node.y})")
                     neighbors.append((end_node.x, end_node.y, (dx, dy)))
 
         # 计算相对父节点的方向
@@ -145,56 +145,43 @@ class JPS:
         dx = 1 if dx > 0 else (-1 if dx < 0 else 0)
         dy = 1 if dy > 0 else (-1 if dy < 0 else 0)
 
-        print(f"移动方向: dx={dx}, dy={dy}")
-
         # 自然邻居（沿原方向）
         if dx != 0 and dy != 0:  # 对角线移动
-            print("处理对角线移动")
             # 检查对角线方向是否可行，放宽条件
             if (0 <= x + dx < len(self.grid) and 0 <= y + dy < len(self.grid[0]) and 
                 self.grid[x + dx][y + dy] == 0):  # 只检查目标格是否可通行
-                print(f"添加对角线邻居: ({x + dx}, {y + dy})")
                 neighbors.append((x + dx, y + dy, (dx, dy)))
                 
             # 总是检查水平和垂直方向
             if 0 <= x + dx < len(self.grid) and self.grid[x + dx][y] == 0:
-                print(f"添加水平邻居: ({x + dx}, {y})")
                 neighbors.append((x + dx, y, (dx, 0)))
             if 0 <= y + dy < len(self.grid[0]) and self.grid[x][y + dy] == 0:
-                print(f"添加垂直邻居: ({x}, {y + dy})")
                 neighbors.append((x, y + dy, (0, dy)))
                 
             # 检查强制邻居
             if (0 <= x + dx < len(self.grid) and 0 <= y - dy < len(self.grid[0]) and 
                 self.grid[x][y - dy] == 1 and self.grid[x + dx][y - dy] == 0):
-                print(f"添加强制邻居(对角线): ({x + dx}, {y - dy})")
                 neighbors.append((x + dx, y - dy, (dx, -dy)))
             if (0 <= x - dx < len(self.grid) and 0 <= y + dy < len(self.grid[0]) and 
                 self.grid[x - dx][y] == 1 and self.grid[x - dx][y + dy] == 0):
-                print(f"添加强制邻居(对角线): ({x - dx}, {y + dy})")
                 neighbors.append((x - dx, y + dy, (-dx, dy)))
                 
         else:  # 直线移动
-            print("处理直线移动")
             if dx != 0:  # 水平移动
                 if 0 <= x + dx < len(self.grid) and self.grid[x + dx][y] == 0:
-                    print(f"添加水平邻居: ({x + dx}, {y})")
                     neighbors.append((x + dx, y, (dx, 0)))
                     # 检查对角线强制邻居
                     for ny in (y + 1, y - 1):
                         if 0 <= ny < len(self.grid[0]):
                             if self.grid[x][ny] == 1 and self.grid[x + dx][ny] == 0:
-                                print(f"添加强制邻居(水平): ({x + dx}, {ny})")
                                 neighbors.append((x + dx, ny, (dx, ny - y)))
             else:  # 垂直移动
                 if 0 <= y + dy < len(self.grid[0]) and self.grid[x][y + dy] == 0:
-                    print(f"添加垂直邻居: ({x}, {y + dy})")
                     neighbors.append((x, y + dy, (0, dy)))
                     # 检查对角线强制邻居
                     for nx in (x + 1, x - 1):
                         if 0 <= nx < len(self.grid):
                             if self.grid[nx][y] == 1 and self.grid[nx][y + dy] == 0:
-                                print(f"添加强制邻居(垂直): ({nx}, {y + dy})")
                                 neighbors.append((nx, y + dy, (nx - x, dy)))
 
         return neighbors
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import numpy as np
+
+import metrics
+from grid import Grid
+from map_format import fingerprint
+
+# 方向顺序与 search_state.MOVES / JPS.movements 一致
+DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0),
+              (1, 1), (1, -1), (-1, 1), (-1, -1)]
+DIRECTION_INDEX = {d: i for i, d in enumerate(DIRECTIONS)}
+
+
+def _straight_scan(free):
+    """沿每一行向 y 增大方向扫描，返回到下一个跳点(正数)或墙(负数/0)的距离"""
+    h, w = free.shape
+    padded = np.zeros((h + 2, w + 1), dtype=bool)
+    padded[1:h + 1, 1:] = free
+    # 强制邻居：侧边格可通行而其后方一格是障碍
+    up = padded[0:h]
+    down = padded[2:h + 2]
+    forced = (up[:, 1:] & ~up[:, :-1]) | (down[:, 1:] & ~down[:, :-1])
+    event = ~free | forced
+
+    cols = np.arange(w, dtype=np.int64)
+    pos = np.where(event, cols, w)
+    # 自右向左取最小值，得到每格及其右侧的第一个事件位置
+    nearest = np.minimum.accumulate(pos[:, ::-1], axis=1)[:, ::-1]
+    nxt = np.full((h, w), w, dtype=np.int64)
+    nxt[:, :-1] = nearest[:, 1:]
+
+    steps = nxt - cols
+    hit_wall = np.ones((h, w), dtype=bool)
+    inside = nxt < w
+    rows = np.nonzero(inside)
+    hit_wall[rows] = ~free[rows[0], nxt[rows]]
+    return np.where(hit_wall, -(steps - 1), steps)
+
+
+def _diagonal_scan(free, jump_x, jump_y, dx, dy):
+    """沿对角线 (dx, dy) 的跳跃距离，逐行递推，每行内部向量化"""
+    h, w = free.shape
+    fp = np.zeros((h + 2, w + 2), dtype=bool)
+    fp[1:h + 1, 1:w + 1] = free
+    # 对角线一步要求目标格以及水平、垂直两个相邻格都可通行
+    can_step = (fp[1 + dx:h + 1 + dx, 1:w + 1] & fp[1:h + 1, 1 + dy:w + 1 + dy]
+                & fp[1 + dx:h + 1 + dx, 1 + dy:w + 1 + dy])
+    jump_point = np.zeros((h + 2, w + 2), dtype=bool)
+    jump_point[1:h + 1, 1:w + 1] = free & ((jump_x > 0) | (jump_y > 0))
+
+    dist = np.zeros((h + 2, w + 2), dtype=np.int64)
+    rows = range(h - 1, -1, -1) if dx > 0 else range(h)
+    for x in rows:
+        nxt = dist[x + 1 + dx, 1 + dy:w + 1 + dy]
+        value = np.where(jump_point[x + 1 + dx, 1 + dy:w + 1 + dy], 1,
+                         np.where(nxt > 0, nxt + 1, nxt - 1))
+        dist[x + 1, 1:w + 1] = np.where(can_step[x], value, 0)
+    return dist[1:h + 1, 1:w + 1]
+
+
+class JPSPlusTables:
+    """JPS+ 预处理表：每个格子在8个方向上到下一个跳点(正数)或墙(负数/0)的距离"""
+
+    def __init__(self, tables, height, width):
+        self.height = height
+        self.width = width
+        self.tables = tables  # shape (8, height*width)
+        # 通过 memoryview 按下标取值，避免逐个构造 numpy 标量
+        fmt = 'h' if tables.dtype == np.int16 else 'i'
+        self._view = memoryview(np.ascontiguousarray(tables)).cast('B').cast(fmt)
+        self._size = height * width
+
+    @classmethod
+    def build(cls, grid):
+        """对整张地图做一次离线预处理"""
+        with metrics.phase('preprocess', 'jps_plus'):
+            free = np.asarray(grid) == 0
+            h, w = free.shape
+            straight = {
+                (0, 1): _straight_scan(free),
+                (0, -1): _straight_scan(free[:, ::-1])[:, ::-1],
+                (1, 0): _straight_scan(free.T).T,
+                (-1, 0): _straight_scan(free.T[:, ::-1])[:, ::-1].T,
+            }
+            dtype = np.int16 if max(h, w) < 0x7fff else np.int32
+            tables = np.zeros((8, h * w), dtype=dtype)
+            for i, (dx, dy) in enumerate(DIRECTIONS):
+                if dx == 0 or dy == 0:
+                    table = straight[(dx, dy)]
+                else:
+                    table = _diagonal_scan(free, straight[(dx, 0)], straight[(0, dy)], dx, dy)
+                tables[i] = np.where(free, table, 0).reshape(-1)
+        return cls(tables, h, w)
+
+    @staticmethod
+    def path_for(map_path, fingerprint):
+        """预处理表保存在地图文件旁边，文件名带地图指纹（map_format.fingerprint）"""
+        return f'{map_path}.{fingerprint}.jps.npy'
+
+    def save(self, path):
+        np.save(path, self.tables)
+
+    @classmethod
+    def load(cls, path, height, width):
+        tables = np.load(path, mmap_mode='r')
+        if tables.shape != (8, height * width):
+            raise ValueError(f"跳点表尺寸不匹配: {tables.shape}")
+        return cls(tables, height, width)
+
+    @classmethod
+    def for_map(cls, grid, map_path):
+        """加载地图旁的预处理表，不存在时构建并保存
+
+        缓存按地图指纹命名：地图内容改变（即使尺寸不变）后旧表不会被误用，重新构建时删除旧表。
+        """
+        grid = Grid.wrap(grid)
+        path = cls.path_for(map_path, fingerprint(grid))
+        if os.path.exists(path):
+            return cls.load(path, grid.height, grid.width)
+        for stale in glob.glob(glob.escape(map_path) + '.*.jps.npy'):
+            os.remove(stale)
+        tables = cls.build(grid)
+        tables.save(path)
+        return tables
+
+    def distance(self, x, y, direction):
+        return self._view[direction * self._size + x * self.width + y]
+
+    def jump(self, x, y, direction, gx, gy):
+        """O(1) 查表得到从 (x, y) 沿 direction 的后继跳点，没有则返回 None"""
+        dx, dy = DIRECTIONS[direction]
+        view = self._view
+        size = self._size
+        w = self.width
+        d = view[direction * size + x * w + y]
+        steps = d if d > 0 else -d
+
+        if dx == 0 or dy == 0:
+            # 直线：终点位于射线上且不超过跳点/墙时直接跳到终点
+            if dx == 0:
+                k = (gy - y) * dy if gx == x else 0
+            else:
+                k = (gx - x) * dx if gy == y else 0
+            if 1 <= k <= steps:
+                return (gx, gy)
+            return (x + d * dx, y + d * dy) if d > 0 else None
+
+        if steps == 0:
+            return None
+        best = d if d > 0 else steps + 1
+        # 对角线：检查到达终点所在行/列时，直线方向能否一路通到终点
+        t = (gx - x) * dx
+        if 1 <= t < best:
+            k = (gy - y - t * dy) * dy
+            if k == 0:
+                best = t
+            elif k > 0:
+                s = view[DIRECTION_INDEX[(0, dy)] * size + (x + t * dx) * w + y + t * dy]
+                if k <= (s if s > 0 else -s):
+                    best = t
+        t = (gy - y) * dy
+        if 1 <= t < best:
+            k = (gx - x - t * dx) * dx
+            if k == 0:
+                best = t
+            elif k > 0:
+                s = view[DIRECTION_INDEX[(dx, 0)] * size + (x + t * dx) * w + y + t * dy]
+                if k <= (s if s > 0 else -s):
+                    best = t
+        if best > steps:
+            return None
+        return (x + best * dx, y + best * dy)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import heapq
+import random
+import time
+from array import array
+
+import metrics
+from grid import Grid
+from search_state import flat_steps
+
+# 不可达格子的距离
+UNREACHABLE = 0xffffffff
+
+
+def distance_field(blocked, pw, source):
+    """从带边框下标 source 出发的 Dijkstra，返回到每个格子的精确距离（uint32，不可达为 UNREACHABLE）
+
+    代价与 AStar 相同：直线10、对角14，对角线移动要求两个相邻格都可通行；代价对称，正反方向通用。
+    """
+    steps = flat_steps(pw)
+    dist = array('I', [UNREACHABLE]) * len(blocked)
+    dist[source] = 0
+    heap = [(0, source)]
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    while heap:
+        d, current = heappop(heap)
+        if d > dist[current]:
+            continue
+        for offset, _, _, cost, corner1, corner2 in steps:
+            n = current + offset
+            if blocked[n]:
+                continue
+            if corner1 and (blocked[current + corner1] or blocked[current + corner2]):
+                continue
+            nd = d + cost
+            if nd < dist[n]:
+                dist[n] = nd
+                heappush(heap, (nd, n))
+    return dist
+
+
+class LandmarkHeuristic:
+    """ALT 启发函数：预先计算 k 个地标到所有格子的精确距离，按三角不等式给出下界
+
+    h(n) = max(八方向距离, max_L |d(L, goal) - d(L, n)|)，是一致的启发函数，
+    可以通过 heuristic= 参数交给 AStar / BidirectionalAStar，路径仍然最优。
+
+    selection='farthest' 依次选离已有地标最远的格子（通常效果最好），'random' 随机选取；
+    两种方式都先在每个连通分量里放一个地标，地图不连通时各分量的查询都能得到下界。
+    每个地标占用 4 字节 x 格子数，memory_bytes 给出总占用；active 限制每次查询实际使用的
+    地标数（按对起点下界最紧的挑选），用更少的计算换取略松的下界。
+    grid.set_cell 修改地图后，下一次 bind 前按 grid.version 重新选取地标、重算距离表。
+    """
+
+    def __init__(self, grid, k=8, selection='farthest', active=None, seed=None):
+        self.grid = Grid.wrap(grid)
+        self.k = k
+        self.selection = selection
+        self.active = active
+        self._pwidth = self.grid.pwidth
+        self._blocked = self.grid.padded
+        self.seed = seed
+        self._preprocess()
+
+    def _preprocess(self):
+        self.landmarks = []
+        self.distances = []
+        self._version = self.grid.version
+        start_time = time.perf_counter()
+        with metrics.phase('preprocess', 'landmarks'):
+            self._select(random.Random(self.seed))
+        self.preprocess_time = time.perf_counter() - start_time
+
+    def _components(self, free):
+        """按四连通分量（与不切角的移动规则一致）分组可通行格子，大的分量在前"""
+        index = self.grid.components()
+        pw = self._pwidth
+        groups = {}
+        for i in free:
+            groups.setdefault(index.label((i // pw - 1, i % pw - 1)), []).append(i)
+        return sorted(groups.values(), key=len, reverse=True)
+
+    def _add(self, source):
+        dist = distance_field(self._blocked, self._pwidth, source)
+        self.landmarks.append(source)
+        self.distances.append(dist)
+        return dist
+
+    def _select(self, rng):
+        blocked = self._blocked
+        free = [i for i in range(len(blocked)) if not blocked[i]]
+        if not free:
+            return
+        if self.selection not in ('random', 'farthest'):
+            raise ValueError(f"未知的地标选择方式: {self.selection}")
+        count = min(self.k, len(free))
+        # 其他分量的格子到地标都不可达，得不到任何下界：每个分量先放一个地标（地标不够时按分量大小优先）
+        components = self._components(free)[:count]
+        if self.selection == 'random':
+            sources = [rng.choice(component) for component in components]
+            chosen = set(sources)
+            sources += rng.sample([i for i in free if i not in chosen], count - len(sources))
+            for source in sources:
+                self._add(source)
+        else:
+            # 每个分量内从随机格子出发找到最远点作为地标，之后每次选离所有地标最远的格子
+            nearest = None
+            for component in components:
+                reach = distance_field(blocked, self._pwidth, rng.choice(component))
+                dist = self._add(max(component, key=reach.__getitem__))
+                nearest = dist if nearest is None else array('I', map(min, nearest, dist))
+            for _ in range(count - len(components)):
+                source = max(free, key=lambda i: nearest[i] if nearest[i] != UNREACHABLE else -1)
+                nearest = array('I', map(min, nearest, self._add(source)))
+
+    @property
+    def memory_bytes(self):
+        return sum(d.itemsize * len(d) for d in self.distances)
+
+    def landmark_positions(self):
+        pw = self._pwidth
+        return [(i // pw - 1, i % pw - 1) for i in self.landmarks]
+
+    def bind(self, goal, start=None):
+        """返回到 goal 的启发函数 h(下标)，下标为带边框下标 (x+1)*pwidth + (y+1)"""
+        if self.grid.version != self._version:
+            # 地图改过，旧距离表可能高估（打通的墙），不再是下界
+            self._preprocess()
+        pw = self._pwidth
+        g = (goal[0] + 1) * pw + goal[1] + 1
+        tx, ty = goal[0] + 1, goal[1] + 1
+        pairs = [(dist, dist[g]) for dist in self.distances if dist[g] != UNREACHABLE]
+        if self.active is not None and start is not None and len(pairs) > self.active:
+            s = (start[0] + 1) * pw + start[1] + 1
+            pairs.sort(key=lambda p: -abs(p[0][s] - p[1]))
+            pairs = pairs[:self.active]
+
+        def h(n):
+            x, y = divmod(n, pw)
+            dx = abs(x - tx)
+            dy = abs(y - ty)
+            best = 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
+            for dist, dg in pairs:
+                d = dist[n] - dg
+                if d < 0:
+                    d = -d
+                if d > best:
+                    best = d
+            return best
+        return h
+
+    def get_stats(self):
+        return {
+            'landmarks': len(self.landmarks),
+            'selection': self.selection,
+            'active': self.active,
+            'memory_bytes': self.memory_bytes,
+            'preprocess_time': self.preprocess_time,
+        }
@@ -8,6 +8,7 @@ import time
 import numpy as np
 from bidirectional_astar import BidirectionalAStar
 from jps_pathfinding import jps as jps_algorithm
+from grid import Grid
 
 # 地图配置参数
 MAP_CONFIG = {
@@ -20,7 +21,7 @@ MAP_CONFIG = {
 
 def create_test_grid(width, height, obstacle_density=0.3):
     """创建测试用的网格地图"""
-    grid = np.random.choice([0, 1], size=(height, width), p=[1-obstacle_density, obstacle_density])
+    grid = np.random.choice([0, 1], size=(height, width), p=[1-obstacle_density, obstacle_density]).astype(np.uint8)
     # 确保起点和终点可用
     grid[0, 0] = 0
     grid[-1, -1] = 0
@@ -28,20 +29,21 @@ def create_test_grid(width, height, obstacle_density=0.3):
 
 def test_pathfinding(grid, start, end):
     """测试并比较两种寻路算法的性能"""
+    shared_grid = Grid.wrap(grid)  # uint8 数组零拷贝包装，各算法共享
     # 测试A*
-    astar = AStar(grid)
+    astar = AStar(shared_grid)
     start_time = time.time()
     path_astar = astar.find_path(start, end)
     astar_time = astar.execution_time
     
     # 测试双向A*
-    bi_astar = BidirectionalAStar(grid)
+    bi_astar = BidirectionalAStar(shared_grid)
     start_time = time.time()
     path_bi = bi_astar.find_path(start, end)
     bi_astar_time = bi_astar.execution_time
     
     # 添加JPS测试
-    jps = JPS(grid)
+    jps = JPS(shared_grid)
     start_time = time.time()
     path_jps = jps.find_path(start, end)
     jps_time = jps.execution_time
@@ -131,7 +133,8 @@ def main():
     print("-"*90)
     
     for name, grid, start, end in test_cases:
-        obstacle_density = sum(row.count(1) for row in grid) / (len(grid) * len(grid[0]))
+        grid = Grid.wrap(grid)
+        obstacle_density = grid.obstacle_count() / grid.size
         
         # 测试SimplePathFinder
         spf = SimplePathFinder(grid)
@@ -173,10 +176,10 @@ def main():
 
     # 更新可视化部分
     print("\n运行随机地图测试...")
-    random_grid = generate_random_grid(
+    random_grid = Grid.wrap(generate_random_grid(
         MAP_CONFIG['random_demo'][:2], 
         obstacle_prob=MAP_CONFIG['random_demo'][2]
-    )
+    ))
     start = (0, 0)
     end = (MAP_CONFIG['random_demo'][0]-1, MAP_CONFIG['random_demo'][1]-1)
 
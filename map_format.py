@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import mmap
+from array import array
+import struct
+import zlib
+
+import numpy as np
+
+from grid import Grid
+
+# 文件布局（小端）：文件头 | 段表 | 各段数据（按 64 字节对齐，便于直接映射成数组）
+MAGIC = b'FPMAP\x00\r\n'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# 魔数、版本、保留、高、宽、段数、指纹、文件头 CRC32（计算时该字段置 0）
+HEADER = struct.Struct('<8sHHIII16sI')
+# 标签、info、偏移、长度、CRC32、extra；info / extra 的含义由各段自行约定
+SECTION = struct.Struct('<4sIQQII')
+
+# 段标签
+GRID = b'GRID'  # 位压缩的格子，每格 1 位，第 i 个格子在第 i//8 字节的第 i%8 位
+COMPONENTS = (b'CMP4', b'CMP8')  # 四/八邻域连通分量标号（int32，带边框下标）；info=下一个新标号，extra=分量数
+JUMP_TABLES = b'JPS+'  # JPS+ 跳点表 (8, height*width)；info=元素字节数(2 或 4)
+ABSTRACT_GRAPH = b'HPA '  # HPA* 抽象图的无向边 (a, b, 距离)，int64；extra=簇大小
+
+
+class MapFormatError(ValueError):
+    pass
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _pack_grid(grid):
+    cells = np.frombuffer(grid.cells, dtype=np.uint8)
+    return np.packbits(cells != 0, bitorder='little').tobytes()
+
+
+def _fingerprint(height, width, packed):
+    digest = hashlib.blake2b(struct.pack('<II', height, width), digest_size=16)
+    digest.update(packed)
+    return digest.digest()
+
+
+def fingerprint(grid):
+    """地图内容指纹（16 字节十六进制串），只取决于尺寸和格子，可作为派生数据的缓存键"""
+    grid = Grid.wrap(grid)
+    return _fingerprint(grid.height, grid.width, _pack_grid(grid)).hex()
+
+
+def _component_payload(index):
+    # 并查集合并过的标号先归一到代表标号
+    roots = np.array([index._find(label) for label in range(len(index._parent))], dtype=np.int32)
+    labels = roots[np.frombuffer(index.labels, dtype=np.int32)]
+    return labels.tobytes(), index._next_label, index.count
+
+
+def save_map(path, grid, components=(), jump_tables=None, abstract_graph=None):
+    """把地图和可选的派生数据写成一个二进制文件
+
+    components 是要保存的连通分量索引，可以给 diagonal 取值（False/True，按需构建）或 ComponentIndex；
+    jump_tables 为 jps_plus.JPSPlusTables 或 True（现场构建）；
+    abstract_graph 为 hpa.HierarchicalPathfinder 或簇大小（现场构建）。
+    返回地图指纹。
+    """
+    grid = Grid.wrap(grid)
+    packed = _pack_grid(grid)
+    sections = [(GRID, 0, 0, packed)]
+
+    for index in components:
+        if isinstance(index, bool):
+            index = grid.components(index)
+        labels, next_label, count = _component_payload(index)
+        sections.append((COMPONENTS[index.diagonal], next_label, count, labels))
+
+    if jump_tables is not None:
+        if jump_tables is True:
+            from jps_plus import JPSPlusTables
+            jump_tables = JPSPlusTables.build(grid)
+        tables = np.ascontiguousarray(jump_tables.tables)
+        sections.append((JUMP_TABLES, tables.dtype.itemsize, 0, tables.tobytes()))
+
+    if abstract_graph is not None:
+        if isinstance(abstract_graph, int):
+            from hpa import HierarchicalPathfinder
+            abstract_graph = HierarchicalPathfinder(grid, abstract_graph)
+        edges = np.array([(a, b, d) for a, nbrs in abstract_graph.edges.items()
+                          for b, d in nbrs.items() if a < b], dtype=np.int64).reshape(-1, 3)
+        sections.append((ABSTRACT_GRAPH, 0, abstract_graph.cluster_size, edges.tobytes()))
+
+    table = []
+    offset = _align(HEADER.size + SECTION.size * len(sections))
+    for tag, info, extra, payload in sections:
+        table.append(SECTION.pack(tag, info, offset, len(payload), zlib.crc32(payload), extra))
+        offset = _align(offset + len(payload))
+    digest = _fingerprint(grid.height, grid.width, packed)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, grid.height, grid.width, len(sections), digest, 0)
+    crc = zlib.crc32(b''.join(table), zlib.crc32(header))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, grid.height, grid.width, len(sections), digest, crc)
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(b''.join(table))
+        for entry, (_, _, _, payload) in zip(table, sections):
+            f.seek(SECTION.unpack(entry)[2])
+            f.write(payload)
+        f.truncate(offset)
+    return digest.hex()
+
+
+class MapFile:
+    """内存映射打开的地图文件：派生数据直接映射为数组，不解析、不拷贝
+
+    映射方式为写时复制（ACCESS_COPY），连通分量索引等仍可增量修改，修改只影响本进程。
+    打开时校验文件头 CRC 和格子段 CRC；verify=True 时同时校验所有派生数据段。
+    可以用 with 语句打开，或用完后调用 close() 解除映射。
+    """
+
+    def __init__(self, path, verify=False):
+        self.path = path
+        self.closed = False
+        self._grid = None
+        self._exports = []  # 从映射上切出的 memoryview，close 时先释放它们
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        self._view = memoryview(self._mmap)
+        try:
+            self._parse(verify)
+        except BaseException:
+            self.close()
+            raise
+
+    def _parse(self, verify):
+        path = self.path
+        if len(self._view) < HEADER.size:
+            raise MapFormatError(f"文件太短: {path}")
+        magic, version, reserved, height, width, count, digest, crc = HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            raise MapFormatError(f"不是地图文件: {path}")
+        if version != FORMAT_VERSION:
+            raise MapFormatError(f"不支持的格式版本: {version}")
+        table_end = HEADER.size + SECTION.size * count
+        header = HEADER.pack(magic, version, reserved, height, width, count, digest, 0)
+        if zlib.crc32(self._view[HEADER.size:table_end], zlib.crc32(header)) != crc:
+            raise MapFormatError(f"文件头校验失败: {path}")
+        self.version = version
+        self.height = height
+        self.width = width
+        self.fingerprint = digest.hex()
+        self.sections = {}  # 标签 -> (info, 偏移, 长度, CRC32, extra)
+        for i in range(count):
+            tag, info, offset, length, section_crc, extra = SECTION.unpack_from(self._view, HEADER.size + i * SECTION.size)
+            if offset + length > len(self._view):
+                raise MapFormatError(f"段 {tag!r} 超出文件末尾")
+            self.sections[tag] = (info, offset, length, section_crc, extra)
+        if GRID not in self.sections:
+            raise MapFormatError("缺少格子段")
+        self._check(GRID)
+        if verify:
+            for tag in self.sections:
+                self._check(tag)
+
+    def close(self):
+        """解除映射：Grid 上来自文件的连通分量标号先拷贝到内存，关闭后 Grid 仍可继续使用
+
+        jump_tables() 返回的跳点表直接引用映射内容，仍被引用时抛出 BufferError（映射保持打开）。
+        """
+        if self.closed:
+            return
+        if self._grid is not None:
+            for index in self._grid._components.values():
+                if index is not None and isinstance(index.labels, memoryview):
+                    labels = array('i')
+                    labels.frombytes(index.labels.cast('B'))
+                    index.labels = labels
+        for view in reversed(self._exports):
+            view.release()
+        self._exports.clear()
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 映射保持打开，可以释放引用后再次 close
+            self._view = memoryview(self._mmap)
+            raise BufferError("仍有对象引用地图文件的映射内容（如 jump_tables() 返回的跳点表），释放后再关闭")
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _check(self, tag):
+        _, offset, length, crc, _ = self.sections[tag]
+        if zlib.crc32(self._view[offset:offset + length]) != crc:
+            raise MapFormatError(f"段 {tag!r} 校验失败")
+
+    def _payload(self, tag):
+        if self.closed:
+            raise ValueError(f"地图文件已关闭: {self.path}")
+        _, offset, length, _, _ = self.sections[tag]
+        view = self._view[offset:offset + length]
+        self._exports.append(view)
+        return view
+
+    def has(self, tag):
+        return tag in self.sections
+
+    def grid(self):
+        """解压格子得到 Grid（每次打开只解压一次），文件中的连通分量索引会直接挂到 Grid 上"""
+        if self._grid is None:
+            size = self.height * self.width
+            cells = np.unpackbits(np.frombuffer(self._payload(GRID), dtype=np.uint8),
+                                  count=size, bitorder='little')
+            self._grid = Grid(cells, self.height, self.width)
+            for diagonal in (False, True):
+                if COMPONENTS[diagonal] in self.sections:
+                    self._grid._components[diagonal] = self.component_index(diagonal)
+        return self._grid
+
+    def component_index(self, diagonal=False):
+        """文件中的连通分量索引，标号数组直接映射文件内容；没有保存时返回 None"""
+        tag = COMPONENTS[diagonal]
+        if tag not in self.sections:
+            return None
+        grid = self._grid if self._grid is not None else self.grid()
+        if grid._components.get(diagonal) is not None:
+            return grid._components[diagonal]
+        from components import ComponentIndex
+        next_label, _, _, _, count = self.sections[tag]
+        labels = self._payload(tag).cast('i')
+        self._exports.append(labels)
+        if len(labels) != (self.height + 2) * (self.width + 2):
+            raise MapFormatError(f"段 {tag!r} 尺寸不匹配")
+        return ComponentIndex.from_labels(grid, diagonal, labels, count, next_label)
+
+    def jump_tables(self):
+        """文件中的 JPS+ 跳点表（jps_plus.JPSPlusTables，零拷贝），没有保存时返回 None"""
+        if JUMP_TABLES not in self.sections:
+            return None
+        from jps_plus import JPSPlusTables
+        itemsize = self.sections[JUMP_TABLES][0]
+        dtype = {2: np.int16, 4: np.int32}.get(itemsize)
+        if dtype is None:
+            raise MapFormatError(f"不支持的跳点表元素大小: {itemsize}")
+        tables = np.frombuffer(self._payload(JUMP_TABLES), dtype=dtype)
+        if tables.size != 8 * self.height * self.width:
+            raise MapFormatError("跳点表尺寸不匹配")
+        return JPSPlusTables(tables.reshape(8, -1), self.height, self.width)
+
+    def abstract_graph(self):
+        """文件中的 HPA* 抽象图，返回可直接查询的 hpa.HierarchicalPathfinder；没有保存时返回 None"""
+        if ABSTRACT_GRAPH not in self.sections:
+            return None
+        from hpa import HierarchicalPathfinder
+        cluster_size = self.sections[ABSTRACT_GRAPH][4]
+        edges = {}
+        for a, b, d in np.frombuffer(self._payload(ABSTRACT_GRAPH), dtype=np.int64).reshape(-1, 3).tolist():
+            edges.setdefault(a, {})[b] = d
+            edges.setdefault(b, {})[a] = d
+        return HierarchicalPathfinder(self.grid(), cluster_size, graph=edges)
+
+
+def load_map(path, verify=False):
+    """打开地图文件，返回 MapFile"""
+    return MapFile(path, verify)
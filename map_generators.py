@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""向量化的地图生成器：整幅数组一次运算生成，保证连通，可用种子复现
+
+生成的都是 (height, width) 的 uint8 numpy 数组（0可通行，1障碍），可直接交给 Grid.wrap 零拷贝包装。
+"""
+import numpy as np
+
+from components import ComponentIndex
+from grid import Grid
+
+
+def make_rng(seed=None):
+    """种子可以是整数、numpy Generator 或 None（None 时从全局 np.random 取种子，np.random.seed 仍然有效）"""
+    if isinstance(seed, np.random.Generator):
+        return seed
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 31)
+    return np.random.default_rng(seed)
+
+
+def circle_mask(size, ratio=0.45):
+    """圆形边界：圆外为 True"""
+    center = size // 2
+    radius = size * ratio
+    i, j = np.ogrid[:size, :size]
+    return (i - center) ** 2 + (j - center) ** 2 > radius ** 2
+
+
+def points_in_hull(xs, ys, hull_points):
+    """批量判断点是否在凸包内（hull_points 按逆时针排列），xs/ys 可以是任意形状的数组"""
+    inside = np.ones(np.broadcast(xs, ys).shape, dtype=bool)
+    n = len(hull_points)
+    for k in range(n):
+        p0 = hull_points[k]
+        p1 = hull_points[(k + 1) % n]
+        inside &= (p1[0] - p0[0]) * (ys - p0[1]) - (xs - p0[0]) * (p1[1] - p0[1]) >= 0
+    return inside
+
+
+def hull_mask(size, rng, num_points=8):
+    """不规则边界：随机点凸包之外为 True"""
+    from scipy.spatial import ConvexHull
+    points = rng.random((num_points, 2)) * size
+    hull = ConvexHull(points)
+    i, j = np.ogrid[:size, :size]
+    return ~points_in_hull(i, j, points[hull.vertices])
+
+
+def add_block_obstacles(grid, count, rng, radius=1):
+    """在随机空格处放置 (2*radius+1) 见方的障碍块（原地修改 grid）"""
+    free = np.flatnonzero(grid.ravel() == 0)
+    if count <= 0 or len(free) == 0:
+        return grid
+    centers = np.zeros(grid.shape, dtype=bool)
+    centers.ravel()[rng.choice(free, size=min(count, len(free)), replace=False)] = True
+    # 平移叠加代替逐块填充
+    h, w = grid.shape
+    padded = np.zeros((h + 2 * radius, w + 2 * radius), dtype=bool)
+    for dx in range(2 * radius + 1):
+        for dy in range(2 * radius + 1):
+            padded[dx:dx + h, dy:dy + w] |= centers
+    grid[padded[radius:radius + h, radius:radius + w]] = 1
+    return grid
+
+
+def ensure_connected(grid, endpoints=(), fill_isolated=True):
+    """一次分量标号保证连通（原地修改 grid）
+
+    不在最大分量中的端点沿 L 形走廊打通到最大分量；fill_isolated=True 时把其余小分量
+    填成障碍，之后任意两个空格之间都有路径。
+    """
+    h, w = grid.shape
+    for x, y in endpoints:
+        grid[x, y] = 0
+    index = ComponentIndex(Grid.wrap(grid))
+    labels = np.frombuffer(index.labels, dtype=np.int32).reshape(h + 2, w + 2)[1:-1, 1:-1]
+    if index.count == 0:
+        return grid
+    sizes = np.bincount(labels.ravel(), minlength=index.count + 1)
+    sizes[0] = 0
+    main = labels == sizes.argmax()
+
+    carved = np.zeros(grid.shape, dtype=bool)
+    for x, y in endpoints:
+        if main[x, y]:
+            continue
+        # 先沿行再沿列走向最近的最大分量格子，碰到最大分量即停
+        xs, ys = np.nonzero(main)
+        k = (np.abs(xs - x) + np.abs(ys - y)).argmin()
+        tx, ty = int(xs[k]), int(ys[k])
+        corridor = [(x, j) for j in _steps(y, ty)] + [(i, ty) for i in _steps(x, tx)]
+        for i, j in [(x, y)] + corridor:
+            if main[i, j]:
+                break
+            carved[i, j] = True
+    keep = main | carved
+    grid[carved] = 0
+    if fill_isolated:
+        grid[~keep] = 1
+    return grid
+
+
+def _steps(a, b):
+    step = 1 if b >= a else -1
+    return range(a + step, b + step, step)
+
+
+def random_grid(height, width, density=0.2, seed=None, endpoints=None, fill_isolated=True):
+    """按密度随机撒障碍，endpoints（默认左上角和右下角）保证连通"""
+    rng = make_rng(seed)
+    grid = (rng.random((height, width)) < density).astype(np.uint8)
+    if endpoints is None:
+        endpoints = [(0, 0), (height - 1, width - 1)]
+    return ensure_connected(grid, endpoints, fill_isolated)
+
+
+def sparse_map(size=100, num_obstacles=10, boundary_type="circle", seed=None, fill_isolated=True):
+    """大型稀疏地图：圆形或不规则凸包边界 + 3x3 障碍块"""
+    rng = make_rng(seed)
+    grid = np.zeros((size, size), dtype=np.uint8)
+    if boundary_type == "circle":
+        grid[circle_mask(size)] = 1
+    elif boundary_type == "irregular":
+        grid[hull_mask(size, rng)] = 1
+    add_block_obstacles(grid, num_obstacles, rng)
+    return ensure_connected(grid, fill_isolated=fill_isolated)
+
+
+def create_large_sparse_map(size=100, num_obstacles=10, boundary_type="circle", seed=None):
+    """创建大型稀疏地图（向量化生成，保证所有空格连通），benchmark 的场景集使用"""
+    return sparse_map(size, num_obstacles, boundary_type, seed=seed)
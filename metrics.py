@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 每次查询后从引擎读取的计数属性：属性名 -> 指标名（这些属性在每次查询开始时清零）
+QUERY_COUNTERS = (
+    ('nodes_explored', 'expansions'),
+    ('heap_pushes', 'heap_pushes'),
+    ('stale_pops', 'stale_pops'),
+    ('duplicates_suppressed', 'duplicates_suppressed'),
+    ('los_checks', 'los_checks'),
+)
+# 跨查询累计的缓存计数属性，按查询前后的差值记录
+CACHE_COUNTERS = (
+    ('hits', 'cache_hits'),
+    ('subpath_hits', 'cache_hits'),
+    ('misses', 'cache_misses'),
+    ('cache_hits', 'cache_hits'),
+    ('cache_misses', 'cache_misses'),
+)
+_CACHE_NAMES = dict(CACHE_COUNTERS)
+# 引擎所用网格上的累计计数（如 tiled_grid.TiledGrid 的分块缺页），同样按差值记录
+GRID_COUNTERS = (
+    ('tile_faults', 'tile_faults'),
+)
+PHASES = ('preprocess', 'search', 'reconstruct', 'smooth')
+
+
+def _bucket_index(value):
+    """对数分桶下标：每个 2 的幂区间再均分为 4 个子桶，相对误差不超过 25%"""
+    if value < 8:
+        return value
+    shift = value.bit_length() - 3
+    return shift * 4 + (value >> shift)
+
+
+def _bucket_upper(index):
+    """下标为 index 的桶的上界（包含）"""
+    if index < 8:
+        return index
+    shift = index // 4 - 1
+    return ((index % 4 + 5) << shift) - 1
+
+
+def percentile(sorted_values, q):
+    """最近秩百分位数：已排序的样本中第 ceil(q% * n) 个，没有样本时返回 0"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Histogram:
+    """对数分桶的延迟直方图（纳秒），内存固定，observe 为 O(1)"""
+
+    def __init__(self):
+        self.buckets = [0] * 256
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def observe(self, value):
+        value = max(0, int(value))
+        self.buckets[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """q 分位数的估计值（所在桶的上界，不超过最大值）"""
+        if not self.count:
+            return 0
+        rank = max(1, int(q / 100 * self.count + 0.5))
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(i), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_ns': self.total,
+            'min_ns': self.min or 0,
+            'max_ns': self.max,
+            'p50_ns': self.percentile(50),
+            'p95_ns': self.percentile(95),
+            'p99_ns': self.percentile(99),
+            # 只输出非空桶：上界(纳秒) -> 数量
+            'buckets': {_bucket_upper(i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class _Phase:
+    """阶段计时上下文，退出时把耗时记入所属的 Metrics"""
+    __slots__ = ('metrics', 'name', 'engine', 'start')
+
+    def __init__(self, metrics, name, engine):
+        self.metrics = metrics
+        self.name = name
+        self.engine = engine
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter_ns() - self.start, self.engine)
+        return False
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class NullMetrics:
+    """默认的空实现：所有记录操作都是空操作，引擎的额外开销只有一次 enabled 检查"""
+    enabled = False
+
+    def count(self, name, value=1, engine=None):
+        pass
+
+    def observe(self, name, value, engine=None):
+        pass
+
+    def add_time(self, phase, ns, engine=None):
+        pass
+
+    def phase(self, name, engine=None):
+        return _NULL_PHASE
+
+    def snapshot(self):
+        return {'counters': {}, 'timers': {}, 'histograms': {}}
+
+    def export(self):
+        pass
+
+    def reset(self):
+        pass
+
+
+class Metrics:
+    """统一的指标收集：计数器、分阶段计时（perf_counter_ns）和延迟直方图，按引擎名分组
+
+    引擎的 find_path 由 instrumented 装饰；set_metrics(Metrics()) 之后每次查询自动记录
+    expansions / heap_pushes / stale_pops / los_checks / cache_hits / cache_misses 计数、
+    query 延迟直方图和 search 阶段耗时（查询总耗时减去其中 reconstruct / smooth 的耗时）。
+    exporters 是可调用对象列表，export() 时以 snapshot() 的结果调用每一个。
+    """
+    enabled = True
+
+    def __init__(self, exporters=()):
+        self.exporters = list(exporters)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # 当前线程正在执行的引擎名和嵌套阶段耗时
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}  # 引擎名 -> {指标名: 值}
+            self.timers = {}  # 引擎名 -> {阶段: [次数, 纳秒]}
+            self.histograms = {}  # 引擎名 -> {指标名: Histogram}
+
+    def _engine(self, engine):
+        if engine is not None:
+            return engine
+        return getattr(self._local, 'engine', None) or 'default'
+
+    def count(self, name, value=1, engine=None):
+        engine = self._engine(engine)
+        with self._lock:
+            counters = self.counters.setdefault(engine, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def observe(self, name, value, engine=None):
+        engine = self._engine(engine)
+        with self._lock:
+            histograms = self.histograms.setdefault(engine, {})
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def add_time(self, phase, ns, engine=None):
+        local = self._local
+        if getattr(local, 'engine', None) is not None:
+            # 查询内部的阶段（包括查询中按需进行的预处理），从该查询的 search 耗时中扣除
+            local.nested += ns
+        engine = self._engine(engine)
+        with self._lock:
+            timer = self.timers.setdefault(engine, {}).setdefault(phase, [0, 0])
+            timer[0] += 1
+            timer[1] += ns
+
+    def phase(self, name, engine=None):
+        """with metrics.phase('reconstruct'): ... 记录一个阶段的耗时"""
+        return _Phase(self, name, engine)
+
+    def record_query(self, engine_name, engine, elapsed_ns, found, nested_ns=0, cache_before=None,
+                     grid_before=None):
+        """记录一次查询：延迟、search 阶段耗时和引擎上的计数属性"""
+        with self._lock:
+            counters = self.counters.setdefault(engine_name, {})
+            counters['queries'] = counters.get('queries', 0) + 1
+            if not found:
+                counters['failures'] = counters.get('failures', 0) + 1
+            for attr, name in QUERY_COUNTERS:
+                value = getattr(engine, attr, None)
+                if value:
+                    counters[name] = counters.get(name, 0) + value
+            if cache_before:
+                for attr, before in cache_before.items():
+                    delta = getattr(engine, attr, 0) - before
+                    if delta:
+                        name = _CACHE_NAMES[attr]
+                        counters[name] = counters.get(name, 0) + delta
+            if grid_before:
+                grid = engine.grid
+                for attr, name in GRID_COUNTERS:
+                    if attr in grid_before:
+                        delta = getattr(grid, attr) - grid_before[attr]
+                        if delta:
+                            counters[name] = counters.get(name, 0) + delta
+            histogram = self.histograms.setdefault(engine_name, {}).get('query')
+            if histogram is None:
+                histogram = self.histograms[engine_name]['query'] = Histogram()
+            histogram.observe(elapsed_ns)
+            timer = self.timers.setdefault(engine_name, {}).setdefault('search', [0, 0])
+            timer[0] += 1
+            timer[1] += max(0, elapsed_ns - nested_ns)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {e: dict(c) for e, c in self.counters.items()},
+                'timers': {e: {p: {'count': n, 'total_ns': ns} for p, (n, ns) in t.items()}
+                           for e, t in self.timers.items()},
+                'histograms': {e: {name: h.to_dict() for name, h in hs.items()}
+                               for e, hs in self.histograms.items()},
+            }
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+        return exporter
+
+    def export(self):
+        """把当前快照交给所有导出器，返回快照"""
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            exporter(snapshot)
+        return snapshot
+
+
+_active = NullMetrics()
+
+
+def get_metrics():
+    return _active
+
+
+def set_metrics(metrics):
+    """设置全局指标对象（None 表示关闭），返回之前的对象"""
+    global _active
+    previous = _active
+    _active = metrics if metrics is not None else NullMetrics()
+    return previous
+
+
+@contextmanager
+def use_metrics(metrics=None):
+    """with use_metrics(Metrics()) as m: ... 临时启用指标收集"""
+    metrics = metrics if metrics is not None else Metrics()
+    previous = set_metrics(metrics)
+    try:
+        yield metrics
+    finally:
+        set_metrics(previous)
+
+
+def phase(name, engine=None):
+    """当前指标对象的阶段计时上下文；未启用时返回共享的空上下文"""
+    return _active.phase(name, engine)
+
+
+def instrumented(engine_name):
+    """装饰引擎的 find_path（或 find_path_anytime 等带额外参数的查询方法）：
+    未启用指标时只多一次 enabled 检查，启用后每次查询自动记录"""
+    def decorate(find_path):
+        @functools.wraps(find_path)
+        def wrapper(self, start, end, *args, **kwargs):
+            metrics = _active
+            if not metrics.enabled:
+                return find_path(self, start, end, *args, **kwargs)
+            local = metrics._local
+            outer = getattr(local, 'engine', None)
+            if outer is not None:
+                # 嵌套调用（如 HPA 内部的 AStar 细化）计入外层查询
+                return find_path(self, start, end, *args, **kwargs)
+            # 实例可以设置 metrics_name 与同类引擎的其他配置区分
+            name = getattr(self, 'metrics_name', None) or engine_name
+            cache_before = {attr: getattr(self, attr) for attr, _ in CACHE_COUNTERS
+                            if isinstance(getattr(self, attr, None), int)}
+            grid = getattr(self, 'grid', None)
+            grid_before = {attr: getattr(grid, attr) for attr, _ in GRID_COUNTERS
+                           if isinstance(getattr(grid, attr, None), int)}
+            local.engine = name
+            local.nested = 0
+            begin = time.perf_counter_ns()
+            try:
+                path = find_path(self, start, end, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - begin
+                nested = local.nested
+                local.engine = None
+            metrics.record_query(name, self, elapsed, path is not None, nested, cache_before, grid_before)
+            return path
+        return wrapper
+    return decorate
+
+
+class JsonLinesExporter:
+    """每次导出向文件（或已打开的文本流）追加一行 JSON"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def __call__(self, snapshot):
+        line = json.dumps({'timestamp': time.time(), **snapshot}, ensure_ascii=False)
+        if hasattr(self.target, 'write'):
+            self.target.write(line + '\n')
+        else:
+            with open(self.target, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class LoggingExporter:
+    """每个引擎输出一条日志：查询数、延迟分位数和各计数器"""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger('findpath.metrics')
+        self.level = level
+
+    def __call__(self, snapshot):
+        engines = sorted(set(snapshot['counters']) | set(snapshot['timers']))
+        for engine in engines:
+            counters = snapshot['counters'].get(engine, {})
+            query = snapshot['histograms'].get(engine, {}).get('query', {})
+            timers = snapshot['timers'].get(engine, {})
+            self.logger.log(
+                self.level, "%s: p50=%.3fms p99=%.3fms %s %s", engine,
+                query.get('p50_ns', 0) / 1e6, query.get('p99_ns', 0) / 1e6,
+                ' '.join(f"{k}={v}" for k, v in sorted(counters.items())),
+                ' '.join(f"{p}={t['total_ns'] / 1e6:.3f}ms" for p, t in sorted(timers.items())))
+
+
+def prometheus_text(snapshot, prefix='findpath'):
+    """把快照渲染成 Prometheus 文本格式"""
+    lines = []
+    counter_names = sorted({name for c in snapshot['counters'].values() for name in c})
+    for name in counter_names:
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        for engine, counters in sorted(snapshot['counters'].items()):
+            if name in counters:
+                lines.append(f'{prefix}_{name}_total{{engine="{engine}"}} {counters[name]}')
+    lines.append(f"# TYPE {prefix}_phase_seconds_total counter")
+    for engine, timers in sorted(snapshot['timers'].items()):
+        for p, t in sorted(timers.items()):
+            lines.append(f'{prefix}_phase_seconds_total{{engine="{engine}",phase="{p}"}} {t["total_ns"] / 1e9:.9f}')
+    for engine, histograms in sorted(snapshot['histograms'].items()):
+        for name, h in sorted(histograms.items()):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for upper, n in sorted(h['buckets'].items()):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{engine="{engine}",le="{upper / 1e9:.9f}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{engine="{engine}",le="+Inf"}} {h["count"]}')
+            lines.append(f'{metric}_sum{{engine="{engine}"}} {h["sum_ns"] / 1e9:.9f}')
+            lines.append(f'{metric}_count{{engine="{engine}"}} {h["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+class PrometheusFileExporter:
+    """把 Prometheus 文本写到文件（供 node_exporter textfile collector 读取），先写临时文件再替换"""
+
+    def __init__(self, path, prefix='findpath'):
+        self.path = path
+        self.prefix = prefix
+
+    def __call__(self, snapshot):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(prometheus_text(snapshot, self.prefix))
+        os.replace(tmp, self.path)
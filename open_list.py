@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+import heapq
+
+
+class HeapOpenList:
+    """二叉堆开放表，带下标索引：记录每个格子当前在表中的键
+
+    push 时若格子已在表中且键不更小，直接丢弃（重复抑制）；键更小时压入新条目，
+    旧条目留在堆里，弹出时发现键已过期就跳过（过期弹出）。
+    同键按下标从小到大弹出，与引擎内联 heapq 的 (f, 下标) 顺序一致。
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._key = {}  # 下标 -> 当前键
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.duplicates = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self._key)
+
+    def clear(self):
+        """开始新查询：清空条目和计数"""
+        self._heap.clear()
+        self._key.clear()
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.duplicates = 0
+        self.stale_pops = 0
+
+    def push(self, index, key):
+        """压入或降低键，返回是否真正入表"""
+        old = self._key.get(index)
+        if old is not None:
+            if key >= old:
+                self.duplicates += 1
+                return False
+            self.decrease_keys += 1
+        self._key[index] = key
+        self.pushes += 1
+        heapq.heappush(self._heap, (key, index))
+        return True
+
+    def pop(self):
+        """弹出键最小的下标，表空时抛出 IndexError"""
+        heap = self._heap
+        current = self._key
+        while True:
+            key, index = heapq.heappop(heap)
+            if current.get(index) == key:
+                del current[index]
+                return index
+            self.stale_pops += 1
+
+    def min_key(self):
+        heap = self._heap
+        current = self._key
+        while heap and current.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+            self.stale_pops += 1
+        return heap[0][0] if heap else None
+
+    def get_stats(self):
+        return {
+            'pushes': self.pushes,
+            'decrease_keys': self.decrease_keys,
+            'duplicates_suppressed': self.duplicates,
+            'stale_pops': self.stale_pops,
+        }
+
+
+class BucketOpenList:
+    """整数键的桶队列：每个键一个桶，游标从最小键向上移动
+
+    代价都是小整数（直线10、对角14），启发函数一致时 A* 弹出的 f 单调不减，
+    游标只前进不后退，push / pop 均摊 O(1)。降低键时直接把格子从旧桶移到新桶（桶是 dict，删除 O(1)），
+    表里不会留下过期条目。键小于游标时游标回退，键不单调时同样正确，只是失去均摊保证。
+    同一个桶内后进先出，优先扩展较新（通常 g 更大、离终点更近）的格子。
+    """
+
+    def __init__(self):
+        self._buckets = {}  # 键 -> {下标: None}
+        self._key = {}  # 下标 -> 当前键
+        self._cursor = 0
+        self._max = -1
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.duplicates = 0
+        self.stale_pops = 0
+
+    def __len__(self):
+        return len(self._key)
+
+    def clear(self):
+        self._buckets.clear()
+        self._key.clear()
+        self._cursor = 0
+        self._max = -1
+        self.pushes = 0
+        self.decrease_keys = 0
+        self.duplicates = 0
+        self.stale_pops = 0
+
+    def push(self, index, key):
+        """压入或降低键，返回是否真正入表"""
+        keys = self._key
+        buckets = self._buckets
+        old = keys.get(index)
+        if old is not None:
+            if key >= old:
+                self.duplicates += 1
+                return False
+            self.decrease_keys += 1
+            bucket = buckets[old]
+            del bucket[index]
+            if not bucket:
+                del buckets[old]
+        keys[index] = key
+        self.pushes += 1
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {}
+            if len(keys) == 1 or key < self._cursor:
+                self._cursor = key
+            if key > self._max:
+                self._max = key
+        bucket[index] = None
+        return True
+
+    def _min_bucket(self):
+        buckets = self._buckets
+        key = self._cursor
+        bucket = buckets.get(key)
+        while bucket is None:
+            if key >= self._max:
+                raise IndexError("pop from empty open list")
+            key += 1
+            bucket = buckets.get(key)
+        self._cursor = key
+        return key, bucket
+
+    def pop(self):
+        """弹出键最小的下标，表空时抛出 IndexError"""
+        if not self._key:
+            raise IndexError("pop from empty open list")
+        key, bucket = self._min_bucket()
+        index, _ = bucket.popitem()
+        if not bucket:
+            del self._buckets[key]
+        del self._key[index]
+        return index
+
+    def min_key(self):
+        if not self._key:
+            return None
+        return self._min_bucket()[0]
+
+    def get_stats(self):
+        return {
+            'pushes': self.pushes,
+            'decrease_keys': self.decrease_keys,
+            'duplicates_suppressed': self.duplicates,
+            'stale_pops': self.stale_pops,
+            'buckets': len(self._buckets),
+        }
+
+
+OPEN_LISTS = {
+    'heap': HeapOpenList,
+    'bucket': BucketOpenList,
+}
+
+
+def make_open_list(kind):
+    """按名字（'heap' / 'bucket'）或类、工厂函数创建一个新的开放表"""
+    if isinstance(kind, str):
+        if kind not in OPEN_LISTS:
+            raise ValueError(f"未知的开放表类型: {kind}")
+        return OPEN_LISTS[kind]()
+    if callable(kind):
+        return kind()
+    raise TypeError(f"open_list 应为 {list(OPEN_LISTS)} 之一或可调用对象: {kind!r}")
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import math
+import sys
+import time
+from collections import OrderedDict
+
+import metrics
+from batch import run_batch
+
+# 每个路径点的大致内存开销：列表槽位 + (x, y) 元组 + 子路径索引中的一项
+_BYTES_PER_POINT = sys.getsizeof((0, 0)) + 8 + 120
+
+
+class PathCache:
+    """放在寻路引擎前面的 LRU 路径缓存
+
+    键是 (grid.version, 起点, 终点)；地图版本变化后旧条目全部失效。
+    容量同时受条目数和估算字节数限制，超出时淘汰最久未使用的条目。
+
+    reuse_subpaths=True 时，起点落在某条已缓存的、通往同一终点的路径上也算命中，
+    直接截取该路径的后半段（最优路径的后缀仍是最优路径，对 AStar 等最优引擎是精确的）。
+    """
+
+    def __init__(self, engine, max_entries=4096, max_bytes=64 << 20, reuse_subpaths=True):
+        self.engine = engine
+        self.grid = engine.grid
+        self.width = engine.width
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.reuse_subpaths = reuse_subpaths
+        self._entries = OrderedDict()  # (start, end) -> (path, 累计代价, 引擎报告的代价, 字节数)
+        self._goal_index = {}  # end -> {格子: ((start, end), 在路径中的位置)}
+        self._version = self.grid.version
+        self.bytes_used = 0
+        self.hits = 0
+        self.subpath_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.nodes_explored = 0
+        self.execution_time = 0
+        self.path_length = 0
+        self.path_cost = 0
+        # 任意角度引擎的路径段是任意方向的直线，段代价按欧氏距离x10 计算，否则按八方向距离
+        self._euclidean = getattr(engine, 'any_angle', None) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._goal_index.clear()
+        self.bytes_used = 0
+
+    @metrics.instrumented('path_cache')
+    def find_path(self, start, end):
+        start_time = time.perf_counter()
+        start = tuple(start)
+        end = tuple(end)
+        if self.grid.version != self._version:
+            # 地图变了，所有缓存路径都可能失效
+            self.clear()
+            self._version = self.grid.version
+            self.invalidations += 1
+
+        path = self._lookup(start, end)
+        if path is not False:
+            self.nodes_explored = 0
+            self.execution_time = time.perf_counter() - start_time
+            return path
+
+        self.misses += 1
+        path = self.engine.find_path(start, end)
+        self.nodes_explored = self.engine.nodes_explored
+        self.path_length = len(path) if path else 0
+        self.path_cost = self.engine.path_cost if path else 0
+        self._store(start, end, path, self.path_cost)
+        self.execution_time = time.perf_counter() - start_time
+        return path
+
+    def find_paths(self, queries):
+        """批量查询 [(start, end), ...]，返回 batch.BatchResult"""
+        return run_batch(self, queries)
+
+    def _lookup(self, start, end):
+        """命中时返回路径（可能为 None，表示已知不可达），未命中返回 False"""
+        key = (start, end)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            path, _, cost, _ = entry
+            if path is None:
+                self.path_length = 0
+                self.path_cost = 0
+                return None
+            self.path_length = len(path)
+            self.path_cost = cost
+            return list(path)
+
+        if self.reuse_subpaths:
+            located = self._goal_index.get(end, {}).get(start)
+            if located is not None:
+                source, position = located
+                self._entries.move_to_end(source)
+                self.subpath_hits += 1
+                path, costs, _, _ = self._entries[source]
+                self.path_length = len(path) - position
+                self.path_cost = costs[-1] - costs[position]
+                return path[position:]
+        return False
+
+    def _store(self, start, end, path, cost):
+        if path is None:
+            costs = None
+            nbytes = _BYTES_PER_POINT
+        else:
+            # 累计代价：截取后缀时用总代价减去前缀代价；完全命中直接返回引擎报告的代价
+            costs = [0]
+            for (x0, y0), (x1, y1) in zip(path, path[1:]):
+                dx = abs(x1 - x0)
+                dy = abs(y1 - y0)
+                if self._euclidean:
+                    costs.append(costs[-1] + 10 * math.hypot(dx, dy))
+                else:
+                    costs.append(costs[-1] + 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy))
+            path = list(path)
+            nbytes = len(path) * _BYTES_PER_POINT
+        if nbytes > self.max_bytes:
+            return
+
+        key = (start, end)
+        self._entries[key] = (path, costs, cost, nbytes)
+        self.bytes_used += nbytes
+        if path is not None and self.reuse_subpaths:
+            index = self._goal_index.setdefault(end, {})
+            for position, point in enumerate(path[:-1]):
+                index.setdefault(point, (key, position))
+
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        key, (path, _, _, nbytes) = self._entries.popitem(last=False)
+        self.bytes_used -= nbytes
+        self.evictions += 1
+        if path is not None and self.reuse_subpaths:
+            index = self._goal_index.get(key[1])
+            if index is not None:
+                for point in path[:-1]:
+                    if index.get(point, (None,))[0] == key:
+                        del index[point]
+                if not index:
+                    del self._goal_index[key[1]]
+
+    def get_stats(self):
+        lookups = self.hits + self.subpath_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes_used': self.bytes_used,
+            'hits': self.hits,
+            'subpath_hits': self.subpath_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.hits + self.subpath_hits) / lookups if lookups else 0,
+        }
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""测试用的参考实现：朴素 Dijkstra，给出 10/14 计价、不切角时的精确最短代价"""
+import heapq
+
+import numpy as np
+
+from grid import Grid
+
+MOVES = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def dijkstra_cost(grid, start, end):
+    """start 到 end 的最短代价，不可达（含起终点是障碍）时返回 None"""
+    grid = Grid.wrap(grid)
+    h, w = grid.height, grid.width
+    if grid.is_blocked(*start) or grid.is_blocked(*end):
+        return None
+    dist = {tuple(start): 0}
+    heap = [(0, tuple(start))]
+    while heap:
+        d, (x, y) = heapq.heappop(heap)
+        if (x, y) == tuple(end):
+            return d
+        if d > dist[(x, y)]:
+            continue
+        for dx, dy in MOVES:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < h and 0 <= ny < w) or grid[nx][ny]:
+                continue
+            if dx and dy and (grid[x + dx][y] or grid[x][y + dy]):
+                continue
+            nd = d + (14 if dx and dy else 10)
+            if nd < dist.get((nx, ny), nd + 1):
+                dist[(nx, ny)] = nd
+                heapq.heappush(heap, (nd, (nx, ny)))
+    return None
+
+
+def path_cost(path):
+    """按 10/14 计价的路径代价；相邻点必须是八邻域一步"""
+    cost = 0
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        dx, dy = abs(x1 - x0), abs(y1 - y0)
+        assert max(dx, dy) == 1, (x0, y0, x1, y1)
+        cost += 14 if dx and dy else 10
+    return cost
+
+
+def is_valid_path(grid, path, start, end):
+    """路径首尾正确、每步是八邻域移动、不经过障碍、对角线不切角"""
+    grid = Grid.wrap(grid)
+    if not path or tuple(path[0]) != tuple(start) or tuple(path[-1]) != tuple(end):
+        return False
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        if max(abs(dx), abs(dy)) != 1 or grid.is_blocked(x1, y1):
+            return False
+        if dx and dy and (grid.is_blocked(x0 + dx, y0) or grid.is_blocked(x0, y0 + dy)):
+            return False
+    return not grid.is_blocked(*start)
+
+
+def random_grid(height, width, density, seed):
+    """随机障碍地图（不保证连通），返回 uint8 数组"""
+    rng = np.random.default_rng(seed)
+    return (rng.random((height, width)) < density).astype(np.uint8)
+
+
+def random_queries(grid, count, seed):
+    """在可通行格子中随机取 count 对起终点"""
+    grid = np.asarray(Grid.wrap(grid).to_numpy())
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(grid.ravel() == 0)
+    w = grid.shape[1]
+    return [tuple(divmod(int(i), w) for i in rng.choice(free, 2)) for _ in range(count)]
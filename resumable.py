@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+import abc
+import heapq
+import time
+
+from components import reachable
+from search_state import SparseSearchState, flat_steps
+
+INF = float('inf')
+
+
+class ResumableSearch(abc.ABC):
+    """可暂停、可恢复的搜索：全部状态保存在对象里，可以每次只推进若干次扩展或一个时间片
+
+    多个搜索可以共享同一个引擎同时挂起，状态用字典按需存放，内存只与已访问的格子数有关。
+    下标是带边框下标 (x+1)*pwidth + (y+1)，移动规则与各引擎的 flat 模式相同。
+    """
+
+    def __init__(self, engine, start, end):
+        self.engine = engine
+        self.start = tuple(start)
+        self.end = tuple(end)
+        self.done = False
+        self.path = None
+        self.nodes_explored = 0
+        self.path_cost = 0
+        self.elapsed = 0.0  # 实际用于推进搜索的时间
+        self.steps_taken = 0  # 被调度执行的次数
+        grid = engine.grid
+        self._pw = grid.pwidth
+        self._blocked = grid.padded
+        self._steps = flat_steps(self._pw)
+        if not reachable(grid, start, end):
+            self.done = True
+
+    def index(self, pos):
+        return (pos[0] + 1) * self._pw + pos[1] + 1
+
+    def position(self, idx):
+        return (idx // self._pw - 1, idx % self._pw - 1)
+
+    def octile(self, a, b):
+        ax, ay = divmod(a, self._pw)
+        bx, by = divmod(b, self._pw)
+        dx = abs(ax - bx)
+        dy = abs(ay - by)
+        return 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
+
+    def neighbors(self, idx):
+        blocked = self._blocked
+        for offset, _, _, cost, corner1, corner2 in self._steps:
+            n = idx + offset
+            if blocked[n]:
+                continue
+            # 对角线移动要求两个相邻格都可通行
+            if corner1 and (blocked[idx + corner1] or blocked[idx + corner2]):
+                continue
+            yield n, cost
+
+    def step(self, expansions=1):
+        """最多推进 expansions 次扩展，返回是否已结束"""
+        if self.done:
+            return True
+        start_time = time.perf_counter()
+        self.steps_taken += 1
+        self.done = self._advance(expansions)
+        self.elapsed += time.perf_counter() - start_time
+        return self.done
+
+    def run_for(self, seconds, chunk=32):
+        """在 seconds 秒的时间片内推进，每 chunk 次扩展检查一次时间，返回是否已结束"""
+        deadline = time.perf_counter() + seconds
+        while not self.step(chunk):
+            if time.perf_counter() >= deadline:
+                break
+        return self.done
+
+    def run(self):
+        """一直推进到结束，返回路径"""
+        while not self.step(1024):
+            pass
+        return self.path
+
+    def _advance(self, expansions):
+        """最多执行 expansions 次扩展，搜索结束时返回 True；默认逐次调用 _expand"""
+        for _ in range(expansions):
+            if self._expand():
+                return True
+        return False
+
+    @abc.abstractmethod
+    def _expand(self):
+        """执行一次扩展，搜索结束时返回 True（结果写入 path / path_cost）"""
+
+    def _finish(self, path, cost):
+        self.path = path
+        self.path_cost = cost
+        return True
+
+
+class AStarSearch(ResumableSearch):
+    """AStar 的可恢复版本：直接驱动 flat 模式的主循环（astar.FlatAStarRun），扩展顺序、统计和路径与之相同
+
+    每个搜索有自己的 SparseSearchState，挂起的搜索之间以及与引擎本身的查询互不干扰。
+    """
+
+    def __init__(self, engine, start, end):
+        super().__init__(engine, start, end)
+        heuristic = engine.custom_heuristic
+        bound = heuristic.bind(end, start) if heuristic is not None else None
+        self._run = engine.flat_run(start, end, SparseSearchState(), bound)
+
+    def _advance(self, expansions):
+        run = self._run
+        done = run.step(expansions)
+        self.nodes_explored = run.nodes_explored
+        if done and run.path is not None:
+            return self._finish(run.path, run.path_cost)
+        return done
+
+    def _expand(self):
+        return self._advance(1)
+
+
+class BidirectionalSearch(ResumableSearch):
+    """BidirectionalAStar 平衡模式的可恢复版本：按 b = 2g + h - h' 排序，满足下界条件时停止，结果最优"""
+
+    def __init__(self, engine, start, end):
+        super().__init__(engine, start, end)
+        s = self.index(start)
+        t = self.index(end)
+        heuristic = engine.custom_heuristic
+        if heuristic is not None:
+            to_goal = heuristic.bind(end, start)
+            to_start = heuristic.bind(start, end)
+        else:
+            to_goal = lambda n: self.octile(n, t)
+            to_start = lambda n: self.octile(n, s)
+        # 每侧：[g, parent, closed, 开放表 [(b, -g, 下标)], 到本侧目标的启发函数, 到本侧起点的启发函数]
+        self._sides = [
+            [{s: 0}, {s: None}, set(), [(0, 0, s)], to_goal, to_start],
+            [{t: 0}, {t: None}, set(), [(0, 0, t)], to_start, to_goal],
+        ]
+        self.mu = 0 if s == t else INF
+        self.meeting = s if s == t else None
+        self.nodes_explored_forward = 0
+        self.nodes_explored_backward = 0
+
+    def _expand(self):
+        sides = self._sides
+        for _, _, closed, open_list, _, _ in sides:
+            while open_list and open_list[0][2] in closed:
+                heapq.heappop(open_list)
+        forward_open = sides[0][3]
+        backward_open = sides[1][3]
+        if not forward_open or not backward_open or \
+                2 * self.mu <= forward_open[0][0] + backward_open[0][0]:
+            return self._merge()
+
+        side = 0 if len(forward_open) <= len(backward_open) else 1
+        g, parent, closed, open_list, h, h_origin = sides[side]
+        other_g = sides[1 - side][0]
+        other_min = sides[1 - side][3][0][0]
+        current = heapq.heappop(open_list)[2]
+        closed.add(current)
+        self.nodes_explored += 1
+        if side == 0:
+            self.nodes_explored_forward += 1
+        else:
+            self.nodes_explored_backward += 1
+        current_g = g[current]
+        for n, cost in self.neighbors(current):
+            if n in closed:
+                continue
+            new_g = current_g + cost
+            if new_g < g.get(n, INF):
+                g[n] = new_g
+                parent[n] = current
+                if n in other_g and new_g + other_g[n] < self.mu:
+                    self.mu = new_g + other_g[n]
+                    self.meeting = n
+                h_n = h(n)
+                b = 2 * new_g + h_n - h_origin(n)
+                if new_g + h_n >= self.mu or b + other_min >= 2 * self.mu:
+                    continue
+                heapq.heappush(open_list, (b, -new_g, n))
+        return False
+
+    def _merge(self):
+        if self.meeting is None:
+            return True
+        forward = []
+        n = self.meeting
+        while n is not None:
+            forward.append(self.position(n))
+            n = self._sides[0][1][n]
+        backward = []
+        n = self._sides[1][1][self.meeting]
+        while n is not None:
+            backward.append(self.position(n))
+            n = self._sides[1][1][n]
+        return self._finish(forward[::-1] + backward, self.mu)
+
+
+class JPSSearch(ResumableSearch):
+    """JPS 的可恢复版本：每次扩展一个跳点，后继由跳点查询器（JPS+ 表或位扫描器）给出"""
+
+    def __init__(self, engine, start, end, jumper):
+        super().__init__(engine, start, end)
+        self._jumper = jumper
+        self._width = engine.width
+        s = start[0] * self._width + start[1]
+        self._goal = end[0] * self._width + end[1]
+        self.g = {s: 0}
+        self.parent = {s: None}
+        self.closed = set()
+        self.open = [(0, 0, s)]
+
+    def _expand(self):
+        w = self._width
+        gx, gy = self.end
+        while self.open:
+            _, _, current = heapq.heappop(self.open)
+            if current not in self.closed:
+                break
+        else:
+            return True
+        self.closed.add(current)
+        self.nodes_explored += 1
+        g = self.g
+        if current == self._goal:
+            path = []
+            n = current
+            while n is not None:
+                path.append(divmod(n, w))
+                n = self.parent[n]
+            path = self.engine.smooth_path(path[::-1])
+            return self._finish(path, self.engine.polyline_cost(path))
+
+        x, y = divmod(current, w)
+        p = self.parent[current]
+        if p is None:
+            directions = range(8)
+        else:
+            px, py = divmod(p, w)
+            directions = self.engine.PRUNED_DIRECTIONS[((x > px) - (x < px), (y > py) - (y < py))]
+        current_g = g[current]
+        for direction in directions:
+            jump_point = self._jumper.jump(x, y, direction, gx, gy)
+            if jump_point is None:
+                continue
+            nx, ny = jump_point
+            n = nx * w + ny
+            if n in self.closed:
+                continue
+            dx = abs(nx - x)
+            dy = abs(ny - y)
+            new_g = current_g + 10 * (dx + dy) + (14 - 2 * 10) * min(dx, dy)
+            if new_g < g.get(n, INF):
+                g[n] = new_g
+                self.parent[n] = current
+                hx = abs(nx - gx)
+                hy = abs(ny - gy)
+                h = 10 * (hx + hy) + (14 - 2 * 10) * min(hx, hy)
+                heapq.heappush(self.open, (new_g + h, h, n))
+        return False
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""多进程场景测试：地图在共享内存中生成一次，各工作进程零拷贝读取，按场景种子复现
+
+    python scenario_runner.py --tests 1000 --workers 8
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import map_generators
+from astar import AStar
+from grid import Grid
+from jps import JPS
+from visibility_graph import VisibilityGraph
+
+# JPS 不带 tables 时使用位扫描器（jps_blocks.BlockScanner）查询跳点
+ALGORITHMS = {
+    'A*': AStar,
+    'JPS': JPS,
+    'Visibility': VisibilityGraph,
+}
+
+# 与 test_pathfinding 相同的三组配置
+DEFAULT_CONFIGS = [
+    {'size': 100, 'obstacles': 5, 'name': '稀疏地图(100x100,5障碍)'},
+    {'size': 100, 'obstacles': 20, 'name': '密集地图(100x100,20障碍)'},
+    {'size': 200, 'obstacles': 10, 'name': '大地图(200x200,10障碍)'},
+]
+
+# 工作进程中已连接的共享内存块：名字 -> SharedMemory
+_attached = {}
+
+
+def scenario_seed(base_seed, config_index, index):
+    """场景种子只取决于 (基础种子, 配置序号, 场景序号)，与工作进程数和执行顺序无关"""
+    return int(np.random.SeedSequence([base_seed, config_index, index]).generate_state(1)[0])
+
+
+def _attach(name):
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def _map_view(name, size, index):
+    """共享内存块中第 index 张地图的 (size, size) 视图"""
+    shm = _attach(name)
+    cells = size * size
+    return np.ndarray((size, size), dtype=np.uint8, buffer=shm.buf, offset=index * cells)
+
+
+def _generate(task):
+    """在共享内存的指定位置生成地图并选出起终点"""
+    name, config_index, index, size, obstacles, seed = task
+    rng = np.random.default_rng(seed)
+    grid = map_generators.sparse_map(size, obstacles, seed=rng)
+    _map_view(name, size, index)[:] = grid
+    free = np.flatnonzero(grid == 0)
+    start, end = (divmod(int(i), size) for i in rng.choice(free, 2))
+    return config_index, index, start, end
+
+
+def _run(task):
+    """在共享地图上运行一个算法，返回与 test_pathfinding.run_pathfinding_test 相同的统计项"""
+    name, config_index, index, size, algorithm_name, start, end = task
+    grid = Grid.wrap(_map_view(name, size, index))
+    algorithm = ALGORITHMS[algorithm_name](grid)
+    start_time = time.perf_counter()
+    path = algorithm.find_path(start, end)
+    execution_time = time.perf_counter() - start_time
+    return config_index, index, algorithm_name, {
+        'time': execution_time * 1000,  # 毫秒
+        'nodes': algorithm.nodes_explored,
+        'path_length': len(path) if path else 0,
+        'success': path is not None,
+    }
+
+
+def run_scenarios(configs=None, num_tests=50, algorithms=None, workers=None, seed=0, chunksize=None):
+    """运行 配置数 x num_tests x 算法数 次寻路，返回 results[配置名][f"{算法}_{统计项}"] -> 按场景顺序的列表
+
+    workers=1 时在当前进程内执行（同样使用共享内存布局），其余情况使用进程池；
+    除耗时外，结果与 workers 无关。
+    """
+    configs = DEFAULT_CONFIGS if configs is None else configs
+    algorithms = list(ALGORITHMS) if algorithms is None else list(algorithms)
+    for algorithm_name in algorithms:
+        if algorithm_name not in ALGORITHMS:
+            raise ValueError(f"未知的算法: {algorithm_name}")
+    workers = workers or os.cpu_count() or 1
+
+    blocks = []
+    try:
+        # 每个配置一个共享内存块，存放该配置的全部地图
+        for config in configs:
+            blocks.append(shared_memory.SharedMemory(create=True, size=max(1, num_tests * config['size'] ** 2)))
+        generate_tasks = [
+            (blocks[c].name, c, i, config['size'], config['obstacles'], scenario_seed(seed, c, i))
+            for c, config in enumerate(configs) for i in range(num_tests)
+        ]
+        if workers == 1:
+            results = _execute(map, generate_tasks, algorithms, configs, blocks, num_tests)
+        else:
+            with ProcessPoolExecutor(workers) as pool:
+                # 每个进程大约分到 4 批，减少进程间通信又不至于让耗时长的批次拖尾
+                def mapper(fn, tasks):
+                    return pool.map(fn, tasks, chunksize=chunksize or max(1, len(tasks) // (workers * 4)))
+                results = _execute(mapper, generate_tasks, algorithms, configs, blocks, num_tests)
+        return results
+    finally:
+        for shm in blocks:
+            attached = _attached.pop(shm.name, None)
+            if attached is not None:
+                attached.close()
+            shm.close()
+            shm.unlink()
+
+
+def _execute(mapper, generate_tasks, algorithms, configs, blocks, num_tests):
+    endpoints = {}
+    for config_index, index, start, end in mapper(_generate, generate_tasks):
+        endpoints[config_index, index] = (start, end)
+
+    run_tasks = [
+        (blocks[c].name, c, i, config['size'], algorithm_name) + endpoints[c, i]
+        for c, config in enumerate(configs) for i in range(num_tests) for algorithm_name in algorithms
+    ]
+    # 先按场景顺序占位，保证汇总结果的顺序与完成顺序无关
+    slots = {}
+    for config_index, index, algorithm_name, result in mapper(_run, run_tasks):
+        slots[config_index, index, algorithm_name] = result
+
+    results = defaultdict(lambda: defaultdict(list))
+    for c, config in enumerate(configs):
+        for i in range(num_tests):
+            for algorithm_name in algorithms:
+                for key, value in slots[c, i, algorithm_name].items():
+                    results[config['name']][f"{algorithm_name}_{key}"].append(value)
+    return results
+
+
+def summarize(results, algorithms=None):
+    """每个配置、每个算法的统计：平均/最短/最长时间、平均节点、平均路径、成功率"""
+    algorithms = list(ALGORITHMS) if algorithms is None else list(algorithms)
+    summary = {}
+    for config_name, config_results in results.items():
+        summary[config_name] = {}
+        for algorithm_name in algorithms:
+            times = config_results[f"{algorithm_name}_time"]
+            successes = config_results[f"{algorithm_name}_success"]
+            summary[config_name][algorithm_name] = {
+                'mean_time': float(np.mean(times)),
+                'min_time': float(min(times)),
+                'max_time': float(max(times)),
+                'mean_nodes': float(np.mean(config_results[f"{algorithm_name}_nodes"])),
+                'mean_path_length': float(np.mean(config_results[f"{algorithm_name}_path_length"])),
+                'success_rate': sum(successes) / len(successes) * 100,
+            }
+    return summary
+
+
+def print_summary(summary):
+    for config_name, rows in summary.items():
+        print(f"\n测试场景: {config_name}")
+        print("-" * 80)
+        print(f"{'算法':<15} | {'平均时间(ms)':<12} | {'最短时间':<10} | {'最长时间':<10} | "
+              f"{'平均节点':<10} | {'平均路径':<10} | {'成功率':<8}")
+        print("-" * 80)
+        for algorithm_name, s in rows.items():
+            print(f"{algorithm_name:<15} | {s['mean_time']:>11.2f} | {s['min_time']:>9.2f} | "
+                  f"{s['max_time']:>9.2f} | {s['mean_nodes']:>9.1f} | "
+                  f"{s['mean_path_length']:>9.1f} | {s['success_rate']:>7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程寻路场景测试")
+    parser.add_argument('--tests', type=int, default=50, help="每个配置的场景数")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHMS), choices=list(ALGORITHMS))
+    parser.add_argument('--json', help="把汇总结果写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    results = run_scenarios(num_tests=args.tests, algorithms=args.algorithms,
+                            workers=args.workers, seed=args.seed)
+    elapsed = time.perf_counter() - start_time
+    summary = summarize(results, args.algorithms)
+    print_summary(summary)
+    print(f"\n共 {len(DEFAULT_CONFIGS) * args.tests * len(args.algorithms)} 次寻路，用时 {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
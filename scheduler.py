@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+import time
+
+
+class FrameScheduler:
+    """按帧分配寻路时间：每帧最多花 budget 秒，在所有挂起的搜索之间按优先级公平分配
+
+    采用步幅调度：每个搜索有一个"虚拟时间"，每次挑虚拟时间最小的搜索推进一个时间片，
+    推进后虚拟时间增加 实际耗时 / 优先级。优先级越高分到的时间越多，低优先级的搜索也不会饿死。
+    长查询被拆到多帧完成，不会造成单帧卡顿。
+    """
+
+    def __init__(self, budget=0.002, slice_expansions=32):
+        self.budget = budget
+        self.slice_expansions = slice_expansions
+        self._queue = []  # (虚拟时间, 序号, 任务)
+        self._counter = itertools.count()
+        self._virtual_time = 0.0
+        self.frames = 0
+        self.completed = 0
+        self.last_frame_time = 0.0
+        self.max_frame_time = 0.0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, search, priority=1.0, callback=None):
+        """加入一个 resumable.ResumableSearch，结束时调用 callback(search)"""
+        if priority <= 0:
+            raise ValueError("优先级必须为正数")
+        task = [search, priority, callback]
+        # 新任务从当前虚拟时间开始，不会因为来得晚而独占时间
+        heapq.heappush(self._queue, (self._virtual_time, next(self._counter), task))
+        return search
+
+    def run_frame(self, budget=None):
+        """执行一帧，返回本帧完成的搜索列表"""
+        budget = self.budget if budget is None else budget
+        frame_start = time.perf_counter()
+        deadline = frame_start + budget
+        finished = []
+        queue = self._queue
+        while queue and time.perf_counter() < deadline:
+            virtual, _, task = heapq.heappop(queue)
+            self._virtual_time = virtual
+            search, priority, callback = task
+            slice_start = time.perf_counter()
+            done = search.step(self.slice_expansions)
+            spent = time.perf_counter() - slice_start
+            if done:
+                self.completed += 1
+                finished.append(search)
+                if callback is not None:
+                    callback(search)
+            else:
+                heapq.heappush(queue, (virtual + spent / priority, next(self._counter), task))
+        self.frames += 1
+        self.last_frame_time = time.perf_counter() - frame_start
+        self.max_frame_time = max(self.max_frame_time, self.last_frame_time)
+        return finished
+
+    def run_until_idle(self, max_frames=None):
+        """连续执行帧直到没有挂起的搜索，返回执行的帧数"""
+        frames = 0
+        while self._queue and (max_frames is None or frames < max_frames):
+            self.run_frame()
+            frames += 1
+        return frames
+
+    def get_stats(self):
+        return {
+            'pending': len(self._queue),
+            'frames': self.frames,
+            'completed': self.completed,
+            'last_frame_time': self.last_frame_time,
+            'max_frame_time': self.max_frame_time,
+        }
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+from array import array
+
+# g值上限（比任何可达路径代价都大）
+INF_COST = 0x7fffffff
+
+# 8方向移动：(dx, dy, 代价)，顺序与各引擎的 movements 一致
+MOVES = [(0, 1, 10), (1, 0, 10), (0, -1, 10), (-1, 0, 10),
+         (1, 1, 14), (1, -1, 14), (-1, 1, 14), (-1, -1, 14)]
+
+
+def flat_steps(pw):
+    """按带边框宽度 pw 生成邻居偏移表：(偏移, dx, dy, 代价, 拐角1偏移, 拐角2偏移)"""
+    steps = []
+    for dx, dy, cost in MOVES:
+        if dx != 0 and dy != 0:
+            # 对角线移动要求水平和垂直两个相邻格都可通行
+            steps.append((dx * pw + dy, dx, dy, cost, dx * pw, dy))
+        else:
+            steps.append((dx * pw + dy, dx, dy, cost, 0, 0))
+    return steps
+
+
+class FlatSearchState:
+    """按格子下标预分配的搜索状态：g值、父节点和关闭标记都存放在平铺数组里
+
+    g/父节点是否有效、格子是否已关闭都用"代数戳"判断：stamp[i] == generation
+    表示 g[i]/parent[i] 属于本次查询，closed[i] == generation 表示已关闭。
+    reset() 只需把 generation 加一，不必清空数组，缓冲区可以在成千上万次查询间复用。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.g = array('i', [INF_COST]) * size
+        self.parent = array('i', [-1]) * size
+        self.stamp = array('I', [0]) * size
+        self.closed = array('I', [0]) * size
+        self.generation = 0
+
+    def reset(self):
+        """开始新查询：递增代数戳，溢出时才真正清零"""
+        self.generation += 1
+        if self.generation > 0xffffffff:
+            zeros = array('I', [0]) * self.size
+            self.stamp[:] = zeros
+            self.closed[:] = zeros
+            self.generation = 1
+        return self.generation
+
+    def trace(self, index):
+        """沿父节点数组回溯，返回从起点到 index 的下标序列"""
+        parent = self.parent
+        path = []
+        while index != -1:
+            path.append(index)
+            index = parent[index]
+        return path[::-1]
+
+
+class _Default(dict):
+    """缺失的键返回默认值，不插入"""
+    __slots__ = ('default',)
+
+    def __init__(self, default):
+        super().__init__()
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+
+class SparseSearchState(FlatSearchState):
+    """与 FlatSearchState 接口相同，但 g/父节点/代数戳存放在字典里，按需占用内存
+
+    用于没有稠密缓冲区的超大网格（如 tiled_grid.TiledGrid），内存只与本次查询访问过的格子数有关。
+    reset() 清空字典并递增代数戳。
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.g = _Default(INF_COST)
+        self.parent = _Default(-1)
+        self.stamp = _Default(0)
+        self.closed = _Default(0)
+        self.generation = 0
+
+    def reset(self):
+        for table in (self.g, self.parent, self.stamp, self.closed):
+            table.clear()
+        self.generation += 1
+        return self.generation
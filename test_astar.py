@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+
+from astar import AStar
+from grid import Grid
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+
+
+def check_optimal(engine, grid, queries):
+    for start, end in queries:
+        path = engine.find_path(start, end)
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None), (start, end)
+        if path is not None:
+            assert is_valid_path(grid, path, start, end)
+            assert engine.path_cost == expected == path_cost(path)
+            assert engine.path_length == len(path)
+
+
+def test_node_and_flat_modes_optimal():
+    for seed in range(6):
+        grid = random_grid(30, 40, 0.3, seed=seed)
+        queries = random_queries(grid, 8, seed=seed + 100)
+        check_optimal(AStar(grid), grid, queries)
+        check_optimal(AStar(grid, flat=True), grid, queries)
+
+
+def test_node_and_flat_modes_identical():
+    # 两种模式的排序键 (f, h, 压入序号) 和压入条件相同，路径和统计应逐项一致
+    for seed in range(4):
+        grid = random_grid(30, 40, 0.3, seed=seed)
+        node, flat = AStar(grid), AStar(grid, flat=True)
+        for start, end in random_queries(grid, 8, seed=seed + 200):
+            assert node.find_path(start, end) == flat.find_path(start, end)
+            for name in ('nodes_explored', 'heap_pushes', 'stale_pops', 'path_cost'):
+                assert getattr(node, name) == getattr(flat, name), name
+
+
+def test_flat_buffers_reused_across_queries():
+    grid = random_grid(30, 30, 0.25, seed=7)
+    engine = AStar(grid, flat=True)
+    state = engine._state
+    queries = random_queries(grid, 40, seed=8)
+    check_optimal(engine, grid, queries)
+    assert engine._state is state
+    # 反向再跑一遍，代数戳重置不能残留上一次查询的状态
+    check_optimal(engine, grid, [(end, start) for start, end in queries])
+
+
+def test_flat_counters():
+    grid = random_grid(40, 40, 0.2, seed=9)
+    engine = AStar(grid, flat=True)
+    for start, end in random_queries(grid, 10, seed=10):
+        if engine.find_path(start, end) is not None:
+            assert engine.heap_pushes >= engine.nodes_explored
+            assert 0 <= engine.stale_pops < engine.nodes_explored
+
+
+def test_flat_sees_set_cell():
+    grid = Grid.wrap([[0] * 8 for _ in range(8)])
+    engine = AStar(grid, flat=True)
+    assert engine.find_path((0, 0), (0, 7)) is not None
+    assert engine.path_cost == 70
+    for x in range(7):
+        grid.set_cell(x, 4, 1)
+    path = engine.find_path((0, 0), (0, 7))
+    assert is_valid_path(grid, path, (0, 0), (0, 7))
+    assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 7))
+    grid.set_cell(7, 4, 1)
+    assert engine.find_path((0, 0), (0, 7)) is None
+
+
+def test_no_corner_cutting():
+    grid = [[0, 1], [1, 0]]
+    for engine in (AStar(grid), AStar(grid, flat=True)):
+        assert engine.find_path((0, 0), (1, 1)) is None
+
+
+def test_start_equals_goal():
+    grid = [[0] * 4 for _ in range(4)]
+    for engine in (AStar(grid), AStar(grid, flat=True)):
+        assert engine.find_path((2, 1), (2, 1)) == [(2, 1)]
+        assert engine.path_cost == 0
+
+
+def visible(grid, a, b, samples_per_cell=40):
+    """按细密采样检查 a、b 两格中心的连线：经过的格子（含恰好穿过格点时的两侧格子）都可通行"""
+    grid = Grid.wrap(grid)
+    length = max(abs(b[0] - a[0]), abs(b[1] - a[1]), 1)
+    count = length * samples_per_cell
+    for i in range(count + 1):
+        t = i / count
+        x = a[0] + (b[0] - a[0]) * t
+        y = a[1] + (b[1] - a[1]) * t
+        for ox, oy in ((1e-6, 1e-6), (1e-6, -1e-6), (-1e-6, 1e-6), (-1e-6, -1e-6)):
+            if grid.is_blocked(math.floor(x + 0.5 + ox), math.floor(y + 0.5 + oy)):
+                return False
+    return True
+
+
+def test_any_angle_paths():
+    for seed in range(4):
+        grid = random_grid(30, 30, 0.2, seed=seed)
+        theta = AStar(grid, any_angle='theta')
+        lazy = AStar(grid, any_angle='lazy')
+        theta_checks = lazy_checks = 0
+        for start, end in random_queries(grid, 8, seed=seed + 30):
+            expected = dijkstra_cost(grid, start, end)
+            for engine in (theta, lazy):
+                path = engine.find_path(start, end)
+                assert (path is None) == (expected is None)
+                if path is None:
+                    continue
+                assert path[0] == start and path[-1] == end
+                length = sum(10 * math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(path, path[1:]))
+                assert abs(engine.path_cost - length) < 1e-6
+                # 任意角度路径不长于八方向最优路径，不短于直线距离
+                assert 10 * math.hypot(end[0] - start[0], end[1] - start[1]) - 1e-6 <= engine.path_cost
+                assert engine.path_cost <= expected + 1e-6
+                for a, b in zip(path, path[1:]):
+                    assert visible(grid, a, b), (a, b)
+            theta_checks += theta.los_checks
+            lazy_checks += lazy.los_checks
+        assert lazy_checks < theta_checks
+
+
+def test_any_angle_open_map_is_straight():
+    grid = [[0] * 20 for _ in range(20)]
+    for mode in ('theta', 'lazy'):
+        engine = AStar(grid, any_angle=mode)
+        assert engine.find_path((0, 0), (19, 7)) == [(0, 0), (19, 7)]
+
+
+def test_any_angle_unreachable_and_set_cell():
+    grid = Grid.wrap([[0] * 10 for _ in range(10)])
+    for x in range(9):
+        grid.set_cell(x, 5, 1)
+    for mode in ('theta', 'lazy'):
+        engine = AStar(grid, any_angle=mode)
+        assert engine.find_path((0, 0), (0, 9)) is not None
+        assert engine.find_path((0, 0), (3, 5)) is None
+        grid.set_cell(9, 5, 1)
+        assert engine.find_path((0, 0), (0, 9)) is None
+        grid.set_cell(9, 5, 0)
+        path = engine.find_path((0, 0), (0, 9))
+        assert all(visible(grid, a, b) for a, b in zip(path, path[1:]))
+    try:
+        AStar(grid, any_angle='straight')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的任意角度模式应当报错")
+
+
+def test_anytime_converges_to_optimal():
+    grid = random_grid(40, 40, 0.3, seed=11)
+    engine = AStar(grid, flat=True)
+    for start, end in random_queries(grid, 8, seed=12):
+        path = engine.find_path_anytime(start, end, epsilon=3.0)
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None)
+        if path is None:
+            continue
+        assert is_valid_path(grid, path, start, end)
+        assert engine.path_cost == path_cost(path) == expected
+        assert engine.suboptimality_bound == 1.0
+        costs = [cost for _, cost, _, _ in engine.improvements]
+        assert costs == sorted(costs, reverse=True)
+        for eps, cost, bound, _ in engine.improvements:
+            assert bound <= eps and cost <= bound * expected + 1e-9
+
+
+def test_anytime_deadline_returns_bounded_path():
+    grid = random_grid(40, 40, 0.3, seed=13)
+    engine = AStar(grid, flat=True)
+    for start, end in random_queries(grid, 8, seed=14):
+        # 截止时间已过：只完成第一轮
+        path = engine.find_path_anytime(start, end, deadline=time.perf_counter(), epsilon=2.0)
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None)
+        if path is None:
+            continue
+        assert len(engine.improvements) == 1
+        assert is_valid_path(grid, path, start, end)
+        assert engine.path_cost == path_cost(path)
+        assert expected <= engine.path_cost <= engine.suboptimality_bound * expected + 1e-9
+        assert engine.suboptimality_bound <= 2.0
+
+
+def test_anytime_unreachable_and_set_cell():
+    grid = Grid.wrap([[0] * 10 for _ in range(10)])
+    for x in range(10):
+        grid.set_cell(x, 5, 1)
+    engine = AStar(grid)
+    assert engine.find_path_anytime((0, 0), (0, 9)) is None
+    assert engine.find_path_anytime((0, 0), (4, 5)) is None
+    grid.set_cell(6, 5, 0)
+    path = engine.find_path_anytime((0, 0), (0, 9))
+    assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 9)) == path_cost(path)
+
+
+def test_anytime_metrics_and_counter_reset():
+    import metrics
+    grid = random_grid(30, 30, 0.25, seed=9)
+    engine = AStar(grid)
+    (start, end), = random_queries(grid, 1, seed=10)
+    with metrics.use_metrics() as m:
+        engine.find_path_anytime(start, end, epsilon=2.0)
+        first = (engine.nodes_explored, engine.heap_pushes, engine.stale_pops)
+        counters = m.snapshot()['counters']['astar_anytime']
+        assert counters['queries'] == 1
+        assert counters['expansions'] == first[0] > 0
+        assert counters['heap_pushes'] == first[1] >= first[0]
+        # 第二次查询的计数不能叠加在上一次之上
+        engine.find_path_anytime(start, end, epsilon=2.0)
+        assert (engine.nodes_explored, engine.heap_pushes, engine.stale_pops) == first
+        assert m.snapshot()['counters']['astar_anytime']['queries'] == 2
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+from functools import partial
+
+import numpy as np
+
+from astar import AStar
+from async_planner import AsyncPlanner
+from grid import Grid
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+class GatedAStar(AStar):
+    """find_path 等待 gate 打开后才开始，用来让请求保持在执行中"""
+
+    def __init__(self, grid, gate):
+        super().__init__(grid, flat=True)
+        self.gate = gate
+
+    def find_path(self, start, end):
+        self.gate.wait()
+        return super().find_path(start, end)
+
+
+def test_thread_results_match_dijkstra():
+    grid = random_grid(30, 30, 0.3, seed=0)
+    queries = random_queries(grid, 10, seed=1) + [((0, 0), (30, 0))]
+
+    async def main():
+        async with AsyncPlanner(grid, max_workers=3) as planner:
+            paths = await asyncio.gather(*(planner.find_path(s, e) for s, e in queries))
+            return paths, planner.get_stats()
+    paths, stats = asyncio.run(main())
+    for path, (start, end) in zip(paths, queries):
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None)
+        if path is not None:
+            assert path[0] == start and path[-1] == end
+    assert stats['completed'] == stats['submitted'] == len(set(queries))
+    assert stats['queue_depth'] == 0 and stats['inflight'] == 0
+    assert 0 < stats['latency_p50'] <= stats['latency_p95'] <= stats['latency_p99']
+
+
+def test_identical_requests_coalesce():
+    grid = np.zeros((20, 20), dtype=np.uint8)
+    gate = threading.Event()
+
+    async def main():
+        planner = AsyncPlanner(grid, engine_factory=partial(GatedAStar, gate=gate))
+        tasks = [asyncio.ensure_future(planner.find_path((0, 0), (19, 19))) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert planner.get_stats()['inflight'] == 1
+        gate.set()
+        paths = await asyncio.gather(*tasks)
+        planner.close()
+        return planner, paths
+    planner, paths = asyncio.run(main())
+    assert planner.submitted == 1 and planner.coalesced == 4
+    assert all(path == paths[0] for path in paths)
+    # 每个调用方拿到独立的列表
+    assert len({id(path) for path in paths}) == 5
+
+
+def test_grid_version_splits_requests():
+    grid = Grid.wrap(np.zeros((10, 10), dtype=np.uint8))
+
+    async def main():
+        async with AsyncPlanner(grid) as planner:
+            first = await planner.find_path((0, 0), (0, 9))
+            for x in range(9):
+                grid.set_cell(x, 5, 1)
+            second = await planner.find_path((0, 0), (0, 9))
+            return planner.submitted, first, second
+    submitted, first, second = asyncio.run(main())
+    assert submitted == 2
+    assert len(first) == 10 and len(second) > 10
+
+
+def test_timeout_and_cancellation():
+    grid = np.zeros((10, 10), dtype=np.uint8)
+    gate = threading.Event()
+
+    async def main():
+        planner = AsyncPlanner(grid, engine_factory=partial(GatedAStar, gate=gate), max_workers=1)
+        waiting = asyncio.ensure_future(planner.find_path((0, 0), (9, 9)))
+        try:
+            await planner.find_path((0, 0), (9, 9), timeout=0.01)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("应当超时")
+        # 一个调用方超时不影响另一个
+        assert not waiting.done()
+        # 排在后面、尚未开始的请求被全部调用方放弃后撤销
+        queued = asyncio.ensure_future(planner.find_path((1, 1), (8, 8)))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        await asyncio.sleep(0.01)
+        gate.set()
+        path = await waiting
+        planner.close()
+        return planner, path
+    planner, path = asyncio.run(main())
+    assert path[0] == (0, 0) and path[-1] == (9, 9)
+    assert planner.timeouts == 1 and planner.cancelled == 1
+    assert planner.completed == 1 and planner.get_stats()['inflight'] == 0
+
+
+def test_process_pool():
+    grid = Grid.wrap(random_grid(20, 20, 0.25, seed=2))
+    queries = random_queries(grid, 4, seed=3)
+
+    async def main():
+        async with AsyncPlanner(grid, executor='process', max_workers=1) as planner:
+            before = await asyncio.gather(*(planner.find_path(s, e) for s, e in queries))
+            pool = planner._pool
+            grid.set_cell(*queries[0][0], 1)
+            blocked = await planner.find_path(*queries[0])
+            return before, blocked, planner._pool is not pool
+    before, blocked, rebuilt = asyncio.run(main())
+    for path, (start, end) in zip(before, queries):
+        assert (path is None) == (dijkstra_cost(random_grid(20, 20, 0.25, seed=2), start, end) is None)
+    assert blocked is None and rebuilt
+
+
+def test_unknown_executor():
+    try:
+        AsyncPlanner(np.zeros((2, 2), dtype=np.uint8), executor='fiber')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的执行器类型应当报错")
+
+
+def test_latency_percentiles_are_nearest_rank():
+    planner = AsyncPlanner(np.zeros((4, 4), dtype=np.uint8))
+    try:
+        assert planner.get_stats()['latency_p50'] == 0
+        planner._latencies.extend([0.2, 0.1])
+        stats = planner.get_stats()
+        # 两个样本的中位数取较小的一个，p95/p99 取最大值
+        assert stats['latency_p50'] == 0.1
+        assert stats['latency_p95'] == stats['latency_p99'] == 0.2
+        planner._latencies.extend(i / 100 for i in range(1, 99))
+        assert planner.get_stats()['latency_p95'] == 0.93
+    finally:
+        planner.close()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from jps import JPS
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+def open_grid(height=20, width=20):
+    return [[0] * width for _ in range(height)]
+
+
+def test_find_paths_any_angle():
+    # 任意角度模式的代价是浮点数，批量结果要原样保存
+    grid = open_grid()
+    queries = [((0, 0), (19, 7)), ((3, 2), (3, 2)), ((0, 19), (12, 0))]
+    for mode in ('theta', 'lazy'):
+        single = AStar(grid, any_angle=mode)
+        result = AStar(grid, any_angle=mode).find_paths(queries)
+        assert len(result) == len(queries)
+        for i, (start, end) in enumerate(queries):
+            path = single.find_path(start, end)
+            assert result.path(i) == path
+            assert abs(result.costs[i] - single.path_cost) < 1e-9
+        # 空旷地图上任意角度路径就是直线
+        assert abs(result.costs[0] - 10 * (19 ** 2 + 7 ** 2) ** 0.5) < 1e-9
+
+
+def test_find_paths_matches_dijkstra():
+    grid = random_grid(30, 30, 0.3, seed=4)
+    queries = random_queries(grid, 15, seed=5)
+    # 再加一条起点是障碍、一条终点越界的查询
+    wall = tuple(int(v) for v in np.argwhere(grid == 1)[0])
+    queries += [(wall, queries[0][1]), (queries[0][0], (30, 0))]
+    # 交替模式的双向搜索不保证最优，这里用平衡模式
+    for engine in (AStar(grid), BidirectionalAStar(grid, balanced=True), JPS(grid)):
+        result = engine.find_paths(queries)
+        assert len(result) == len(queries)
+        assert result.nodes_explored >= 0
+        for i, (start, end) in enumerate(queries):
+            expected = dijkstra_cost(grid, start, end)
+            path = result.path(i)
+            if expected is None:
+                assert path is None and result.costs[i] == -1 and result.lengths[i] == 0
+            else:
+                assert path[0] == tuple(start) and path[-1] == tuple(end)
+                assert result.costs[i] == expected
+        assert result.found() == sum(dijkstra_cost(grid, s, e) is not None for s, e in queries)
+
+
+
+def test_find_paths_reuses_flat_buffers_in_node_mode():
+    grid = random_grid(30, 30, 0.25, seed=6)
+    queries = random_queries(grid, 10, seed=7)
+    for engine_type in (AStar, BidirectionalAStar):
+        single = engine_type(grid)
+        engine = engine_type(grid)
+        first = engine.find_paths(queries)
+        # Node 模式构造的引擎批量查询时也用平铺数组，结束后恢复原模式
+        assert not engine.flat
+        state = engine._state if engine_type is AStar else engine._forward
+        generation = state.generation
+        second = engine.find_paths(queries)
+        # 缓冲区没有重新分配，只靠代数戳重置
+        assert (engine._state if engine_type is AStar else engine._forward) is state
+        assert state.generation == 2 * generation == 2 * len(queries)
+        # 两种模式结果相同：与逐个 Node 模式查询一致
+        for result in (first, second):
+            for i, (start, end) in enumerate(queries):
+                assert result.path(i) == single.find_path(start, end)
+                assert result.costs[i] == (single.path_cost if result.path(i) is not None else -1)
+        assert second.nodes_explored == first.nodes_explored
+
+
+if __name__ == "__main__":
+    test_find_paths_any_angle()
+    test_find_paths_matches_dijkstra()
+    test_find_paths_reuses_flat_buffers_in_node_mode()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+import tempfile
+
+import benchmark
+from reference import dijkstra_cost
+
+OPTIMAL_ENGINES = ['astar', 'astar_flat', 'astar_alt', 'bidirectional_balanced',
+                   'bidirectional_alt', 'jps', 'jps_plus']
+
+
+def options(**kwargs):
+    values = dict(seed=0, repeat=2, warmup=1, queries=4, landmarks=4, landmark_selection='farthest',
+                  active_landmarks=None, scenarios='small_map', engines='astar,jps')
+    values.update(kwargs)
+    return argparse.Namespace(**values)
+
+
+def test_scenarios_are_reproducible():
+    grid_a, queries_a = benchmark.build_scenario('small_map', 3, 10)
+    grid_b, queries_b = benchmark.build_scenario('small_map', 3, 10)
+    assert grid_a.tolist() == grid_b.tolist() and queries_a == queries_b
+    grid_c, _ = benchmark.build_scenario('small_map', 4, 10)
+    assert grid_c.tolist() != grid_a.tolist()
+    grid_d, _ = benchmark.build_scenario('sparse_100_5', 3, 2)
+    assert grid_d.tolist() == benchmark.build_scenario('sparse_100_5', 3, 2)[0].tolist()
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert benchmark.percentile(values, 50) == 50
+    assert benchmark.percentile(values, 95) == 95
+    assert benchmark.percentile(values, 99) == 99
+    assert benchmark.percentile([7], 99) == 7
+    assert benchmark.percentile([], 50) == 0
+
+
+def test_optimal_engines_agree_with_dijkstra():
+    grid, queries = benchmark.build_scenario('medium_map', 1, 6)
+    opts = options()
+    for name in OPTIMAL_ENGINES:
+        engine = benchmark.ENGINES[name](grid, opts)
+        for start, end in queries:
+            path = engine.find_path(start, end)
+            expected = dijkstra_cost(grid, start, end)
+            assert (path is None) == (expected is None), (name, start, end)
+            if path is not None:
+                assert engine.path_cost == expected, (name, start, end)
+
+
+def test_run_and_compare():
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = os.path.join(tmp, 'baseline.json')
+        assert benchmark.run(options(out=baseline)) == 0
+        with open(baseline) as f:
+            report = json.load(f)
+        stats = report['results']['small_map']['astar']
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'mean_expansions', 'peak_memory_bytes', 'success_rate'):
+            assert key in stats
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+        assert report['meta']['seed'] == 0
+
+        # 与自身对比没有回退；扩展数翻倍后应被标记
+        assert benchmark.main(['compare', baseline, baseline, '--threshold', '1000']) == 0
+        report['results']['small_map']['jps']['mean_expansions'] *= 2
+        current = os.path.join(tmp, 'current.json')
+        with open(current, 'w') as f:
+            json.dump(report, f)
+        assert benchmark.main(['compare', baseline, current, '--threshold', '0.5']) == 1
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from common import generate_random_grid
+from grid import Grid
+from reference import dijkstra_cost, is_valid_path, path_cost, random_queries
+
+
+def test_balanced_optimal():
+    for seed in range(8):
+        grid = generate_random_grid((40, 40), 0.3, seed=seed)
+        engine = BidirectionalAStar(grid, balanced=True)
+        for start, end in random_queries(grid, 6, seed=seed):
+            path = engine.find_path(start, end)
+            expected = dijkstra_cost(grid, start, end)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert engine.path_cost == expected
+                assert is_valid_path(grid, path, start, end)
+                assert engine.nodes_explored == engine.nodes_explored_forward + engine.nodes_explored_backward
+
+
+def test_node_and_flat_modes_identical():
+    # 交替模式下两种实现的排序键 (f, h, 压入序号) 和压入条件相同
+    for seed in range(4):
+        grid = generate_random_grid((40, 40), 0.3, seed=seed)
+        node, flat = BidirectionalAStar(grid), BidirectionalAStar(grid, flat=True)
+        for start, end in random_queries(grid, 6, seed=seed + 20):
+            assert node.find_path(start, end) == flat.find_path(start, end)
+            for name in ('nodes_explored', 'nodes_explored_forward', 'nodes_explored_backward',
+                         'heap_pushes', 'stale_pops', 'path_cost'):
+                assert getattr(node, name) == getattr(flat, name), name
+
+
+def test_side_counters_reset_in_every_mode():
+    grid = generate_random_grid((40, 40), 0.3, seed=5)
+    queries = [q for q in random_queries(grid, 6, seed=6) if dijkstra_cost(grid, *q) is not None]
+    engines = [BidirectionalAStar(grid), BidirectionalAStar(grid, flat=True),
+               BidirectionalAStar(grid, open_list='bucket'), BidirectionalAStar(grid, balanced=True)]
+    for engine in engines:
+        # 长查询之后再做短查询，两侧计数不能残留上一次的值
+        for start, end in queries + [(queries[0][0], queries[0][0])]:
+            engine.find_path(start, end)
+            assert engine.nodes_explored == engine.nodes_explored_forward + engine.nodes_explored_backward
+            if not engine.balanced:
+                # 交替模式两侧轮流弹出，正向先行
+                assert engine.nodes_explored_forward - engine.nodes_explored_backward in (0, 1)
+
+
+def test_balanced_expands_fewer_than_astar():
+    balanced = astar = 0
+    for seed in range(10):
+        grid = generate_random_grid((80, 80), 0.25, seed=seed)
+        engine = BidirectionalAStar(grid, balanced=True)
+        reference = AStar(grid, flat=True)
+        engine.find_path((0, 0), (79, 79))
+        reference.find_path((0, 0), (79, 79))
+        assert engine.path_cost == reference.path_cost
+        balanced += engine.nodes_explored
+        astar += reference.nodes_explored
+    assert balanced < astar
+
+
+def test_balanced_resumable_matches():
+    grid = generate_random_grid((40, 40), 0.3, seed=11)
+    engine = BidirectionalAStar(grid, balanced=True)
+    for start, end in random_queries(grid, 5, seed=12):
+        search = engine.start_search(start, end)
+        while not search.step(5):
+            pass
+        path = engine.find_path(start, end)
+        assert search.path == path
+        if path is not None:
+            assert search.path_cost == engine.path_cost
+
+
+def test_balanced_same_cell():
+    grid = [[0] * 5 for _ in range(5)]
+    engine = BidirectionalAStar(grid, balanced=True)
+    assert engine.find_path((1, 1), (1, 1)) == [(1, 1)]
+    assert engine.path_cost == 0
+
+
+def test_alternating_modes_return_valid_paths():
+    for seed in range(6):
+        grid = generate_random_grid((30, 30), 0.3, seed=seed)
+        legacy = BidirectionalAStar(grid)
+        flat = BidirectionalAStar(grid, flat=True)
+        for start, end in random_queries(grid, 6, seed=seed):
+            expected = dijkstra_cost(grid, start, end)
+            for engine in (legacy, flat):
+                path = engine.find_path(start, end)
+                assert (path is None) == (expected is None)
+                if path is not None:
+                    # 交替扩展在首次相遇时停止，不保证最优，但路径必须合法且代价如实报告
+                    assert is_valid_path(grid, path, start, end)
+                    assert engine.path_cost == path_cost(path) >= expected
+                    assert engine.path_length == len(path)
+
+
+def test_flat_sees_set_cell():
+    grid = Grid.wrap([[0] * 8 for _ in range(8)])
+    engine = BidirectionalAStar(grid, flat=True)
+    assert engine.find_path((0, 0), (0, 7)) is not None
+    for x in range(8):
+        grid.set_cell(x, 4, 1)
+    assert engine.find_path((0, 0), (0, 7)) is None
+    grid.set_cell(5, 4, 0)
+    path = engine.find_path((0, 0), (0, 7))
+    assert is_valid_path(grid, path, (0, 0), (0, 7))
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import random
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from components import ComponentIndex, reachable
+from grid import Grid
+from jps import JPS
+from reference import dijkstra_cost, random_grid
+from visibility_graph import VisibilityGraph
+
+
+def partition(grid, index):
+    """把格子按分量分组，标号本身的取值无关紧要"""
+    groups = {}
+    for x in range(grid.height):
+        for y in range(grid.width):
+            label = index.label((x, y))
+            if label:
+                groups.setdefault(label, set()).add((x, y))
+    return sorted(sorted(group) for group in groups.values())
+
+
+def test_labels_match_search():
+    grid = Grid.wrap(random_grid(25, 25, 0.4, seed=1))
+    index = grid.components()
+    rng = random.Random(2)
+    free = [(x, y) for x in range(25) for y in range(25) if not grid.is_blocked(x, y)]
+    for _ in range(60):
+        start, end = rng.choice(free), rng.choice(free)
+        assert index.connected(start, end) == (dijkstra_cost(grid, start, end) is not None)
+
+
+def test_incremental_updates_match_rebuild():
+    for diagonal in (False, True):
+        grid = Grid.wrap(random_grid(20, 20, 0.35, seed=3))
+        index = grid.components(diagonal)
+        rng = random.Random(4)
+        for _ in range(150):
+            x, y = rng.randrange(20), rng.randrange(20)
+            grid.set_cell(x, y, 1 - grid[x][y])
+            fresh = ComponentIndex(Grid.wrap(grid.to_numpy()), diagonal)
+            assert partition(grid, index) == partition(grid, fresh)
+            assert index.count == fresh.count
+
+
+def test_wall_split_and_merge():
+    grid = Grid.wrap([[0] * 7 for _ in range(7)])
+    for x in range(7):
+        grid.set_cell(x, 3, 1)
+    assert not reachable(grid, (0, 0), (0, 6))
+    grid.set_cell(4, 3, 0)
+    assert reachable(grid, (0, 0), (0, 6))
+    assert grid.components().count == 1
+
+
+def test_blocked_and_out_of_bounds_endpoints():
+    grid = Grid.wrap([[0] * 6 for _ in range(6)])
+    grid.set_cell(2, 2, 1)
+    assert not reachable(grid, (2, 2), (0, 0))
+    assert not reachable(grid, (0, 0), (2, 2))
+    assert not reachable(grid, (0, 0), (6, 0))
+    assert not reachable(grid, (-1, 0), (0, 0))
+    assert reachable(grid, (0, 0), (5, 5))
+
+
+def test_engines_reject_unreachable_up_front():
+    grid = [[0] * 10 for _ in range(10)]
+    for x in range(10):
+        grid[x][4] = 1
+    grid[7][7] = 1
+    engines = [AStar(grid), AStar(grid, flat=True), AStar(grid, any_angle='lazy'),
+               BidirectionalAStar(grid), BidirectionalAStar(grid, balanced=True), JPS(grid)]
+    for engine in engines:
+        for start, end in (((0, 0), (0, 9)), ((0, 0), (7, 7)), ((7, 7), (0, 9)), ((0, 0), (10, 0))):
+            assert engine.find_path(start, end) is None
+            assert engine.nodes_explored == 0
+    visibility = VisibilityGraph(grid)
+    assert visibility.find_path((0, 0), (7, 7)) is None
+    assert visibility.find_path((7, 7), (0, 9)) is None
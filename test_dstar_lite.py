@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from dstar_lite import DStarLite
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+
+
+def check(planner, grid, start, end):
+    path = planner.find_path()
+    expected = dijkstra_cost(grid, start, end)
+    assert (path is None) == (expected is None), (start, end)
+    if path is not None:
+        assert is_valid_path(grid, path, start, end)
+        assert planner.path_cost == path_cost(path) == expected
+    else:
+        assert planner.path_cost == 0 and planner.path_length == 0
+
+
+def test_initial_plan_optimal():
+    grid = random_grid(30, 30, 0.25, seed=1)
+    for start, end in random_queries(grid, 15, seed=2):
+        check(DStarLite(grid.copy(), start, end), grid, start, end)
+
+
+def test_replanning_matches_dijkstra():
+    rng = np.random.default_rng(3)
+    for seed in range(3):
+        grid = random_grid(25, 25, 0.2, seed=seed)
+        start, end = random_queries(grid, 1, seed=seed + 20)[0]
+        planner = DStarLite(grid, start, end)
+        check(planner, grid, start, end)
+        for _ in range(15):
+            # 每批随机翻转几个格子（起终点除外），与 Dijkstra 在新地图上的结果比较
+            changes = []
+            for x, y in rng.integers(0, 25, size=(3, 2)):
+                if (x, y) not in (start, end):
+                    changes.append((int(x), int(y), 1 - int(grid[x, y])))
+            planner.update_cells(changes)
+            assert planner.update_history[-1][1] == planner.nodes_explored
+            check(planner, grid, start, end)
+
+
+def test_small_change_repairs_locally():
+    grid = random_grid(60, 60, 0.25, seed=0)
+    grid[0, 0] = grid[59, 59] = 0
+    planner = DStarLite(grid, (0, 0), (59, 59))
+    path = planner.find_path()
+    x, y = path[len(path) // 2]
+    expansions = planner.update_cells([(x, y, 1)])
+    assert planner.update_history[-1] == (1, expansions)
+    check(planner, grid, (0, 0), (59, 59))
+    # 修复量应小于在新地图上从头规划
+    fresh = DStarLite(grid.copy(), (0, 0), (59, 59))
+    fresh.find_path()
+    assert expansions < fresh.nodes_explored
+    # 重复应用相同的值不算变化
+    planner.update_cells([(x, y, 1)])
+    assert planner.update_history[-1] == (0, 0)
+
+
+def test_move_start_then_replan():
+    grid = random_grid(30, 30, 0.2, seed=5)
+    start, end = random_queries(grid, 1, seed=6)[0]
+    planner = DStarLite(grid, start, end)
+    path = planner.find_path()
+    if path is None or len(path) < 4:
+        return
+    here = path[len(path) // 2]
+    assert planner.find_path(here)[0] == here
+    blocker = path[len(path) // 2 + 1]
+    if blocker != end:
+        planner.update_cells([(blocker[0], blocker[1], 1)])
+    check(planner, grid, here, end)
+
+
+def test_wall_closes_and_reopens():
+    grid = np.zeros((20, 20), dtype=np.uint8)
+    planner = DStarLite(grid, (0, 0), (19, 19))
+    planner.update_cells([(x, 10, 1) for x in range(20)])
+    check(planner, grid, (0, 0), (19, 19))
+    assert planner.find_path() is None
+    planner.update_cells([(7, 10, 0)])
+    check(planner, grid, (0, 0), (19, 19))
+
+
+def test_blocked_endpoints():
+    grid = np.zeros((5, 5), dtype=np.uint8)
+    grid[2, 2] = 1
+    assert DStarLite(grid, (0, 0), (2, 2)).find_path() is None
+    assert DStarLite(grid, (2, 2), (0, 0)).find_path() is None
+    assert DStarLite(grid, (2, 2), (2, 2)).find_path() is None
+    assert DStarLite(grid, (3, 3), (3, 3)).find_path() == [(3, 3)]
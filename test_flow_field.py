@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from flow_field import AT_GOAL, NO_PATH, FlowField, FlowFieldCache
+from grid import Grid
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+
+
+def test_every_cell_follows_optimal_path():
+    for seed in range(3):
+        grid = random_grid(14, 16, 0.3, seed=seed)
+        goal = random_queries(grid, 1, seed=seed)[0][0]
+        field = FlowField(grid, goal)
+        assert field.direction(goal) == AT_GOAL
+        assert field.memory_bytes == len(Grid.wrap(grid).padded)
+        for x in range(14):
+            for y in range(16):
+                path = field.path((x, y))
+                expected = dijkstra_cost(grid, (x, y), goal)
+                assert (path is None) == (expected is None), (x, y)
+                if path is None:
+                    assert field.direction((x, y)) == NO_PATH
+                    continue
+                assert is_valid_path(grid, path, (x, y), goal)
+                assert path_cost(path) == expected
+
+
+def test_cache_hits_and_eviction():
+    grid = random_grid(20, 20, 0.2, seed=3)
+    cache = FlowFieldCache(grid, max_fields=2)
+    goals = [q[1] for q in random_queries(grid, 3, seed=4)]
+    starts = [q[0] for q in random_queries(grid, 10, seed=5)]
+    for start in starts:
+        cache.find_path(start, goals[0])
+    assert cache.misses == 1 and cache.hits == 9
+    cache.find_path(starts[0], goals[1])
+    cache.find_path(starts[0], goals[2])
+    assert cache.evictions == 1 and cache.get_stats()['fields'] == 2
+    cache.find_path(starts[0], goals[0])
+    assert cache.misses == 4
+    assert cache.next_step(goals[0], goals[0]) == goals[0]
+
+
+def test_find_paths_matches_dijkstra():
+    grid = random_grid(25, 25, 0.3, seed=6)
+    goal = random_queries(grid, 1, seed=7)[0][1]
+    queries = [(start, goal) for start, _ in random_queries(grid, 20, seed=8)]
+    cache = FlowFieldCache(grid)
+    result = cache.find_paths(queries)
+    # 20 个智能体共享一个终点，只做一次反向搜索
+    assert cache.misses == 1
+    for i, (start, end) in enumerate(queries):
+        expected = dijkstra_cost(grid, start, end)
+        assert result.costs[i] == (-1 if expected is None else expected)
+
+
+def test_set_cell_recomputes_field():
+    grid = Grid.wrap(np.zeros((10, 10), dtype=np.uint8))
+    cache = FlowFieldCache(grid)
+    assert cache.find_path((0, 0), (0, 9)) is not None
+    for x in range(9):
+        grid.set_cell(x, 5, 1)
+    path = cache.find_path((0, 0), (0, 9))
+    assert cache.misses == 2
+    assert cache.path_cost == path_cost(path) == dijkstra_cost(grid, (0, 0), (0, 9))
+    grid.set_cell(9, 5, 1)
+    assert cache.find_path((0, 0), (0, 9)) is None
+    assert cache.path_cost == 0 and cache.path_length == 0
+
+
+def test_blocked_and_out_of_range():
+    grid = np.zeros((6, 6), dtype=np.uint8)
+    grid[2, 2] = 1
+    cache = FlowFieldCache(grid)
+    assert cache.find_path((0, 0), (2, 2)) is None
+    assert cache.find_path((2, 2), (2, 2)) is None
+    assert cache.find_path((2, 2), (0, 0)) is None
+    assert cache.find_path((6, 0), (0, 0)) is None
+    assert cache.find_path((3, 3), (3, 3)) == [(3, 3)]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+import numpy as np
+
+from astar import AStar
+from grid import Grid
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+def test_wrap_representations_agree():
+    array = random_grid(12, 17, 0.3, seed=0)
+    wrapped = [Grid.wrap(array), Grid.wrap(array.tolist()), Grid.wrap(array.astype(bool)),
+               Grid.wrap(array.astype(np.int64) * 5)]
+    for grid in wrapped:
+        assert (grid.height, grid.width) == (12, 17)
+        assert grid.tolist() == array.tolist()
+        assert len(grid) == 12 and grid[3][4] == array[3, 4]
+    assert Grid.wrap(wrapped[0]) is wrapped[0]
+
+
+def test_wrap_numpy_is_zero_copy():
+    array = np.zeros((5, 6), dtype=np.uint8)
+    grid = Grid.wrap(array)
+    array[2, 3] = 1
+    assert grid[2][3] == 1
+    assert np.shares_memory(grid.to_numpy(), array)
+
+
+def test_buffer_too_small():
+    try:
+        Grid(bytearray(10), 3, 4)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("缓冲区不足时应当报错")
+
+
+def test_padded_border_and_out_of_range():
+    array = random_grid(6, 9, 0.3, seed=1)
+    grid = Grid.wrap(array)
+    pw = grid.pwidth
+    padded = grid.padded
+    for x in range(-1, 7):
+        for y in range(-1, 10):
+            expected = 1 if not (0 <= x < 6 and 0 <= y < 9) else array[x, y]
+            assert padded[(x + 1) * pw + y + 1] == expected
+            assert grid.is_blocked(x, y) == bool(expected)
+
+
+def test_set_cell_updates_derived_data():
+    grid = Grid.wrap(np.zeros((8, 8), dtype=np.uint8))
+    padded = grid.padded
+    version = grid.version
+    grid.set_cell(3, 4, 1)
+    assert grid.version == version + 1
+    assert grid[3][4] == 1
+    assert padded[4 * grid.pwidth + 5] == 1
+    assert grid.obstacle_count() == 1
+
+
+def test_from_file():
+    array = random_grid(10, 14, 0.3, seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'map.raw')
+        with open(path, 'wb') as f:
+            f.write(b'HDR!' + array.tobytes())
+        grid = Grid.from_file(path, 10, 14, offset=4)
+        assert grid.tolist() == array.tolist()
+        engine = AStar(grid)
+        for start, end in random_queries(array, 5, seed=3):
+            path = engine.find_path(start, end)
+            expected = dijkstra_cost(array, start, end)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert engine.path_cost == expected
+        del engine, grid
+
+
+def test_from_file_writable():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'map.raw')
+        with open(path, 'wb') as f:
+            f.write(bytes(4 * 5))
+        grid = Grid.from_file(path, 4, 5, writable=True)
+        grid.set_cell(1, 2, 1)
+        del grid
+        with open(path, 'rb') as f:
+            assert f.read()[1 * 5 + 2] == 1
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from grid import Grid
+from hpa import HierarchicalPathfinder
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+
+
+def check_queries(engine, grid, queries):
+    for start, end in queries:
+        path = engine.find_path(start, end)
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None), (start, end)
+        if path is None:
+            continue
+        assert is_valid_path(grid, path, start, end)
+        # HPA* 不保证最优，但报告的代价必须是返回路径的真实代价
+        assert engine.path_cost == path_cost(path)
+        assert engine.path_cost >= expected
+
+
+def test_paths_valid_and_near_optimal():
+    for seed in range(4):
+        grid = random_grid(48, 40, 0.25, seed=seed)
+        engine = HierarchicalPathfinder(grid, cluster_size=8)
+        check_queries(engine, grid, random_queries(grid, 12, seed=seed + 10))
+
+
+def test_cost_over_octile():
+    # 空旷地图上最优代价等于八方向距离，比值就是实际次优比
+    grid = np.zeros((40, 40), dtype=np.uint8)
+    engine = HierarchicalPathfinder(grid, cluster_size=10)
+    engine.find_path((0, 0), (39, 39))
+    optimal = dijkstra_cost(grid, (0, 0), (39, 39))
+    assert engine.path_cost >= optimal
+    assert abs(engine.cost_over_octile - engine.path_cost / optimal) < 1e-9
+    assert engine.get_stats()['cost_over_octile'] == engine.cost_over_octile
+
+
+def test_parallel_build_matches_serial():
+    grid = random_grid(40, 40, 0.25, seed=7)
+    serial = HierarchicalPathfinder(grid, cluster_size=8)
+    parallel = HierarchicalPathfinder(grid, cluster_size=8, workers=2)
+    assert serial.edges == parallel.edges
+
+
+def test_save_and_load():
+    grid = random_grid(32, 32, 0.25, seed=8)
+    engine = HierarchicalPathfinder(grid, cluster_size=8)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'graph.json')
+        engine.save(path)
+        loaded = HierarchicalPathfinder.load(path, grid)
+        try:
+            HierarchicalPathfinder.load(path, grid[:16])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("尺寸不匹配的抽象图应当被拒绝")
+    assert loaded.edges == engine.edges
+    for start, end in random_queries(grid, 8, seed=9):
+        assert loaded.find_path(start, end) == engine.find_path(start, end)
+
+
+def test_load_rejects_edited_map_and_other_versions():
+    grid = random_grid(32, 32, 0.25, seed=8)
+    engine = HierarchicalPathfinder(grid, cluster_size=8)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'graph.json')
+        engine.save(path)
+        # 尺寸相同、内容不同的地图
+        edited = grid.copy()
+        edited[0, 0] ^= 1
+        with open(path) as f:
+            data = json.load(f)
+        data['version'] = 0
+        old = os.path.join(tmp, 'old.json')
+        with open(old, 'w') as f:
+            json.dump(data, f)
+        for bad in (lambda: HierarchicalPathfinder.load(path, edited),
+                    lambda: HierarchicalPathfinder.load(old, grid)):
+            try:
+                bad()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("指纹或版本不符的抽象图应当被拒绝")
+
+
+def test_unreachable_and_blocked_endpoints():
+    grid = np.zeros((24, 24), dtype=np.uint8)
+    grid[:, 12] = 1
+    engine = HierarchicalPathfinder(grid, cluster_size=8)
+    assert engine.find_path((0, 0), (23, 2)) is not None
+    assert engine.path_length > 0
+    assert engine.find_path((0, 0), (23, 23)) is None
+    # 失败的查询不保留上一次的统计
+    assert (engine.path_length, engine.path_cost, engine.cost_over_octile) == (0, 0, 0)
+    assert engine.find_path((0, 0), (5, 12)) is None
+    assert engine.find_path((5, 12), (0, 0)) is None
+    assert engine.find_path((0, 0), (24, 0)) is None
+
+
+def test_set_cell_rebuilds_graph():
+    grid = Grid.wrap(np.zeros((32, 32), dtype=np.uint8))
+    engine = HierarchicalPathfinder(grid, cluster_size=8)
+    assert engine.find_path((0, 0), (0, 31)) is not None
+    # 在簇边界处砌一道只留一个缺口的墙，原来的入口全部失效
+    for x in range(32):
+        if x != 20:
+            grid.set_cell(x, 8, 1)
+    check_queries(engine, grid, [((0, 0), (0, 31)), ((31, 0), (0, 31))])
+    grid.set_cell(20, 8, 1)
+    assert engine.find_path((0, 0), (0, 31)) is None
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+import numpy as np
+
+from grid import Grid
+from jps import JPS
+from jps_blocks import BlockScanner, CellJumper
+from jps_plus import JPSPlusTables
+from map_format import fingerprint
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+from tiled_grid import TiledGrid
+
+
+def walk(path):
+    """把拐点序列按 Bresenham 直线展开成逐格路径（与 JPS.has_obstacle 的走法相同）"""
+    cells = [tuple(path[0])]
+    for (x0, y0), (x1, y1) in zip(path, path[1:]):
+        dx, dy = abs(x1 - x0), abs(y1 - y0)
+        sx, sy = (1 if x1 > x0 else -1), (1 if y1 > y0 else -1)
+        err = dx - dy
+        while (x0, y0) != (x1, y1):
+            e2 = 2 * err
+            if e2 > -dy:
+                err -= dy
+                x0 += sx
+            if e2 < dx:
+                err += dx
+                y0 += sy
+            cells.append((x0, y0))
+    return cells
+
+
+def check_costs(engine, grid, queries):
+    for start, end in queries:
+        path = engine.find_path(start, end)
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None), (start, end)
+        if path is not None:
+            # 返回的是平滑后的拐点序列：逐格展开后合法，path_cost 就是它的 10/14 代价
+            cells = walk(path)
+            assert is_valid_path(grid, cells, start, end), (start, end)
+            assert engine.path_cost == path_cost(cells) == expected
+            assert engine.path_length == len(path)
+
+
+def test_jps_plus_optimal():
+    for seed in range(6):
+        grid = random_grid(35, 45, 0.3, seed=seed)
+        engine = JPS(grid, tables=JPSPlusTables.build(grid))
+        check_costs(engine, grid, random_queries(grid, 10, seed=seed + 50))
+
+
+def test_tables_shared_between_instances():
+    grid = random_grid(30, 30, 0.25, seed=1)
+    tables = JPSPlusTables.build(grid)
+    a = JPS(grid, tables=tables)
+    b = JPS(Grid.wrap(grid), tables=tables)
+    for start, end in random_queries(grid, 10, seed=2):
+        a.find_path(start, end)
+        b.find_path(start, end)
+        assert a.path_cost == b.path_cost
+
+
+def test_tables_save_and_load():
+    grid = random_grid(20, 30, 0.3, seed=3)
+    tables = JPSPlusTables.build(grid)
+    with tempfile.TemporaryDirectory() as tmp:
+        map_path = os.path.join(tmp, 'map.bin')
+        created = JPSPlusTables.for_map(grid.tolist(), map_path)
+        cached = JPSPlusTables.path_for(map_path, fingerprint(grid))
+        assert os.path.exists(cached)
+        assert np.array_equal(created.tables, tables.tables)
+        loaded = JPSPlusTables.for_map(grid.tolist(), map_path)
+        assert np.array_equal(np.asarray(loaded.tables), tables.tables)
+        try:
+            JPSPlusTables.load(cached, 21, 30)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("尺寸不匹配的表应当被拒绝")
+
+
+def test_tables_rebuilt_after_map_edit():
+    # 尺寸不变、内容改变：旧表不能被复用
+    grid = np.zeros((20, 20), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as tmp:
+        map_path = os.path.join(tmp, 'map.bin')
+        JPSPlusTables.for_map(grid, map_path)
+        grid[:19, 10] = 1
+        engine = JPS(grid, tables=JPSPlusTables.for_map(grid, map_path))
+        engine.find_path((0, 0), (0, 19))
+        assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 19))
+        # 旧地图的表已删除，只保留当前指纹的表
+        assert os.listdir(tmp) == [os.path.basename(JPSPlusTables.path_for(map_path, fingerprint(grid)))]
+
+
+def test_jps_plus_unreachable():
+    grid = np.zeros((10, 10), dtype=np.uint8)
+    grid[:, 5] = 1
+    engine = JPS(grid, tables=JPSPlusTables.build(grid))
+    assert engine.find_path((0, 0), (9, 9)) is None
+    assert engine.find_path((0, 0), (3, 5)) is None
+    assert engine.find_path((4, 4), (4, 4)) == [(4, 4)]
+
+
+def test_block_scanner_matches_tables():
+    for seed in range(3):
+        grid = random_grid(17, 23, 0.3, seed=seed)
+        tables = JPSPlusTables.build(grid)
+        scanner = BlockScanner(grid)
+        goals = [(0, 0), (8, 11), (16, 22), (3, 19)]
+        for x in range(17):
+            for y in range(23):
+                if grid[x, y]:
+                    continue
+                for direction in range(8):
+                    for gx, gy in goals:
+                        assert scanner.jump(x, y, direction, gx, gy) == tables.jump(x, y, direction, gx, gy)
+        assert scanner.scans > 0
+
+
+def test_cell_jumper_matches_tables():
+    grid = random_grid(17, 23, 0.3, seed=4)
+    tables = JPSPlusTables.build(grid)
+    jumper = CellJumper(grid)
+    for x in range(17):
+        for y in range(23):
+            if grid[x, y]:
+                continue
+            for direction in range(8):
+                for gx, gy in ((0, 0), (8, 11), (16, 22), (3, 19)):
+                    assert jumper.jump(x, y, direction, gx, gy) == tables.jump(x, y, direction, gx, gy)
+    assert jumper.steps > 0
+
+
+def test_fallback_without_dense_buffer():
+    grid = random_grid(30, 30, 0.3, seed=5)
+    check_costs(JPS(grid, tables=CellJumper(grid)), grid, random_queries(grid, 10, seed=6))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'world.tiles')
+        with TiledGrid.create(path, 30, 30, 8, source=grid) as tiled:
+            # 分块地图没有整块缓冲区：位扫描器明确报错，JPS 自动改用逐格跳跃
+            try:
+                BlockScanner(tiled)
+            except TypeError:
+                pass
+            else:
+                raise AssertionError("位扫描器应当拒绝分块地图")
+            engine = JPS(tiled)
+            assert isinstance(engine.tables, CellJumper)
+            check_costs(engine, grid, random_queries(grid, 10, seed=7))
+
+
+def test_default_jps_optimal():
+    for seed in range(6):
+        grid = random_grid(40, 40, 0.3, seed=seed)
+        engine = JPS(grid)
+        assert isinstance(engine.tables, BlockScanner)
+        check_costs(engine, grid, random_queries(grid, 10, seed=seed + 70))
+
+
+def test_long_corridor():
+    # 旧的递归跳跃在长走廊上会触发递归深度 / 迭代次数上限
+    grid = np.zeros((3, 5000), dtype=np.uint8)
+    grid[1, 1:4999] = 1
+    engine = JPS(grid)
+    path = engine.find_path((1, 0), (1, 4999))
+    assert path is not None
+    assert engine.path_cost == dijkstra_cost(grid, (1, 0), (1, 4999))
+
+
+def test_set_cell_rebuilds_jumper():
+    grid = Grid.wrap(np.zeros((20, 20), dtype=np.uint8))
+    for x in range(19):
+        grid.set_cell(x, 10, 1)
+    for tables in (None, JPSPlusTables.build(grid)):
+        engine = JPS(grid, tables=tables)
+        engine.find_path((0, 0), (0, 19))
+        assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 19))
+        grid.set_cell(5, 10, 0)
+        check_costs(engine, grid, [((0, 0), (0, 19)), ((19, 0), (0, 19))])
+        grid.set_cell(5, 10, 1)
+        check_costs(engine, grid, [((0, 0), (0, 19)), ((19, 0), (0, 19))])
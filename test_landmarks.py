@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from grid import Grid
+from landmarks import UNREACHABLE, LandmarkHeuristic, distance_field
+from map_generators import random_grid as maze_like
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+def test_distance_field_matches_dijkstra():
+    grid = Grid.wrap(random_grid(15, 15, 0.3, seed=0))
+    pw = grid.pwidth
+    source = next((x, y) for x in range(15) for y in range(15) if not grid.is_blocked(x, y))
+    dist = distance_field(grid.padded, pw, (source[0] + 1) * pw + source[1] + 1)
+    for x in range(15):
+        for y in range(15):
+            expected = dijkstra_cost(grid, source, (x, y))
+            value = dist[(x + 1) * pw + y + 1]
+            assert value == (UNREACHABLE if expected is None else expected)
+
+
+def test_heuristic_is_admissible():
+    grid = random_grid(25, 25, 0.3, seed=1)
+    heuristic = LandmarkHeuristic(grid, k=4, seed=1)
+    pw = heuristic._pwidth
+    for start, end in random_queries(grid, 5, seed=2):
+        h = heuristic.bind(end, start)
+        for x in range(25):
+            expected = dijkstra_cost(grid, (x, 3), end)
+            if expected is not None:
+                assert h((x + 1) * pw + 4) <= expected
+
+
+def test_engines_stay_optimal():
+    grid = maze_like(40, 40, 0.3, seed=3)
+    for selection in ('farthest', 'random'):
+        heuristic = LandmarkHeuristic(grid, k=6, selection=selection, seed=3)
+        assert len(heuristic.landmarks) == 6
+        assert heuristic.memory_bytes == 6 * 4 * len(Grid.wrap(grid).padded)
+        engines = [AStar(grid, flat=True, heuristic=heuristic),
+                   AStar(grid, heuristic=heuristic),
+                   BidirectionalAStar(grid, balanced=True, heuristic=heuristic)]
+        limited = LandmarkHeuristic(grid, k=6, active=2, seed=3)
+        engines.append(AStar(grid, flat=True, heuristic=limited))
+        for start, end in random_queries(grid, 10, seed=4):
+            expected = dijkstra_cost(grid, start, end)
+            for engine in engines:
+                path = engine.find_path(start, end)
+                assert (path is None) == (expected is None)
+                if path is not None:
+                    assert engine.path_cost == expected
+
+
+def test_fewer_expansions_than_octile():
+    grid = maze_like(60, 60, 0.3, seed=5)
+    plain = AStar(grid, flat=True)
+    alt = AStar(grid, flat=True, heuristic=LandmarkHeuristic(grid, k=8, seed=5))
+    total_plain = total_alt = 0
+    for start, end in random_queries(grid, 10, seed=6):
+        plain.find_path(start, end)
+        alt.find_path(start, end)
+        total_plain += plain.nodes_explored
+        total_alt += alt.nodes_explored
+    assert total_alt < total_plain
+
+
+def test_set_cell_recomputes_distances():
+    grid = Grid.wrap(np.zeros((20, 20), dtype=np.uint8))
+    for x in range(19):
+        grid.set_cell(x, 10, 1)
+    heuristic = LandmarkHeuristic(grid, k=4, seed=0)
+    engine = AStar(grid, flat=True, heuristic=heuristic)
+    engine.find_path((0, 0), (0, 19))
+    assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 19))
+    # 打通墙后旧距离表会高估，必须重算
+    grid.set_cell(5, 10, 0)
+    engine.find_path((0, 0), (0, 19))
+    assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 19))
+    grid.set_cell(5, 10, 1)
+    grid.set_cell(19, 10, 1)
+    assert engine.find_path((0, 0), (0, 19)) is None
+
+
+def test_landmark_in_every_component():
+    # 一道墙把地图分成大小两块，小的一块也要有地标，否则其中的查询只能用八方向距离
+    grid = maze_like(40, 40, 0.2, seed=7)
+    grid[:, 30] = 1
+    labels = Grid.wrap(grid).components()
+    sides = {labels.label((x, y)) for x in range(40) for y in (0, 39) if not grid[x, y]}
+    for selection in ('farthest', 'random'):
+        heuristic = LandmarkHeuristic(grid, k=4, selection=selection, seed=7)
+        found = {labels.label(pos) for pos in heuristic.landmark_positions()}
+        assert sides <= found
+        engine = AStar(grid, flat=True, heuristic=heuristic)
+        for start, end in random_queries(grid, 10, seed=8):
+            expected = dijkstra_cost(grid, start, end)
+            assert (engine.find_path(start, end) is None) == (expected is None)
+            if expected is not None:
+                assert engine.path_cost == expected
+
+
+def test_unknown_selection():
+    try:
+        LandmarkHeuristic(np.zeros((4, 4), dtype=np.uint8), selection='best')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的选择方式应当报错")
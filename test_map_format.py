@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import tempfile
+from functools import partial
+
+import numpy as np
+
+import map_format
+from astar import AStar
+from async_planner import AsyncPlanner
+from grid import Grid
+from jps import JPS
+from jps_plus import JPSPlusTables
+from map_format import MapFormatError, fingerprint, load_map, save_map
+from reference import dijkstra_cost, is_valid_path, random_grid, random_queries
+
+
+def saved(grid, **kwargs):
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, 'map.fpm')
+    digest = save_map(path, grid, **kwargs)
+    return tmp, path, digest
+
+
+def test_round_trip_with_sections():
+    grid = random_grid(37, 29, 0.3, seed=0)
+    tmp, path, digest = saved(grid, components=(False, True), jump_tables=True, abstract_graph=8)
+    with tmp, load_map(path, verify=True) as m:
+        assert (m.height, m.width) == (37, 29)
+        assert m.grid().tolist() == grid.tolist()
+        assert digest == m.fingerprint == fingerprint(grid)
+        for diagonal in (False, True):
+            fresh = Grid.wrap(grid).components(diagonal)
+            loaded = m.component_index(diagonal)
+            assert loaded is m.grid()._components[diagonal]
+            for start, end in random_queries(grid, 20, seed=diagonal):
+                assert loaded.connected(start, end) == fresh.connected(start, end)
+        assert np.array_equal(np.asarray(m.jump_tables().tables), JPSPlusTables.build(grid).tables)
+
+        engine = JPS(m.grid(), tables=m.jump_tables())
+        hpa = m.abstract_graph()
+        for start, end in random_queries(grid, 10, seed=2):
+            expected = dijkstra_cost(grid, start, end)
+            path_jps = engine.find_path(start, end)
+            path_hpa = hpa.find_path(start, end)
+            assert (path_jps is None) == (path_hpa is None) == (expected is None)
+            if expected is not None:
+                assert engine.path_cost == expected
+                assert is_valid_path(grid, path_hpa, start, end)
+        # 跳点表直接引用映射内容，关闭前先释放
+        del engine
+
+
+def test_grid_only_and_fingerprint():
+    grid = random_grid(9, 70, 0.4, seed=3)
+    tmp, path, digest = saved(grid)
+    with tmp, load_map(path) as m:
+        assert m.component_index() is None and m.jump_tables() is None and m.abstract_graph() is None
+        assert m.grid().tolist() == grid.tolist()
+    changed = grid.copy()
+    changed[4, 4] ^= 1
+    assert fingerprint(changed) != digest
+    # 尺寸也参与指纹
+    assert fingerprint(np.zeros((4, 6), dtype=np.uint8)) != fingerprint(np.zeros((6, 4), dtype=np.uint8))
+
+
+def test_set_cell_on_mapped_grid_does_not_touch_file():
+    grid = np.zeros((12, 12), dtype=np.uint8)
+    grid[:, 6] = 1
+    tmp, path, _ = saved(grid, components=(False,))
+    with tmp:
+        with load_map(path) as m:
+            g = m.grid()
+            assert not g.components().connected((0, 0), (0, 11))
+            g.set_cell(3, 6, 0)
+            assert g.components().connected((0, 0), (0, 11))
+            engine = AStar(g, flat=True)
+            assert engine.find_path((0, 0), (0, 11)) is not None
+        with load_map(path, verify=True) as reopened:
+            assert not reopened.component_index().connected((0, 0), (0, 11))
+
+
+def corrupt(path, offset):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xff]))
+
+
+def expect_error(path, verify=False):
+    try:
+        load_map(path, verify)
+    except MapFormatError:
+        pass
+    else:
+        raise AssertionError("损坏的文件应当被拒绝")
+
+
+def test_corruption_detected():
+    grid = random_grid(20, 20, 0.3, seed=4)
+    tmp, path, _ = saved(grid, components=(False,), jump_tables=True)
+    with tmp:
+        with load_map(path) as m:
+            grid_offset = m.sections[map_format.GRID][1]
+            table_offset = m.sections[map_format.JUMP_TABLES][1]
+        with open(path, 'rb') as f:
+            original = f.read()
+
+        corrupt(path, grid_offset)
+        expect_error(path)
+        with open(path, 'wb') as f:
+            f.write(original)
+        corrupt(path, 20)  # 文件头中的尺寸
+        expect_error(path)
+        with open(path, 'wb') as f:
+            f.write(original)
+        corrupt(path, 0)  # 魔数
+        expect_error(path)
+
+        # 派生数据段只在 verify=True 时校验
+        with open(path, 'wb') as f:
+            f.write(original)
+        corrupt(path, table_offset + 5)
+        load_map(path).close()
+        expect_error(path, verify=True)
+
+        with open(path, 'wb') as f:
+            f.write(original[:map_format.HEADER.size - 1])
+        expect_error(path)
+
+
+def test_close_releases_mapping():
+    grid = np.zeros((12, 12), dtype=np.uint8)
+    grid[:, 6] = 1
+    tmp, path, _ = saved(grid, components=(False,), jump_tables=True)
+    with tmp:
+        m = load_map(path)
+        g = m.grid()
+        tables = m.jump_tables()
+        # 跳点表仍引用映射内容时拒绝关闭，释放后可以再次关闭
+        try:
+            m.close()
+        except BufferError:
+            pass
+        else:
+            raise AssertionError("跳点表仍在使用时不能解除映射")
+        assert not m.closed and tables.tables.shape == (8, 144)
+        del tables
+        m.close()
+        m.close()
+        assert m.closed
+        try:
+            m.jump_tables()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("关闭后不能再读取段")
+        # 连通分量标号在关闭时拷贝到内存，Grid 仍可使用和修改
+        assert not g.components().connected((0, 0), (0, 11))
+        g.set_cell(11, 6, 0)
+        assert g.components().connected((0, 0), (0, 11))
+
+
+def test_async_planner_from_map_file():
+    grid = random_grid(20, 20, 0.25, seed=5)
+    queries = random_queries(grid, 4, seed=6)
+    tmp, path, _ = saved(grid, components=(False,))
+    with tmp:
+        async def main():
+            async with AsyncPlanner(None, engine_factory=partial(AStar, flat=True), executor='process',
+                                    max_workers=1, map_path=path) as planner:
+                return await asyncio.gather(*(planner.find_path(s, e) for s, e in queries))
+        paths = asyncio.run(main())
+    for path_found, (start, end) in zip(paths, queries):
+        expected = dijkstra_cost(grid, start, end)
+        assert (path_found is None) == (expected is None)
+        if expected is not None:
+            assert is_valid_path(grid, path_found, start, end)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import random
+
+import numpy as np
+
+import map_generators
+from common import generate_random_grid
+from components import ComponentIndex
+from grid import Grid
+
+
+def component_count(grid):
+    return ComponentIndex(Grid.wrap(grid)).count
+
+
+def test_generate_random_grid_returns_lists():
+    grid = generate_random_grid((30, 20), 0.3, seed=5)
+    assert isinstance(grid, list) and isinstance(grid[0], list)
+    assert len(grid) == 20 and len(grid[0]) == 30
+    assert all(cell in (0, 1) for row in grid for cell in row)
+    assert grid[0][0] == 0 and grid[19][29] == 0
+    assert component_count(grid) == 1
+
+
+def test_generate_random_grid_reproducible():
+    random.seed(7)
+    a = generate_random_grid((25, 25), 0.25)
+    random.seed(7)
+    b = generate_random_grid((25, 25), 0.25)
+    assert a == b
+
+
+def test_random_grid_connected():
+    for seed in range(10):
+        grid = map_generators.random_grid(40, 50, 0.35, seed=seed)
+        assert grid.shape == (40, 50) and grid.dtype == np.uint8
+        assert grid[0, 0] == 0 and grid[39, 49] == 0
+        assert component_count(grid) == 1
+
+
+def test_random_grid_keeps_endpoints_without_filling():
+    endpoints = [(3, 4), (30, 30)]
+    grid = map_generators.random_grid(32, 32, 0.45, seed=2, endpoints=endpoints, fill_isolated=False)
+    index = ComponentIndex(Grid.wrap(grid))
+    assert index.connected(*endpoints)
+
+
+def test_sparse_map_connected():
+    for boundary in ('circle', 'irregular'):
+        for seed in range(5):
+            grid = map_generators.sparse_map(80, 15, boundary, seed=seed)
+            assert component_count(grid) == 1
+            assert (grid == 0).sum() > 0
+
+
+def test_sparse_map_seeded():
+    a = map_generators.sparse_map(60, 10, seed=3)
+    b = map_generators.sparse_map(60, 10, seed=3)
+    assert np.array_equal(a, b)
+
+
+def test_create_large_sparse_map_matches_sparse_map():
+    grid = map_generators.create_large_sparse_map(60, 10, 'irregular', seed=5)
+    assert np.array_equal(grid, map_generators.sparse_map(60, 10, 'irregular', seed=5))
+    assert component_count(grid) == 1
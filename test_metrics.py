@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import logging
+import os
+import tempfile
+
+import metrics
+from astar import AStar
+from hpa import HierarchicalPathfinder
+from jps import JPS
+from path_cache import PathCache
+from reference import random_grid, random_queries
+
+
+def test_histogram_buckets():
+    previous = -1
+    for value in range(5000):
+        index = metrics._bucket_index(value)
+        upper = metrics._bucket_upper(index)
+        # 值落在 (上一个桶的上界, 本桶上界] 内，相对误差不超过 25%
+        assert value <= upper <= max(value, 1) * 1.25 + 1
+        if index > 0:
+            assert metrics._bucket_upper(index - 1) < value
+        assert index >= previous
+        previous = index
+
+
+def test_histogram_percentiles():
+    histogram = metrics.Histogram()
+    values = list(range(1000, 101000, 1000))
+    for value in values:
+        histogram.observe(value)
+    for q in (50, 95, 99):
+        exact = values[int(q / 100 * len(values)) - 1]
+        assert exact <= histogram.percentile(q) <= exact * 1.25
+    data = histogram.to_dict()
+    assert data['count'] == 100 and data['min_ns'] == 1000 and data['max_ns'] == 100000
+    assert sum(data['buckets'].values()) == 100
+    assert metrics.Histogram().percentile(50) == 0
+
+
+def test_disabled_by_default():
+    assert not metrics.get_metrics().enabled
+    grid = random_grid(20, 20, 0.2, seed=0)
+    engine = AStar(grid, flat=True)
+    engine.find_path(*random_queries(grid, 1, seed=1)[0])
+    assert metrics.get_metrics().snapshot() == {'counters': {}, 'timers': {}, 'histograms': {}}
+    assert metrics.phase('search') is metrics.phase('smooth')
+
+
+def test_engine_counters_and_phases():
+    grid = random_grid(30, 30, 0.25, seed=2)
+    queries = random_queries(grid, 10, seed=3) + [((0, 0), (30, 30))]
+    with metrics.use_metrics() as m:
+        engine = AStar(grid, flat=True)
+        expansions = pushes = found = 0
+        for start, end in queries:
+            found += engine.find_path(start, end) is not None
+            expansions += engine.nodes_explored
+            pushes += engine.heap_pushes
+        jps = JPS(grid)
+        jps.find_path(*queries[0])
+    assert not metrics.get_metrics().enabled
+    snapshot = m.snapshot()
+    counters = snapshot['counters']['astar']
+    assert counters['queries'] == len(queries)
+    assert counters['failures'] == len(queries) - found
+    assert counters['expansions'] == expansions
+    assert counters['heap_pushes'] == pushes
+    timers = snapshot['timers']['astar']
+    assert timers['search']['count'] == len(queries)
+    assert timers['reconstruct']['count'] == found
+    assert snapshot['histograms']['astar']['query']['count'] == len(queries)
+    # JPS 构造时的位打包记为预处理，查询时有平滑阶段
+    assert 'preprocess' in snapshot['timers']['jps_blocks']
+    assert 'smooth' in snapshot['timers']['jps']
+
+
+def test_cache_counters_and_nested_queries():
+    grid = random_grid(32, 32, 0.2, seed=4)
+    start, end = random_queries(grid, 1, seed=5)[0]
+    with metrics.use_metrics() as m:
+        cache = PathCache(AStar(grid, flat=True))
+        cache.metrics_name = 'cached'
+        for _ in range(3):
+            cache.find_path(start, end)
+        hpa = HierarchicalPathfinder(grid, cluster_size=8)
+        hpa.find_path((0, 0), (31, 31))
+    counters = m.snapshot()['counters']
+    assert counters['cached']['cache_misses'] == 1
+    assert counters['cached']['cache_hits'] == 2
+    assert counters['cached']['queries'] == 3
+    # 缓存和 HPA 内部调用的 AStar 计入外层查询，不单独记录
+    assert 'astar' not in counters
+    assert counters['hpa']['queries'] == 1
+
+
+def test_exporters():
+    m = metrics.Metrics()
+    m.count('expansions', 5, engine='astar')
+    m.observe('query', 2000, engine='astar')
+    m.add_time('search', 3000, engine='astar')
+
+    stream = io.StringIO()
+    m.add_exporter(metrics.JsonLinesExporter(stream))
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    logger = logging.getLogger('test_metrics')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    m.add_exporter(metrics.LoggingExporter(logger))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'findpath.prom')
+        m.add_exporter(metrics.PrometheusFileExporter(path))
+        snapshot = m.export()
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    logger.removeHandler(handler)
+
+    line = json.loads(stream.getvalue())
+    assert line['counters'] == snapshot['counters'] == {'astar': {'expansions': 5}}
+    assert 'findpath_expansions_total{engine="astar"} 5' in text
+    assert 'findpath_query_seconds_count{engine="astar"} 1' in text
+    assert 'findpath_phase_seconds_total{engine="astar",phase="search"} 0.000003000' in text
+    assert len(records) == 1 and 'expansions=5' in records[0].getMessage()
+
+    m.reset()
+    assert m.snapshot() == {'counters': {}, 'timers': {}, 'histograms': {}}
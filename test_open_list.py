@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import random
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from grid import Grid
+from jps import JPS
+from open_list import BucketOpenList, HeapOpenList, make_open_list
+from reference import dijkstra_cost, is_valid_path, random_grid, random_queries
+
+
+def expect(error, fn):
+    try:
+        fn()
+    except error:
+        pass
+    else:
+        raise AssertionError(f"应当抛出 {error.__name__}")
+
+
+def test_matches_reference_under_random_operations():
+    rng = random.Random(0)
+    for kind in (HeapOpenList, BucketOpenList):
+        queue = kind()
+        keys = {}  # 参考实现：下标 -> 当前键
+        for _ in range(3000):
+            if keys and rng.random() < 0.4:
+                smallest = min(keys.values())
+                assert queue.min_key() == smallest
+                index = queue.pop()
+                assert keys.pop(index) == smallest
+            else:
+                index = rng.randrange(200)
+                key = rng.randrange(1000)
+                accepted = queue.push(index, key)
+                assert accepted == (index not in keys or key < keys[index])
+                if accepted:
+                    keys[index] = key
+            assert len(queue) == len(keys)
+        while keys:
+            index = queue.pop()
+            assert keys[index] == min(keys.values())
+            del keys[index]
+        assert queue.min_key() is None
+        expect(IndexError, queue.pop)
+
+
+def test_counters_and_clear():
+    for kind in ('heap', 'bucket'):
+        queue = make_open_list(kind)
+        queue.push(1, 50)
+        queue.push(1, 60)  # 不更优，丢弃
+        queue.push(1, 40)  # 降低键
+        queue.push(2, 45)
+        stats = queue.get_stats()
+        assert (stats['pushes'], stats['decrease_keys'], stats['duplicates_suppressed']) == (3, 1, 1)
+        assert queue.pop() == 1 and queue.pop() == 2
+        if kind == 'heap':
+            # 降低键后旧条目留在堆里，弹出时跳过
+            queue.push(3, 99)
+            assert queue.pop() == 3 and queue.stale_pops == 1
+        queue.clear()
+        assert len(queue) == 0 and queue.get_stats()['pushes'] == 0
+
+
+def test_bucket_order_within_key_and_cursor_rewind():
+    queue = BucketOpenList()
+    for index in (1, 2, 3):
+        queue.push(index, 10)
+    # 同一桶内后进先出
+    assert queue.pop() == 3
+    queue.push(7, 30)
+    assert queue.pop() == 2 and queue.pop() == 1
+    # 键小于游标时游标回退
+    queue.push(8, 5)
+    assert queue.min_key() == 5 and queue.pop() == 8 and queue.pop() == 7
+
+
+def test_make_open_list():
+    assert isinstance(make_open_list('heap'), HeapOpenList)
+    assert isinstance(make_open_list(BucketOpenList), BucketOpenList)
+    expect(ValueError, lambda: make_open_list('radix'))
+    expect(TypeError, lambda: make_open_list(3))
+    expect(ValueError, lambda: AStar([[0]], any_angle='theta', open_list='bucket'))
+    expect(ValueError, lambda: BidirectionalAStar([[0]], balanced=True, open_list='heap'))
+
+
+def test_engines_with_open_lists():
+    grid = random_grid(30, 30, 0.3, seed=1)
+    queries = random_queries(grid, 15, seed=2)
+    for kind in ('heap', 'bucket'):
+        optimal = [AStar(grid, open_list=kind), JPS(grid, open_list=kind)]
+        bidirectional = BidirectionalAStar(grid, open_list=kind)
+        for start, end in queries:
+            expected = dijkstra_cost(grid, start, end)
+            for engine in optimal:
+                path = engine.find_path(start, end)
+                assert (path is None) == (expected is None)
+                if path is not None:
+                    assert engine.path_cost == expected
+                    assert engine.heap_pushes >= engine.nodes_explored
+            # 交替双向搜索不保证最优，只检查路径合法
+            path = bidirectional.find_path(start, end)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert is_valid_path(grid, path, start, end)
+
+
+def test_open_list_engines_see_set_cell():
+    grid = Grid.wrap([[0] * 12 for _ in range(12)])
+    engines = [AStar(grid, open_list='bucket'), JPS(grid, open_list='bucket')]
+    for x in range(11):
+        grid.set_cell(x, 6, 1)
+    for engine in engines:
+        engine.find_path((0, 0), (0, 11))
+        assert engine.path_cost == dijkstra_cost(grid, (0, 0), (0, 11))
+    grid.set_cell(11, 6, 1)
+    for engine in engines:
+        assert engine.find_path((0, 0), (0, 11)) is None
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import math
+
+from astar import AStar
+from grid import Grid
+from path_cache import PathCache
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+def test_hits_match_engine():
+    grid = Grid.wrap(random_grid(40, 40, 0.25, seed=1))
+    cache = PathCache(AStar(grid, flat=True))
+    for start, end in random_queries(grid, 30, seed=2):
+        path = cache.find_path(start, end)
+        cost = cache.path_cost
+        expected = dijkstra_cost(grid, start, end)
+        assert (path is None) == (expected is None)
+        if path is not None:
+            assert cost == expected
+        # 第二次查询命中缓存，结果和统计都一样
+        hits = cache.hits
+        assert cache.find_path(start, end) == path
+        assert cache.hits == hits + 1
+        assert cache.path_cost == (cost if path is not None else 0)
+        assert cache.path_length == (len(path) if path else 0)
+
+
+def test_subpath_hit_cost():
+    grid = [[0] * 30 for _ in range(30)]
+    cache = PathCache(AStar(grid, flat=True))
+    path = cache.find_path((0, 0), (29, 20))
+    start = path[5]
+    suffix = cache.find_path(start, (29, 20))
+    assert cache.subpath_hits == 1
+    assert suffix == path[5:]
+    assert cache.path_cost == dijkstra_cost(grid, start, (29, 20))
+
+
+def test_unreachable_hit_resets_stats():
+    grid = [[0] * 10 for _ in range(10)]
+    for i in range(10):
+        grid[i][5] = 1
+    cache = PathCache(AStar(grid, flat=True))
+    assert cache.find_path((0, 0), (9, 9)) is None
+    assert cache.find_path((0, 0), (9, 4)) is not None
+    assert cache.path_cost > 0
+    # 命中缓存中的"不可达"条目时不能沿用上一次查询的统计
+    assert cache.find_path((0, 0), (9, 9)) is None
+    assert cache.path_length == 0
+    assert cache.path_cost == 0
+
+
+def test_any_angle_hit_cost_matches_miss():
+    grid = Grid.wrap(random_grid(30, 30, 0.2, seed=3))
+    for mode in ('theta', 'lazy'):
+        cache = PathCache(AStar(grid, any_angle=mode))
+        for start, end in random_queries(grid, 10, seed=4):
+            path = cache.find_path(start, end)
+            if path is None:
+                continue
+            miss_cost = cache.path_cost
+            assert cache.find_path(start, end) == path
+            assert cache.path_cost == miss_cost
+            if len(path) > 2:
+                # 从中间拐点出发的子路径代价按欧氏距离累计
+                suffix = cache.find_path(path[1], end)
+                assert suffix == path[1:]
+                expected = sum(10 * math.hypot(x1 - x0, y1 - y0)
+                               for (x0, y0), (x1, y1) in zip(suffix, suffix[1:]))
+                assert abs(cache.path_cost - expected) < 1e-6
+
+
+def test_set_cell_invalidates():
+    grid = Grid.wrap([[0] * 10 for _ in range(10)])
+    cache = PathCache(AStar(grid, flat=True))
+    path = cache.find_path((0, 0), (0, 9))
+    assert cache.path_cost == 90
+    grid.set_cell(0, 4, 1)
+    assert cache.find_path((0, 0), (0, 9)) != path
+    assert cache.invalidations == 1
+    assert cache.path_cost == dijkstra_cost(grid, (0, 0), (0, 9))
+    assert len(cache) == 1
@@ -1,59 +1,10 @@
-import numpy as np
 import time
-from astar import AStar
-from jps import JPS
-from visibility_graph import VisibilityGraph
-import matplotlib.pyplot as plt
-from collections import defaultdict
-
-def create_large_sparse_map(size=100, num_obstacles=10, boundary_type="circle"):
-    """创建大型稀疏地图"""
-    grid = np.zeros((size, size), dtype=int)
-    
-    # 创建边界
-    center = size // 2
-    if boundary_type == "circle":
-        radius = size * 0.45  # 地图45%大小的圆形边界
-        for i in range(size):
-            for j in range(size):
-                if (i - center) ** 2 + (j - center) ** 2 > radius ** 2:
-                    grid[i, j] = 1
-    elif boundary_type == "irregular":
-        # 创建不规则边界
-        from scipy.spatial import ConvexHull
-        points = np.random.rand(8, 2) * size
-        hull = ConvexHull(points)
-        for i in range(size):
-            for j in range(size):
-                if not point_in_hull((i, j), points[hull.vertices]):
-                    grid[i, j] = 1
-    
-    # 添加随机障碍物
-    obstacles_added = 0
-    while obstacles_added < num_obstacles:
-        x = np.random.randint(size)
-        y = np.random.randint(size)
-        if grid[x, y] == 0:  # 如果位置为空
-            # 添加3x3的障碍物
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    new_x, new_y = x + dx, y + dy
-                    if 0 <= new_x < size and 0 <= new_y < size:
-                        grid[new_x, new_y] = 1
-            obstacles_added += 1
-    
-    return grid
+import map_generators
+import scenario_runner
 
 def point_in_hull(point, hull_points):
-    """检查点是否在凸包内"""
-    def is_left(p0, p1, p2):
-        return (p1[0] - p0[0]) * (p2[1] - p0[1]) - (p2[0] - p0[0]) * (p1[1] - p0[1])
-    
-    n = len(hull_points)
-    for i in range(n):
-        if is_left(hull_points[i], hull_points[(i+1)%n], point) < 0:
-            return False
-    return True
+    """检查点是否在凸包内（point 的两个坐标也可以是数组，一次判断多个点）"""
+    return map_generators.points_in_hull(point[0], point[1], hull_points)
 
 def run_pathfinding_test(grid, start, end, algorithm_name, algorithm):
     """运行单次寻路测试"""
@@ -68,64 +19,35 @@ def run_pathfinding_test(grid, start, end, algorithm_name, algorithm):
         'success': path is not None
     }
 
-def test_pathfinding(num_tests=50):
-    """运行多次测试并统计结果"""
-    # 测试配置
-    configs = [
-        {'size': 100, 'obstacles': 5, 'name': '稀疏地图(100x100,5障碍)'},
-        {'size': 100, 'obstacles': 20, 'name': '密集地图(100x100,20障碍)'},
-        {'size': 200, 'obstacles': 10, 'name': '大地图(200x200,10障碍)'},
-    ]
-    
-    # 存储结果
-    results = defaultdict(lambda: defaultdict(list))
-    
-    for config in configs:
-        print(f"\n测试场景: {config['name']}")
-        print("-" * 80)
-        print(f"{'算法':<15} | {'平均时间(ms)':<12} | {'最短时间':<10} | {'最长时间':<10} | "
-              f"{'平均节点':<10} | {'平均路径':<10} | {'成功率':<8}")
-        print("-" * 80)
-        
-        for _ in range(num_tests):
-            # 创建地图
-            grid = create_large_sparse_map(config['size'], config['obstacles'])
-            
-            # 生成起终点
-            def get_valid_point():
-                while True:
-                    x = np.random.randint(config['size'])
-                    y = np.random.randint(config['size'])
-                    if grid[x, y] == 0:
-                        return (x, y)
-            
-            start = get_valid_point()
-            end = get_valid_point()
-            
-            # 测试每个算法
-            algorithms = {
-                'A*': AStar(grid.tolist()),
-                'JPS': JPS(grid.tolist()),
-                'Visibility': VisibilityGraph(grid.tolist())
-            }
-            
-            for alg_name, alg in algorithms.items():
-                result = run_pathfinding_test(grid, start, end, alg_name, alg)
-                for key, value in result.items():
-                    results[config['name']][f"{alg_name}_{key}"].append(value)
-        
-        # 输出该配置下的统计结果
-        for alg_name in ['A*', 'JPS', 'Visibility']:
-            times = results[config['name']][f"{alg_name}_time"]
-            nodes = results[config['name']][f"{alg_name}_nodes"]
-            paths = results[config['name']][f"{alg_name}_path_length"]
-            successes = results[config['name']][f"{alg_name}_success"]
-            
-            success_rate = sum(successes) / len(successes) * 100
-            
-            print(f"{alg_name:<15} | {np.mean(times):>11.2f} | {min(times):>9.2f} | "
-                  f"{max(times):>9.2f} | {np.mean(nodes):>9.1f} | "
-                  f"{np.mean(paths):>9.1f} | {success_rate:>7.1f}%")
+def run_pathfinding_suite(num_tests=50, workers=None, seed=0, configs=None, report=True):
+    """运行多次测试并统计结果，返回 scenario_runner.summarize 的汇总
+
+    场景分发到进程池并行执行（workers=1 时在当前进程内串行），地图放在共享内存中，
+    每个场景的地图和起终点由 (seed, 配置, 场景序号) 决定，结果与工作进程数无关。
+    地图保证连通，A* 和 JPS 必须全部找到路径。
+    完整规模耗时较长，不作为 pytest 用例收集，直接运行本文件执行。
+    """
+    results = scenario_runner.run_scenarios(configs, num_tests, workers=workers, seed=seed)
+    summary = scenario_runner.summarize(results)
+    if report:
+        scenario_runner.print_summary(summary)
+    for config_name, rows in summary.items():
+        for algorithm_name in ('A*', 'JPS'):
+            assert rows[algorithm_name]['success_rate'] == 100, (config_name, algorithm_name)
+    return summary
+
+def without_time(summary):
+    return {config_name: {algorithm_name: {key: value for key, value in row.items() if not key.endswith('_time')}
+                          for algorithm_name, row in rows.items()}
+            for config_name, rows in summary.items()}
+
+def test_suite_independent_of_workers():
+    """小规模跑一遍完整流程：串行和两个工作进程的结果（除耗时外）相同"""
+    configs = [{'size': 40, 'obstacles': 3, 'name': 'small'}]
+    serial = run_pathfinding_suite(num_tests=3, workers=1, configs=configs, report=False)
+    parallel = run_pathfinding_suite(num_tests=3, workers=2, configs=configs, report=False)
+    assert without_time(serial) == without_time(parallel)
+    assert serial['small']['A*']['mean_path_length'] > 0
 
 if __name__ == "__main__":
-    test_pathfinding() 
\ No newline at end of file
+    run_pathfinding_suite() 
\ No newline at end of file
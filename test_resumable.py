@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from grid import Grid
+from jps import JPS
+from reference import dijkstra_cost, random_grid, random_queries
+
+
+def engines(grid):
+    return [AStar(grid), BidirectionalAStar(grid, balanced=True), JPS(grid)]
+
+
+def test_stepped_searches_optimal():
+    grid = random_grid(30, 30, 0.3, seed=0)
+    for engine in engines(grid):
+        for start, end in random_queries(grid, 8, seed=1):
+            search = engine.start_search(start, end)
+            steps = 0
+            while not search.step(3):
+                steps += 1
+            expected = dijkstra_cost(grid, start, end)
+            assert (search.path is None) == (expected is None)
+            if expected is not None:
+                assert search.path[0] == start and search.path[-1] == end
+                assert search.path_cost == expected
+                assert search.steps_taken == steps + 1
+            # 结束后再推进不改变结果
+            assert search.step() and search.path_cost == (expected or 0)
+
+
+def test_interleaved_searches_share_engine():
+    grid = random_grid(30, 30, 0.25, seed=2)
+    queries = random_queries(grid, 6, seed=3)
+    for engine in engines(grid):
+        searches = [engine.start_search(start, end) for start, end in queries]
+        # 轮流各推进一步，互不干扰
+        while not all(search.done for search in searches):
+            for search in searches:
+                search.step(1)
+        for search, (start, end) in zip(searches, queries):
+            expected = dijkstra_cost(grid, start, end)
+            assert search.path_cost == (expected or 0)
+
+
+def test_run_for_and_run():
+    grid = random_grid(40, 40, 0.2, seed=4)
+    start, end = random_queries(grid, 1, seed=5)[0]
+    search = AStar(grid).start_search(start, end)
+    search.run_for(0.0, chunk=1)
+    assert search.nodes_explored >= 1
+    path = search.run()
+    assert path == search.path and search.done
+
+
+def test_unreachable_and_blocked_finish_immediately():
+    grid = np.zeros((10, 10), dtype=np.uint8)
+    grid[:, 5] = 1
+    for engine in engines(grid):
+        for start, end in (((0, 0), (0, 9)), ((0, 0), (3, 5)), ((3, 5), (0, 0)), ((0, 0), (10, 0))):
+            search = engine.start_search(start, end)
+            assert search.done and search.step() and search.path is None
+            assert search.nodes_explored == 0
+
+
+def test_set_cell_before_start():
+    grid = Grid.wrap(np.zeros((12, 12), dtype=np.uint8))
+    for engine in engines(grid):
+        for x in range(11):
+            grid.set_cell(x, 6, 1)
+        search = engine.start_search((0, 0), (0, 11))
+        search.run()
+        assert search.path_cost == dijkstra_cost(grid, (0, 0), (0, 11))
+        grid.set_cell(11, 6, 1)
+        assert engine.start_search((0, 0), (0, 11)).done
+        grid.set_cell(11, 6, 0)
+        for x in range(11):
+            grid.set_cell(x, 6, 0)
+
+
+def test_astar_search_matches_flat_engine():
+    grid = random_grid(30, 30, 0.3, seed=6)
+    engine = AStar(grid, flat=True)
+    for start, end in random_queries(grid, 8, seed=7):
+        search = AStar(grid).start_search(start, end)
+        while not search.step(5):
+            pass
+        # 分步推进与一次跑完共用同一个主循环，路径和扩展数完全相同
+        assert search.path == engine.find_path(start, end)
+        assert search.nodes_explored == engine.nodes_explored
+
+
+def test_resumable_search_is_abstract():
+    from resumable import ResumableSearch
+
+    class Incomplete(ResumableSearch):
+        pass
+
+    try:
+        Incomplete(AStar(np.zeros((4, 4), dtype=np.uint8)), (0, 0), (3, 3))
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("没有实现 _expand 的子类不能实例化")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import map_generators
+import scenario_runner
+from reference import dijkstra_cost
+
+CONFIGS = [
+    {'size': 24, 'obstacles': 3, 'name': 'small'},
+    {'size': 32, 'obstacles': 6, 'name': 'dense'},
+]
+ALGORITHMS = ['A*', 'JPS']
+
+
+def without_time(results):
+    return {name: {key: values for key, values in rows.items() if not key.endswith('_time')}
+            for name, rows in results.items()}
+
+
+def test_results_independent_of_workers():
+    serial = scenario_runner.run_scenarios(CONFIGS, num_tests=6, algorithms=ALGORITHMS, workers=1, seed=3)
+    parallel = scenario_runner.run_scenarios(CONFIGS, num_tests=6, algorithms=ALGORITHMS, workers=2, seed=3,
+                                             chunksize=1)
+    assert without_time(serial) == without_time(parallel)
+    other = scenario_runner.run_scenarios(CONFIGS, num_tests=6, algorithms=ALGORITHMS, workers=1, seed=4)
+    assert without_time(other) != without_time(serial)
+
+
+def test_success_matches_dijkstra():
+    results = scenario_runner.run_scenarios(CONFIGS, num_tests=5, algorithms=ALGORITHMS, workers=1, seed=0)
+    for c, config in enumerate(CONFIGS):
+        rows = results[config['name']]
+        for i in range(5):
+            # 按同一种子重新生成场景
+            rng = np.random.default_rng(scenario_runner.scenario_seed(0, c, i))
+            grid = map_generators.sparse_map(config['size'], config['obstacles'], seed=rng)
+            free = np.flatnonzero(grid == 0)
+            start, end = (divmod(int(j), config['size']) for j in rng.choice(free, 2))
+            reachable = dijkstra_cost(grid, start, end) is not None
+            for algorithm in ALGORITHMS:
+                assert rows[f"{algorithm}_success"][i] == reachable
+                assert (rows[f"{algorithm}_path_length"][i] > 0) == reachable
+
+
+def test_summary():
+    results = scenario_runner.run_scenarios(CONFIGS[:1], num_tests=4, algorithms=ALGORITHMS, workers=1)
+    summary = scenario_runner.summarize(results, ALGORITHMS)
+    for algorithm in ALGORITHMS:
+        row = summary['small'][algorithm]
+        assert row['min_time'] <= row['mean_time'] <= row['max_time']
+        assert 0 <= row['success_rate'] <= 100
+
+
+def test_unknown_algorithm():
+    try:
+        scenario_runner.run_scenarios(CONFIGS, num_tests=1, algorithms=['Dijkstra'], workers=1)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知的算法应当报错")
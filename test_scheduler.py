@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from astar import AStar
+from reference import dijkstra_cost, random_grid, random_queries
+from scheduler import FrameScheduler
+
+
+def test_all_searches_complete():
+    grid = random_grid(40, 40, 0.25, seed=0)
+    engine = AStar(grid)
+    scheduler = FrameScheduler(budget=0.0005, slice_expansions=8)
+    finished = []
+    queries = random_queries(grid, 12, seed=1)
+    searches = [scheduler.submit(engine.start_search(start, end), callback=finished.append)
+                for start, end in queries]
+    assert len(scheduler) == len(queries)
+    frames = scheduler.run_until_idle()
+    assert len(scheduler) == 0
+    assert frames == scheduler.frames >= 1
+    assert sorted(map(id, finished)) == sorted(map(id, searches))
+    assert scheduler.get_stats()['completed'] == len(queries)
+    for search, (start, end) in zip(searches, queries):
+        assert search.path_cost == (dijkstra_cost(grid, start, end) or 0)
+
+
+def test_priority_gets_more_time():
+    # 中间一道长墙，两个对称的查询都要绕行，扩展数相同
+    grid = [[0] * 100 for _ in range(100)]
+    for x in range(99):
+        grid[x][50] = 1
+    engine = AStar(grid)
+    scheduler = FrameScheduler(budget=0.001, slice_expansions=4)
+    low = scheduler.submit(engine.start_search((0, 0), (0, 99)), priority=1.0)
+    high = scheduler.submit(engine.start_search((0, 99), (0, 0)), priority=8.0)
+    for _ in range(3):
+        scheduler.run_frame()
+    assert not high.done
+    # 高优先级分到更多时间，低优先级也在推进（不会饿死）
+    assert high.nodes_explored > 2 * low.nodes_explored > 0
+    scheduler.run_until_idle()
+    assert low.done and high.done
+    assert low.path_cost == high.path_cost == dijkstra_cost(grid, (0, 0), (0, 99))
+
+
+def test_max_frames_and_invalid_priority():
+    grid = [[0] * 60 for _ in range(60)]
+    scheduler = FrameScheduler(budget=0.0, slice_expansions=1)
+    scheduler.submit(AStar(grid).start_search((0, 0), (59, 59)))
+    # 预算为0时每帧不推进，max_frames 保证返回
+    assert scheduler.run_until_idle(max_frames=3) == 3
+    assert len(scheduler) == 1
+    try:
+        scheduler.submit(AStar(grid).start_search((0, 0), (1, 1)), priority=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("非正优先级应当报错")
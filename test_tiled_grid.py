@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
+import numpy as np
+
+import metrics
+from astar import AStar
+from bidirectional_astar import BidirectionalAStar
+from grid import Grid
+from jps import JPS
+from reference import dijkstra_cost, is_valid_path, path_cost, random_grid, random_queries
+from tiled_grid import TiledGrid
+
+
+def tiled(dense, tile_size=8, max_tiles=256, writable=False):
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, 'world.tiles')
+    TiledGrid.create(path, dense.shape[0], dense.shape[1], tile_size, source=dense).close()
+    return tmp, TiledGrid(path, max_tiles=max_tiles, writable=writable)
+
+
+def test_cells_match_dense():
+    dense = random_grid(37, 45, 0.3, seed=0)
+    tmp, grid = tiled(dense, max_tiles=3)
+    with tmp, grid:
+        assert (len(grid), grid.height, grid.width) == (37, 37, 45)
+        assert [list(row) for row in grid] == dense.tolist()
+        assert grid.resident_tiles <= 3
+        assert grid.evictions > 0
+        # 地图外的分块边缘和越界坐标都视为障碍
+        assert grid.is_blocked(-1, 0) and grid.is_blocked(37, 0) and grid.is_blocked(0, 45)
+
+
+def test_engines_match_dense():
+    dense = random_grid(40, 40, 0.25, seed=1)
+    queries = random_queries(dense, 8, seed=2) + [((0, 0), (40, 0))]
+    tmp, grid = tiled(dense, max_tiles=4)
+    with tmp, grid:
+        astar = AStar(grid)
+        bidirectional = BidirectionalAStar(grid)
+        for start, end in queries:
+            expected = dijkstra_cost(dense, start, end)
+            path = astar.find_path(start, end)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert is_valid_path(dense, path, start, end)
+                assert astar.path_cost == path_cost(path) == expected
+            path = bidirectional.find_path(start, end)
+            assert (path is None) == (expected is None)
+            if path is not None:
+                assert is_valid_path(dense, path, start, end)
+            assert grid.resident_tiles <= 4
+
+
+def test_tile_faults_recorded_per_query():
+    dense = np.zeros((64, 64), dtype=np.uint8)
+    tmp, grid = tiled(dense, tile_size=16, max_tiles=2)
+    with tmp, grid:
+        with metrics.use_metrics() as m:
+            AStar(grid).find_path((0, 0), (63, 63))
+        counters = m.snapshot()['counters']['astar']
+        assert counters['tile_faults'] == grid.tile_faults >= 4
+        assert grid.get_stats()['resident_bytes'] <= 2 * 16 * 16
+
+
+def test_set_cell_and_read_only():
+    dense = np.zeros((20, 20), dtype=np.uint8)
+    tmp, grid = tiled(dense, writable=True)
+    with tmp:
+        engine = AStar(grid)
+        assert engine.find_path((0, 0), (0, 19)) is not None
+        for x in range(19):
+            grid.set_cell(x, 10, 1)
+        dense[:19, 10] = 1
+        engine.find_path((0, 0), (0, 19))
+        assert engine.path_cost == dijkstra_cost(dense, (0, 0), (0, 19))
+        grid[19][10] = 1
+        assert grid.version == 20
+        assert engine.find_path((0, 0), (19, 10)) is None
+        path = grid.path
+        grid.close()
+        # 修改直接写回文件
+        with TiledGrid(path) as reopened:
+            assert reopened[19][10] == 1
+            try:
+                reopened.set_cell(0, 0, 1)
+            except TypeError:
+                pass
+            else:
+                raise AssertionError("只读打开时不能修改")
+
+
+def test_components_match_dense():
+    dense = random_grid(37, 45, 0.45, seed=3)
+    tmp, grid = tiled(dense, max_tiles=2, writable=True)
+    with tmp, grid:
+        queries = random_queries(dense, 30, seed=4) + [((x, 0), (36 - x, 44)) for x in range(37)]
+        for diagonal in (False, True):
+            index = grid.components(diagonal)
+            expected = Grid.wrap(dense).components(diagonal)
+            assert index.count == expected.count
+            for start, end in queries:
+                assert index.connected(start, end) == expected.connected(start, end)
+        assert grid.resident_tiles <= 2
+        # 修改格子后只重新标记所在分块
+        for x in range(37):
+            grid.set_cell(x, 20, 1)
+        dense[:, 20] = 1
+        index = grid.components()
+        expected = Grid.wrap(dense).components()
+        assert index.count == expected.count
+        assert not index.connected((0, 0), (0, 44))
+
+
+def test_unreachable_goal_rejected_without_scanning():
+    # 一道墙把世界分成两半：不可达的查询在预检查时就被拒绝，不会把整个世界调入
+    dense = np.zeros((64, 64), dtype=np.uint8)
+    dense[:, 40] = 1
+    tmp, grid = tiled(dense, tile_size=8, max_tiles=4)
+    with tmp, grid:
+        for engine in (AStar(grid), BidirectionalAStar(grid), JPS(grid)):
+            faults = grid.tile_faults
+            assert engine.find_path((0, 0), (63, 63)) is None
+            assert engine.nodes_explored == 0
+            if faults:
+                # 索引已经建好，之后的查询只调入端点所在的分块
+                assert grid.tile_faults - faults <= 2
+            assert grid.resident_tiles <= 4
+
+
+def test_jps_matches_dense():
+    dense = random_grid(40, 40, 0.25, seed=5)
+    queries = random_queries(dense, 10, seed=6)
+    tmp, grid = tiled(dense, max_tiles=4)
+    with tmp, grid:
+        engine = JPS(grid)
+        reference = JPS(dense)
+        for start, end in queries:
+            path = engine.find_path(start, end)
+            assert path == reference.find_path(start, end)
+            assert engine.path_cost == reference.path_cost
+            assert path is None or (path[0] == start and path[-1] == end)
+            assert grid.resident_tiles <= 4
+
+
+def test_generated_source_and_bad_arguments():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'world.tiles')
+        # 按分块生成：对角线上的格子是障碍
+        source = lambda x0, y0, h, w: (np.add.outer(np.arange(x0, x0 + h), -np.arange(y0, y0 + w)) == 0)
+        with TiledGrid.create(path, 30, 30, 16, source=source) as grid:
+            assert all(grid[i][i] == 1 for i in range(30)) and grid[0][1] == 0
+        for bad in (lambda: TiledGrid.create(path, 4, 4, 6), lambda: TiledGrid(path, max_tiles=0)):
+            try:
+                bad()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("非法参数应当报错")
+        with open(path, 'r+b') as f:
+            f.write(b'NOTTILES')
+        try:
+            TiledGrid(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("魔数错误应当报错")
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import heapq
+
+import numpy as np
+
+from grid import Grid
+from reference import random_grid, random_queries
+from visibility_graph import VisibilityGraph
+
+
+def graph_distance(graph, start, end):
+    """在 dict 形式的可见图上做 Dijkstra"""
+    dist = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if v == end:
+            return d
+        if d > dist[v]:
+            continue
+        for n, w in graph[v].items():
+            if d + w < dist.get(n, float('inf')):
+                dist[n] = d + w
+                heapq.heappush(heap, (d + w, n))
+    return None
+
+
+def length(path):
+    return sum(((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5 for a, b in zip(path, path[1:]))
+
+
+def test_obstacle_vertices_match_scan():
+    grid = random_grid(15, 18, 0.3, seed=0)
+    vg = VisibilityGraph(grid)
+    expected = []
+    for x in range(15):
+        for y in range(18):
+            if grid[x, y] == 1 and any(vg.is_valid_empty((x + dx, y + dy))
+                                       for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))):
+                expected.append((x, y))
+    assert vg.get_obstacle_vertices() == expected
+
+
+def test_batch_visible_matches_single_checks():
+    grid = random_grid(14, 14, 0.25, seed=1)
+    vg = VisibilityGraph(grid)
+    points = [(x, y) for x in range(-1, 15, 3) for y in range(-1, 15, 2)]
+    pairs = [(a, b) for a in points for b in points]
+    x0, y0, x1, y1 = (np.array(v, dtype=np.int64) for v in zip(*[(a[0], a[1], b[0], b[1]) for a, b in pairs]))
+    batch = vg.batch_visible(x0, y0, x1, y1)
+    assert batch.tolist() == [vg.is_visible(a, b) for a, b in pairs]
+
+
+def test_chunked_build_matches_single_chunk():
+    grid = random_grid(16, 16, 0.2, seed=2)
+    vg = VisibilityGraph(grid)
+    whole = vg.build_visibility_graph((0, 0), (15, 15))
+    assert vg.build_visibility_graph((0, 0), (15, 15), chunk_size=7) == whole
+    for v, nbrs in whole.items():
+        for n in nbrs:
+            # Bresenham 线与方向有关，边只在构建时的顶点顺序上检查过
+            assert vg.is_visible(v, n) or vg.is_visible(n, v)
+
+
+def test_find_path_matches_full_graph():
+    grid = random_grid(20, 20, 0.15, seed=3)
+    grid[0, 0] = 0
+    vg = VisibilityGraph(grid)
+    for start, end in random_queries(grid, 8, seed=4):
+        path = vg.find_path(start, end)
+        full = vg.build_visibility_graph(start, end)
+        expected = graph_distance(full, start, end)
+        assert (path is None) == (expected is None)
+        if path is None:
+            continue
+        assert path[0] == start and path[-1] == end
+        # 启发函数放大了1.1倍，路径长度不超过最优的1.1倍
+        assert expected - 1e-9 <= length(path) <= 1.1 * expected + 1e-9
+
+
+def test_static_graph_reused_until_set_cell():
+    grid = Grid.wrap(random_grid(20, 20, 0.15, seed=5))
+    vg = VisibilityGraph(grid)
+    queries = random_queries(grid, 4, seed=6)
+    for start, end in queries:
+        vg.find_path(start, end)
+    assert vg.cache_misses == 1
+    first = vg.static_graph()
+    x, y = queries[0][0]
+    grid.set_cell((x + 1) % 20, y, 1 - grid[(x + 1) % 20][y])
+    vg.find_path(*queries[0])
+    assert vg.cache_misses == 2 and vg.static_graph() is not first
+    assert vg.static_graph()['vertices'] == VisibilityGraph(grid).get_obstacle_vertices()
+
+
+def test_blocked_endpoints():
+    grid = np.zeros((6, 6), dtype=np.uint8)
+    grid[3, 3] = 1
+    vg = VisibilityGraph(grid)
+    assert vg.find_path((0, 5), (5, 0)) == [(0, 5), (5, 0)]
+    assert vg.find_path((0, 0), (3, 3)) is None
+    assert vg.path_length == 0
+    assert vg.find_path((3, 3), (0, 0)) is None
+    assert vg.find_path((0, 0), (6, 0)) is None
+    assert vg.find_path((1, 1), (1, 1)) == [(1, 1)]
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+import mmap
+import struct
+from array import array
+from collections import OrderedDict
+
+from components import ComponentIndex
+from grid import Grid
+
+# 文件布局：一页文件头，之后按分块行优先依次存放各分块，每块 tile_size*tile_size 字节（行优先，0可通行，1障碍）
+MAGIC = b'FPTILES\x00'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHHIII')  # 魔数、版本、保留、高、宽、分块边长
+HEADER_SIZE = 4096
+
+
+class _TiledRow:
+    """grid[x] 返回的行代理，row[y] 按需调入所在分块"""
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid, x):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        return self.grid.cell(self.x, y)
+
+    def __setitem__(self, y, value):
+        self.grid.set_cell(self.x, y, value)
+
+    def __len__(self):
+        return self.grid.width
+
+    def __iter__(self):
+        for y in range(self.grid.width):
+            yield self.grid.cell(self.x, y)
+
+
+class TiledGrid(Grid):
+    """分块存放在磁盘上的超大网格：搜索访问到某个分块时才用 mmap 映射进来
+
+    最多同时映射 max_tiles 个分块（LRU 淘汰，淘汰时解除映射），内存占用与世界大小无关。
+    支持 grid[x][y] / len(grid) / height / width / is_blocked，非平铺模式的 AStar 和
+    BidirectionalAStar 可以不加修改地直接使用；JPS 在 dense 为 False 的网格上自动改用逐格跳跃
+    （jps_blocks.CellJumper）和按需的字典搜索状态。
+    需要整张稠密数组的功能（flat 模式的 padded、to_numpy、位扫描器和 JPS+ 预处理表）不可用。
+    components() 返回按分块汇总的 TiledComponentIndex，不可达的查询在预检查时就被拒绝，不会扫遍整个世界。
+
+    tile_faults / tile_hits / evictions 是累计计数；开启 metrics 时每次查询的 tile_faults 会自动记录。
+    """
+
+    dense = False
+
+    def __init__(self, path, max_tiles=256, writable=False):
+        if max_tiles < 1:
+            raise ValueError("max_tiles 至少为 1")
+        self.path = path
+        self.max_tiles = max_tiles
+        self.writable = writable
+        self._file = open(path, 'r+b' if writable else 'rb')
+        magic, version, _, height, width, tile_size = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"不是分块地图文件: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的格式版本: {version}")
+        if tile_size & (tile_size - 1):
+            raise ValueError(f"分块边长必须是 2 的幂: {tile_size}")
+        self.height = height
+        self.width = width
+        self.size = height * width
+        self.tile_size = tile_size
+        self._shift = tile_size.bit_length() - 1
+        self._mask = tile_size - 1
+        self.tiles_x = (height + tile_size - 1) // tile_size
+        self.tiles_y = (width + tile_size - 1) // tile_size
+        self.version = 0
+        self._rows = None
+        self._padded = None
+        self._components = {}
+        self._tiles = OrderedDict()  # (分块行, 分块列) -> (mmap, 分块数据在映射内的起点)
+        self._last_key = None
+        self._last_tile = None
+        self.tile_faults = 0
+        self.tile_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def create(cls, path, height, width, tile_size=64, source=None):
+        """创建分块地图文件
+
+        source 可以是稠密网格（任何 Grid.wrap 支持的形式），也可以是 source(x0, y0, h, w) -> 二维数组，
+        按分块逐个生成内容，不需要一次性持有整张地图。source 为 None 时全部可通行。
+        超出地图范围的分块边缘填为障碍。
+        """
+        import numpy as np
+        if tile_size <= 0 or tile_size & (tile_size - 1):
+            raise ValueError(f"分块边长必须是 2 的幂: {tile_size}")
+        if source is not None and not callable(source):
+            dense = Grid.wrap(source).to_numpy()
+            source = lambda x0, y0, h, w: dense[x0:x0 + h, y0:y0 + w]
+        tiles_x = (height + tile_size - 1) // tile_size
+        tiles_y = (width + tile_size - 1) // tile_size
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, height, width, tile_size).ljust(HEADER_SIZE, b'\x00'))
+            for tx in range(tiles_x):
+                for ty in range(tiles_y):
+                    x0, y0 = tx * tile_size, ty * tile_size
+                    h = min(tile_size, height - x0)
+                    w = min(tile_size, width - y0)
+                    tile = np.ones((tile_size, tile_size), dtype=np.uint8)
+                    tile[:h, :w] = 0 if source is None else np.asarray(source(x0, y0, h, w)) != 0
+                    f.write(tile.tobytes())
+        return cls(path)
+
+    def _tile(self, key):
+        tiles = self._tiles
+        tile = tiles.get(key)
+        if tile is not None:
+            self.tile_hits += 1
+            tiles.move_to_end(key)
+        else:
+            tile = self._fault(key)
+        self._last_key = key
+        self._last_tile = tile
+        return tile
+
+    def _fault(self, key):
+        """把分块映射进来，超过上限时解除最久未用分块的映射"""
+        self.tile_faults += 1
+        tiles = self._tiles
+        while len(tiles) >= self.max_tiles:
+            old_key, (old, _) = tiles.popitem(last=False)
+            if old_key == self._last_key:
+                self._last_key = None
+            old.close()
+            self.evictions += 1
+        tile_bytes = self.tile_size * self.tile_size
+        offset = HEADER_SIZE + (key[0] * self.tiles_y + key[1]) * tile_bytes
+        # mmap 的偏移必须按分配粒度对齐
+        aligned = offset - offset % mmap.ALLOCATIONGRANULARITY
+        mapped = mmap.mmap(self._file.fileno(), offset - aligned + tile_bytes, offset=aligned,
+                           access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ)
+        tile = tiles[key] = (mapped, offset - aligned)
+        return tile
+
+    def cell(self, x, y):
+        shift = self._shift
+        key = (x >> shift, y >> shift)
+        if key == self._last_key:
+            # 连续访问同一分块时不更新 LRU 顺序
+            mapped, base = self._last_tile
+        else:
+            mapped, base = self._tile(key)
+        mask = self._mask
+        return mapped[base + ((x & mask) << shift) + (y & mask)]
+
+    def __getitem__(self, x):
+        return _TiledRow(self, x)
+
+    def is_blocked(self, x, y):
+        return not (0 <= x < self.height and 0 <= y < self.width) or self.cell(x, y) == 1
+
+    def passable(self, idx):
+        x, y = divmod(idx, self.width)
+        return self.cell(x, y) == 0
+
+    def set_cell(self, x, y, value):
+        """修改一个格子（需以 writable=True 打开），直接写回文件"""
+        if not self.writable:
+            raise TypeError("分块地图以只读方式打开")
+        shift = self._shift
+        mapped, base = self._tile((x >> shift, y >> shift))
+        mask = self._mask
+        mapped[base + ((x & mask) << shift) + (y & mask)] = value
+        for index in self._components.values():
+            index.update(x, y, value)
+        self.version += 1
+
+    @property
+    def resident_tiles(self):
+        return len(self._tiles)
+
+    @property
+    def resident_bytes(self):
+        return len(self._tiles) * self.tile_size * self.tile_size
+
+    @property
+    def cells(self):
+        raise TypeError("分块地图没有整块的格子缓冲区，请使用 grid[x][y] 访问")
+
+    @property
+    def padded(self):
+        raise TypeError("分块地图不支持带边框的稠密副本（flat 模式），请使用非 flat 模式的引擎")
+
+    def components(self, diagonal=False):
+        """连通分量索引（TiledComponentIndex），第一次调用时逐块扫描整个文件构建并缓存"""
+        index = self._components.get(diagonal)
+        if index is None:
+            index = self._components[diagonal] = TiledComponentIndex(self, diagonal)
+        return index
+
+    def get_stats(self):
+        return {
+            'tiles': self.tiles_x * self.tiles_y,
+            'resident_tiles': len(self._tiles),
+            'resident_bytes': self.resident_bytes,
+            'tile_faults': self.tile_faults,
+            'tile_hits': self.tile_hits,
+            'evictions': self.evictions,
+        }
+
+    def close(self):
+        for mapped, _ in self._tiles.values():
+            mapped.close()
+        self._tiles.clear()
+        self._last_key = None
+        self._last_tile = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+class TiledComponentIndex:
+    """分块地图的连通分量索引：逐块调入并标记一次，只保留每块四条边上格子的局部标号，跨块边界用并查集合并
+
+    与 components.ComponentIndex 的 label / connected / update / count 接口相同。构建时按顺序流过所有分块，
+    驻留分块数仍受 max_tiles 限制；常驻内存只有各块的边界标号（每块 4*tile_size 个）和跨块合并过的并查集条目。
+    label 查询时重新标记所在分块（最近用过的几块有缓存）；修改格子后只重新标记该块，并查集在下次查询前重建。
+    """
+
+    CACHED_TILES = 4
+
+    def __init__(self, grid, diagonal=False):
+        self.grid = grid
+        self.diagonal = diagonal
+        ts = grid.tile_size
+        self._pw = ts + 2
+        # 全局标号 = 分块序号 * _stride + 局部标号，局部标号不超过 tile_size**2
+        self._stride = ts * ts + 1
+        self._typecode = 'H' if ts <= 256 else 'i'
+        self._borders = {}  # 分块 -> (上, 下, 左, 右) 四条边的局部标号
+        self._counts = {}  # 分块 -> 局部分量数
+        self._cache = OrderedDict()  # 分块 -> 带边框的局部标号数组
+        self._parent = {}
+        self._count = 0
+        self._dirty = set()
+        for tx in range(grid.tiles_x):
+            for ty in range(grid.tiles_y):
+                self._summarize((tx, ty))
+        self._merge()
+
+    def _relabel(self, key):
+        grid = self.grid
+        ts = grid.tile_size
+        mapped, base = grid._tile(key)
+        index = ComponentIndex(Grid(bytearray(mapped[base:base + ts * ts]), ts, ts), self.diagonal)
+        return index.labels, index.count
+
+    def _summarize(self, key):
+        labels, count = self._relabel(key)
+        pw = self._pw
+        ts = pw - 2
+        code = self._typecode
+        self._borders[key] = (array(code, labels[pw + 1:pw + 1 + ts]),
+                              array(code, labels[ts * pw + 1:ts * pw + 1 + ts]),
+                              array(code, labels[pw + 1:(ts + 1) * pw:pw]),
+                              array(code, labels[pw + ts:(ts + 1) * pw:pw]))
+        self._counts[key] = count
+        self._cache[key] = labels
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.CACHED_TILES:
+            self._cache.popitem(last=False)
+
+    def _merge(self):
+        """按各块边界标号重建并查集：相邻分块边界两侧都可通行的格子属于同一分量"""
+        self._parent = parent = {}
+        find = self._find
+        stride = self._stride
+        tiles_x = self.grid.tiles_x
+        tiles_y = self.grid.tiles_y
+        borders = self._borders
+        unions = 0
+
+        def join(a_key, a_labels, b_key, b_labels):
+            nonlocal unions
+            a_base = (a_key[0] * tiles_y + a_key[1]) * stride
+            b_base = (b_key[0] * tiles_y + b_key[1]) * stride
+            for a, b in zip(a_labels, b_labels):
+                if a and b:
+                    ra = find(a_base + a)
+                    rb = find(b_base + b)
+                    if ra != rb:
+                        parent[ra] = rb
+                        unions += 1
+
+        for (tx, ty), (top, bottom, left, right) in borders.items():
+            if ty + 1 < tiles_y:
+                other = borders[(tx, ty + 1)][2]
+                join((tx, ty), right, (tx, ty + 1), other)
+                if self.diagonal:
+                    join((tx, ty), right[1:], (tx, ty + 1), other)
+                    join((tx, ty), right, (tx, ty + 1), other[1:])
+            if tx + 1 < tiles_x:
+                other = borders[(tx + 1, ty)][0]
+                join((tx, ty), bottom, (tx + 1, ty), other)
+                if self.diagonal:
+                    join((tx, ty), bottom[1:], (tx + 1, ty), other)
+                    join((tx, ty), bottom, (tx + 1, ty), other[1:])
+            if self.diagonal and tx + 1 < tiles_x:
+                # 八邻域时分块的角与斜对面分块的角也相邻
+                if ty + 1 < tiles_y:
+                    join((tx, ty), bottom[-1:], (tx + 1, ty + 1), borders[(tx + 1, ty + 1)][0][:1])
+                if ty > 0:
+                    join((tx, ty), bottom[:1], (tx + 1, ty - 1), borders[(tx + 1, ty - 1)][0][-1:])
+        self._count = sum(self._counts.values()) - unions
+
+    @property
+    def count(self):
+        """分量数"""
+        self._refresh()
+        return self._count
+
+    def _find(self, label):
+        parent = self._parent
+        root = label
+        while root in parent:
+            root = parent[root]
+        while label != root:
+            following = parent[label]
+            parent[label] = root
+            label = following
+        return root
+
+    def _refresh(self):
+        if self._dirty:
+            for key in self._dirty:
+                self._summarize(key)
+            self._dirty.clear()
+            self._merge()
+
+    def label(self, pos):
+        """格子所在分量的标号，障碍或越界为 0"""
+        x, y = pos
+        grid = self.grid
+        if not (0 <= x < grid.height and 0 <= y < grid.width):
+            return 0
+        self._refresh()
+        shift = grid._shift
+        mask = grid._mask
+        key = (x >> shift, y >> shift)
+        labels = self._cache.get(key)
+        if labels is None:
+            labels = self._cache[key] = self._relabel(key)[0]
+            while len(self._cache) > self.CACHED_TILES:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        local = labels[((x & mask) + 1) * self._pw + (y & mask) + 1]
+        if not local:
+            return 0
+        return self._find((key[0] * grid.tiles_y + key[1]) * self._stride + local)
+
+    def connected(self, start, end):
+        """两个格子都可通行且位于同一分量"""
+        a = self.label(start)
+        return a != 0 and a == self.label(end)
+
+    def update(self, x, y, value):
+        """格子 (x, y) 已被改为 value 后调用（TiledGrid.set_cell 会自动调用）"""
+        key = (x >> self.grid._shift, y >> self.grid._shift)
+        self._dirty.add(key)
+        self._cache.pop(key, None)
@@ -1,39 +1,36 @@
 import numpy as np
 from heapq import heappush, heappop
 import time
+import metrics
+from grid import Grid
 
 class VisibilityGraph:
     def __init__(self, grid):
-        self.grid = grid
-        self.height = len(grid)
-        self.width = len(grid[0])
+        self.grid = Grid.wrap(grid)
+        self.height = self.grid.height
+        self.width = self.grid.width
         self.nodes_explored = 0
         self.execution_time = 0
         self.path_length = 0
         self.visibility_cache = {}  # 可见性缓存
+        # 缓存命中/未命中（可见性缓存和静态可见图）、每次查询的视线检查次数
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.los_checks = 0
+        # 障碍物顶点之间的可见图只依赖地图，按 grid.version 缓存，跨查询复用
+        self._static_graph = None
+        self._static_version = None
 
     def get_obstacle_vertices(self):
-        """优化后的顶点检测"""
-        vertices = []
-        # 优化检测模式，减少重复
-        patterns = [
-            ((-1,0), (0,1)),  # 左上
-            ((1,0), (0,1)),   # 左下
-            ((0,1), (1,0)),   # 右下
-            ((0,-1), (-1,0))  # 右上
-        ]
-        
-        for i in range(self.height):
-            for j in range(self.width):
-                if self.grid[i][j] == 1:
-                    for (dx1, dy1), (dx2, dy2) in patterns:
-                        p1 = (i + dx1, j + dy1)
-                        p2 = (i + dx2, j + dy2)
-                        if self.is_valid_empty(p1) or self.is_valid_empty(p2):
-                            vertices.append((i, j))
-                            break
-        return vertices
-    
+        """障碍物顶点检测：四邻域中存在空格（或地图边界外）的障碍格，整幅数组一次计算"""
+        cells = self.grid.to_numpy()
+        empty = np.ones((self.height + 2, self.width + 2), dtype=bool)  # 边界外视为可通行
+        empty[1:-1, 1:-1] = cells == 0
+        touches_empty = (empty[:-2, 1:-1] | empty[2:, 1:-1] |
+                         empty[1:-1, :-2] | empty[1:-1, 2:])
+        xs, ys = np.nonzero((cells == 1) & touches_empty)
+        return list(zip(xs.tolist(), ys.tolist()))
+
     def is_valid_empty(self, pos):
         x, y = pos
         if 0 <= x < self.height and 0 <= y < self.width:
@@ -44,8 +41,11 @@ class VisibilityGraph:
         """改进的可见性检查"""
         cache_key = (start, end)
         if cache_key in self.visibility_cache:
+            self.cache_hits += 1
             return self.visibility_cache[cache_key]
-        
+        self.cache_misses += 1
+        self.los_checks += 1
+
         x0, y0 = start
         x1, y1 = end
         
@@ -86,71 +86,195 @@ class VisibilityGraph:
                 y0 += sy
         return points
     
-    def build_visibility_graph(self, start, end):
-        """构建可见图"""
+    def batch_visible(self, x0, y0, x1, y1):
+        """批量可见性检查：同时推进多条 Bresenham 线段，结果与逐对调用 is_visible 相同"""
+        self.los_checks += len(x0)
+        cells = self.grid.to_numpy()
+        visible = np.zeros(len(x0), dtype=bool)
+        inside = ((x0 >= 0) & (x0 < self.height) & (y0 >= 0) & (y0 < self.width) &
+                  (x1 >= 0) & (x1 < self.height) & (y1 >= 0) & (y1 < self.width))
+        active = np.nonzero(inside)[0]
+        x, y = x0[active], y0[active]
+        tx, ty = x1[active], y1[active]
+        dx = np.abs(tx - x)
+        dy = np.abs(ty - y)
+        sx = np.where(x < tx, 1, -1)
+        sy = np.where(y < ty, 1, -1)
+        err = dx - dy
+
+        while len(active):
+            # 到达终点的线段可见；途经障碍（不含两端点）的线段不可见
+            done = (x == tx) & (y == ty)
+            visible[active[done]] = True
+            keep = ~done
+            e2 = 2 * err
+            step_x = keep & (e2 > -dy)
+            step_y = keep & (e2 < dx)
+            err = err - np.where(step_x, dy, 0) + np.where(step_y, dx, 0)
+            x = x + np.where(step_x, sx, 0)
+            y = y + np.where(step_y, sy, 0)
+            at_end = (x == tx) & (y == ty)
+            keep &= at_end | (cells[np.where(keep, x, 0), np.where(keep, y, 0)] != 1)
+            active, x, y, tx, ty = active[keep], x[keep], y[keep], tx[keep], ty[keep]
+            dx, dy, sx, sy, err = dx[keep], dy[keep], sx[keep], sy[keep], err[keep]
+        return visible
+
+    def _visible_pairs(self, coords, chunk_size=1 << 20):
+        """按 (i, j) 字典序分块枚举 i < j 的顶点对，逐块产出可见的 (i 数组, j 数组)"""
+        n = len(coords)
+        i0 = 0
+        while i0 < n - 1:
+            # 取若干行 i，使本块顶点对数量不超过 chunk_size
+            i1 = i0 + 1
+            pairs = n - 1 - i0
+            while i1 < n - 1 and pairs + (n - 1 - i1) <= chunk_size:
+                pairs += n - 1 - i1
+                i1 += 1
+            rows = np.arange(i0, i1)
+            counts = n - 1 - rows
+            first = np.repeat(rows, counts)
+            second = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                      + first + 1)
+            mask = self.batch_visible(coords[first, 0], coords[first, 1],
+                                      coords[second, 0], coords[second, 1])
+            yield first[mask], second[mask]
+            i0 = i1
+
+    def build_visibility_graph(self, start, end, chunk_size=1 << 20):
+        """构建包含起点终点的完整可见图（dict 形式），顶点对的视线检查分块批量完成"""
         vertices = self.get_obstacle_vertices()
-        print(f"障碍物顶点数量: {len(vertices)}")
-        
         vertices.append(start)
         vertices.append(end)
         
         graph = {v: {} for v in vertices}
-        edge_count = 0
-        
-        for i, v1 in enumerate(vertices):
-            for v2 in vertices[i+1:]:
-                if self.is_visible(v1, v2):
-                    dist = ((v1[0]-v2[0])**2 + (v1[1]-v2[1])**2)**0.5
-                    graph[v1][v2] = dist
-                    graph[v2][v1] = dist
-                    edge_count += 1
-                    
-        print(f"可见图边数量: {edge_count}")
+        coords = np.array(vertices, dtype=np.int64).reshape(-1, 2)
+        for first, second in self._visible_pairs(coords, chunk_size):
+            for i, j in zip(first.tolist(), second.tolist()):
+                v1 = vertices[i]
+                v2 = vertices[j]
+                dist = ((v1[0]-v2[0])**2 + (v1[1]-v2[1])**2)**0.5
+                graph[v1][v2] = dist
+                graph[v2][v1] = dist
         return graph
-    
+
+    def static_graph(self):
+        """障碍物顶点之间的可见图，压缩邻接(CSR)存储；地图修改后自动重建"""
+        if self._static_graph is not None and self._static_version == self.grid.version:
+            self.cache_hits += 1
+            return self._static_graph
+        self.cache_misses += 1
+        with metrics.phase('preprocess', 'visibility'):
+            self._static_graph = self._build_static_graph()
+        self._static_version = self.grid.version
+        return self._static_graph
+
+    def _build_static_graph(self):
+        vertices = self.get_obstacle_vertices()
+        coords = np.array(vertices, dtype=np.int64).reshape(-1, 2)
+        n = len(vertices)
+        firsts = [np.zeros(0, dtype=np.int64)]
+        seconds = [np.zeros(0, dtype=np.int64)]
+        for first, second in self._visible_pairs(coords):
+            firsts.append(first)
+            seconds.append(second)
+        first = np.concatenate(firsts)
+        second = np.concatenate(seconds)
+        # 无向边拆成两条有向边，按起点排序得到 CSR
+        src = np.concatenate([first, second])
+        dst = np.concatenate([second, first])
+        order = np.argsort(src, kind='stable')
+        src, dst = src[order], dst[order]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+        weights = np.sqrt(((coords[src] - coords[dst]) ** 2).sum(axis=1).astype(np.float64))
+        return {
+            'vertices': vertices,
+            'coords': coords,
+            'offsets': memoryview(offsets).cast('B').cast('q'),
+            'neighbors': memoryview(np.ascontiguousarray(dst)).cast('B').cast('q'),
+            'weights': memoryview(weights).cast('B').cast('d'),
+            'edge_count': len(first),
+        }
+
+    def _visible_from(self, point, coords):
+        """point 与每个障碍物顶点之间的可见性（方向与完整可见图一致：顶点 -> point）"""
+        n = len(coords)
+        return self.batch_visible(coords[:, 0], coords[:, 1],
+                                  np.full(n, point[0], dtype=np.int64),
+                                  np.full(n, point[1], dtype=np.int64))
+
+    @metrics.instrumented('visibility')
     def find_path(self, start, end):
-        """使用A*算法在可见图中找最短路径"""
-        print(f"起点有效性: {self.is_valid_empty(start)}")
-        print(f"终点有效性: {self.is_valid_empty(end)}")
-        start_time = time.time()
+        """使用A*算法在可见图中找最短路径：静态图复用，每次查询只接入起点和终点"""
+        start = tuple(start)
+        end = tuple(end)
+        start_time = time.perf_counter()
         self.nodes_explored = 0
-        self.visibility_cache = {}  # 清空缓存
-        
-        # 构建可见图
-        graph = self.build_visibility_graph(start, end)
-        
-        print("开始路径寻找...")
-        print("构建的可见图:", graph)
-        
-        # A*算法
-        g_score = {vertex: float('infinity') for vertex in graph}
-        g_score[start] = 0
-        f_score = {vertex: float('infinity') for vertex in graph}
-        f_score[start] = self.heuristic(start, end)
-        
-        open_set = [(f_score[start], start)]
+        self.path_length = 0
+        self.los_checks = 0
+        if self.grid.is_blocked(*start) or self.grid.is_blocked(*end):
+            # 起点或终点是障碍（或越界）
+            self.execution_time = time.perf_counter() - start_time
+            return None
+        if start == end:
+            self.execution_time = time.perf_counter() - start_time
+            self.path_length = 1
+            return [start]
+
+        graph = self.static_graph()
+        vertices = graph['vertices']
+        offsets = graph['offsets']
+        neighbors = graph['neighbors']
+        weights = graph['weights']
+        n = len(vertices)
+        s, t = n, n + 1  # 起点、终点在顶点表之后编号
+
+        # O(V) 次视线检查：起点/终点各自与所有障碍物顶点
+        start_visible = np.nonzero(self._visible_from(start, graph['coords']))[0].tolist()
+        end_visible = self._visible_from(end, graph['coords'])
+        direct = bool(self.batch_visible(np.array([start[0]]), np.array([start[1]]),
+                                         np.array([end[0]]), np.array([end[1]]))[0])
+        end_visible_list = end_visible.tolist()
+
+        def point(i):
+            return start if i == s else end if i == t else vertices[i]
+
+        def distance(a, b):
+            return ((a[0]-b[0])**2 + (a[1]-b[1])**2)**0.5
+
+        g_score = {s: 0}
+        open_set = [(self.heuristic(start, end), s)]
         came_from = {}
         
         while open_set:
             self.nodes_explored += 1
             current = heappop(open_set)[1]
             
-            if current == end:
-                path = self.reconstruct_path(came_from, end)
-                self.execution_time = time.time() - start_time
+            if current == t:
+                with metrics.phase('reconstruct'):
+                    path = [point(i) for i in self.reconstruct_path(came_from, t)]
+                self.execution_time = time.perf_counter() - start_time
                 self.path_length = len(path)
                 return path
+
+            if current == s:
+                edges = [(i, distance(start, vertices[i])) for i in start_visible]
+                if direct:
+                    edges.append((t, distance(start, end)))
+            else:
+                edges = [(neighbors[k], weights[k]) for k in range(offsets[current], offsets[current + 1])]
+                if end_visible_list[current]:
+                    edges.append((t, distance(vertices[current], end)))
             
-            for neighbor, cost in graph[current].items():
+            for neighbor, cost in edges:
                 tentative_g_score = g_score[current] + cost
                 
-                if tentative_g_score < g_score[neighbor]:
+                if tentative_g_score < g_score.get(neighbor, float('infinity')):
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = g_score[neighbor] + self.heuristic(neighbor, end)
-                    heappush(open_set, (f_score[neighbor], neighbor))
+                    heappush(open_set, (tentative_g_score + self.heuristic(point(neighbor), end), neighbor))
         
-        self.execution_time = time.time() - start_time
+        self.execution_time = time.perf_counter() - start_time
         return None
 
     def heuristic(self, a, b):
@@ -167,9 +291,14 @@ class VisibilityGraph:
     
     def get_stats(self):
         """获取算法统计信息"""
+        static = self._static_graph
         return {
+            'graph_vertices': len(static['vertices']) if static else 0,
+            'graph_edges': static['edge_count'] if static else 0,
             'nodes_explored': self.nodes_explored,
             'execution_time': self.execution_time,
             'path_length': self.path_length,
-            'cache_hits': len(self.visibility_cache) - sum(self.visibility_cache.values())
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'los_checks': self.los_checks,
         }